@@ -12,4 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
+
 __version__ = '0.1.0'
+
+# The SDK logs through the standard logging module; applications decide where (and whether) that output goes.
+logging.getLogger(__name__).addHandler(logging.NullHandler())
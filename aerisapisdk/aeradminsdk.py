@@ -12,12 +12,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
-import requests
+import collections
+import logging
+import aerisapisdk.aerishttp as aerishttp
+import aerisapisdk.aerisjson as aerisjson
 import aerisapisdk.aerisutils as aerisutils
 import aerisapisdk.aerisconfig as aerisconfig
 from aerisapisdk.exceptions import ApiException
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+
+DeviceResult = collections.namedtuple('DeviceResult', ['deviceIdType', 'deviceId', 'details', 'error'])
+DeviceResult.__doc__ = """The outcome of a lookup for one device.
+
+details is the dict the single-device function would have returned, or None if the lookup failed; error is the
+exception raised by the lookup, or None if there was none.
+"""
+
 
 def get_aeradmin_base():
     """Returns the AerAdmin API base URL plus a trailing slash as a string.
@@ -31,19 +44,19 @@ def get_endpoint():
 
 def ping(verbose):
     endpoint = get_endpoint()
-    r = requests.get(endpoint)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint)
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 500:  # We are expecting this since we don't have valid parameters
-        print('Endpoint is alive: ' + endpoint)
+        logger.info('Endpoint is alive: %s', endpoint)
     elif r.status_code == 404:
-        print('Not expecting a 404 ...')
-        aerisutils.print_http_error(r)
+        logger.warning('Not expecting a 404 ...')
+        aerisutils.log_http_error(logger, r)
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
 
 
 def get_device_details(accountId, apiKey, email, deviceIdType, deviceId, verbose=False):
-    """Gets and prints details for a device.
+    """Gets and logs details for a device.
     Parameters
     ----------
     accountId: str
@@ -59,7 +72,7 @@ def get_device_details(accountId, apiKey, email, deviceIdType, deviceId, verbose
     deviceId: str
         The ID of the device to query
     verbose: bool, optional
-        True if you want extra output printed
+        True if you want extra output logged
 
     Returns
     -------
@@ -76,11 +89,15 @@ def get_device_details(accountId, apiKey, email, deviceIdType, deviceId, verbose
                "email": email,
                deviceIdType: deviceId}
     myparams = {"apiKey": apiKey}
-    r = requests.post(endpoint, params=myparams, json=payload)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.post(endpoint, params=myparams, json=payload)
+    return _handle_get_device_details(r, verbose)
+
+
+def _handle_get_device_details(r, verbose, quiet=False):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        device_details = json.loads(r.text)
-        print('Device details:\n' + json.dumps(device_details, indent=4))
+        device_details = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, 'Device details:\n%s', aerisutils.LazyJson(device_details))
         result_code = None
         if 'resultCode' in device_details:
             result_code = device_details['resultCode']
@@ -89,12 +106,13 @@ def get_device_details(accountId, apiKey, email, deviceIdType, deviceId, verbose
 
         raise ApiException('Bad (or missing) resultCode: ' + str(result_code), r)
     else:
-        aerisutils.print_http_error(r)
+        if not quiet:
+            aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was not 200', r)
 
 
 def get_device_network_details(accountId, apiKey, email, deviceIdType, deviceId, verbose=False):
-    """Gets and prints details about a device's network attributes (e.g., last registration time)
+    """Gets and logs details about a device's network attributes (e.g., last registration time)
     Parameters
     ----------
     accountId: str
@@ -122,12 +140,16 @@ def get_device_network_details(accountId, apiKey, email, deviceIdType, deviceId,
                "apiKey": apiKey,
                "email": email,
                deviceIdType: deviceId}
-    aerisutils.vprint(verbose, "Payload: " + str(payload))
-    r = requests.get(endpoint, params=payload)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    aerisutils.vlog(logger, verbose, 'Payload: %s', payload)
+    r = aerishttp.get(endpoint, params=payload)
+    return _handle_get_device_network_details(r, verbose)
+
+
+def _handle_get_device_network_details(r, verbose, quiet=False):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        network_details = json.loads(r.text)
-        print('Network details:\n' + json.dumps(network_details, indent=4))
+        network_details = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, 'Network details:\n%s', aerisutils.LazyJson(network_details))
         result_code = None
         if 'resultCode' in network_details:
             result_code = network_details['resultCode']
@@ -135,5 +157,79 @@ def get_device_network_details(accountId, apiKey, email, deviceIdType, deviceId,
             return network_details
         raise ApiException('Bad (or missing) resultCode: ' + str(result_code), r)
     else:
-        aerisutils.print_http_error(r)
+        if not quiet:
+            aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was not 200', r)
+
+
+def get_device_details_bulk(accountId, apiKey, email, devices, maxWorkers=DEFAULT_MAX_WORKERS):
+    """Gets details for many devices, with several requests in flight at once. Logs nothing above DEBUG level.
+
+    Devices are taken from the iterable only as earlier requests complete, so it may be a generator over any number
+    of devices.
+
+    Parameters
+    ----------
+    accountId: str
+    apiKey: str
+    email: str
+    devices: iterable
+        Of (deviceIdType, deviceId) pairs; see ``get_device_details``. The ID types may be mixed.
+    maxWorkers: int, optional
+        The maximum number of requests in flight at once.
+
+    Returns
+    -------
+    generator
+        Of DeviceResult, in the order the requests complete, with the dicts ``get_device_details`` would return.
+    """
+    endpoint = get_endpoint() + 'devices/details'
+    myparams = {"apiKey": apiKey}
+
+    def get_one(device):
+        deviceIdType, deviceId = device
+        payload = {"accountID": accountId,
+                   "email": email,
+                   deviceIdType: deviceId}
+        r = aerishttp.post(endpoint, params=myparams, json=payload)
+        return _handle_get_device_details(r, False, quiet=True)
+
+    return _device_results(get_one, devices, maxWorkers)
+
+
+def get_device_network_details_bulk(accountId, apiKey, email, devices, maxWorkers=DEFAULT_MAX_WORKERS):
+    """Gets network details for many devices, with several requests in flight at once. Logs nothing above DEBUG level.
+
+    Parameters
+    ----------
+    accountId: str
+    apiKey: str
+    email: str
+    devices: iterable
+        Of (deviceIdType, deviceId) pairs; see ``get_device_network_details``. The ID types may be mixed.
+    maxWorkers: int, optional
+        The maximum number of requests in flight at once.
+
+    Returns
+    -------
+    generator
+        Of DeviceResult, in the order the requests complete, with the dicts ``get_device_network_details`` would
+        return.
+    """
+    endpoint = get_endpoint() + 'devices/network/details'
+
+    def get_one(device):
+        deviceIdType, deviceId = device
+        payload = {"accountID": accountId,
+                   "apiKey": apiKey,
+                   "email": email,
+                   deviceIdType: deviceId}
+        r = aerishttp.get(endpoint, params=payload)
+        return _handle_get_device_network_details(r, False, quiet=True)
+
+    return _device_results(get_one, devices, maxWorkers)
+
+
+def _device_results(get_one, devices, maxWorkers):
+    for (deviceIdType, deviceId), details, error in aerisutils.imap_unordered(get_one, devices, maxWorkers):
+        yield DeviceResult(deviceIdType, deviceId, details, error)
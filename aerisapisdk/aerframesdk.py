@@ -12,12 +12,70 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
-import requests
+import collections
+import logging
+import aerisapisdk.aeriscache as aeriscache
+import aerisapisdk.aeriscorrelation as aeriscorrelation
+import aerisapisdk.aerisfilters as aerisfilters
+import aerisapisdk.aerishttp as aerishttp
+import aerisapisdk.aerisjson as aerisjson
+import aerisapisdk.aerissegments as aerissegments
 import aerisapisdk.aerisutils as aerisutils
 import aerisapisdk.aerisconfig as aerisconfig
 from aerisapisdk.exceptions import ApiException
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_SMS_BATCH_SIZE = 50
+DEFAULT_MAX_NOTIFICATIONS = 15
+DEFAULT_MAX_WORKERS = 8
+
+application_id_cache = aeriscache.TtlLruCache()
+"""Application IDs by (applications endpoint URL, API key, application short name), filled by get_applications. The
+URL holds the API host and account ID, and the API key is part of the key so that a call with another key is answered
+by the API. Replace it to change its size or TTL; a TTL of 0 disables it."""
+
+channel_index_cache = aeriscache.TtlLruCache()
+"""Notification channel IDs by application tag, by account ID, filled by get_channel_id_by_tag and
+get_channel_ids_by_tag. Replace it to change its size or TTL; a TTL of 0 disables it."""
+
+subscription_cache = aeriscache.TtlLruCache()
+"""SubscriptionIndex objects of inbound subscription lists by (account ID, INBOUND, application API key), since the
+list may depend on the application calling, and of outbound subscription lists by (account ID, OUTBOUND, application
+short name). Replace it to change its size or TTL; a TTL of 0 disables it.
+"""
+
+INBOUND = 'inbound'
+OUTBOUND = 'outbound'
+
+Subscription = collections.namedtuple('Subscription',
+                                      ['subscriptionId', 'direction', 'appShortNames', 'channelId', 'resource'])
+Subscription.__doc__ = """An inbound (MO-SMS) or outbound (MT delivery receipt) subscription.
+
+subscriptionId: the ID of the subscription
+direction: INBOUND or OUTBOUND
+appShortNames: the application short names the subscription is for, as a tuple
+channelId: the ID of the notification channel that the subscription notifies, or None if it notifies another URL
+resource: the subscription as returned by the API, as a dict
+"""
+
+SmsResult = collections.namedtuple('SmsResult', ['imsi', 'smsText', 'response', 'error', 'clientCorrelator',
+                                                 'segments'])
+SmsResult.__doc__ = """The outcome of sending an MT-SM to one recipient.
+
+response is the dict returned by AerFrame for the request that included this recipient, or None if the device was
+not found or does not support SMS. error is the exception raised while sending, or None if there was none.
+clientCorrelator is the clientCorrelator of that request, which its delivery receipts refer to. segments is the
+number of messages the text was sent as (see aerissegments.segment).
+"""
+
+LocationResult = collections.namedtuple('LocationResult', ['deviceIdType', 'deviceId', 'location', 'error'])
+LocationResult.__doc__ = """The outcome of a location lookup for one device.
+
+location is the dict returned by ``get_location``, or None if the lookup failed; error is the exception raised by
+the lookup, or None if there was none.
+"""
+
 
 def get_application_endpoint(accountId, appId=None):
     endpoint_base = aerisconfig.get_aerframe_api_url()
@@ -40,31 +98,41 @@ def ping(verbose):
     """
     # Check the AerFrame API:
     af_api_endpoint = get_application_endpoint('1')
-    r = requests.get(af_api_endpoint)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(af_api_endpoint)
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 401:  # We are expecting this since we don't have valid parameters
-        print('Endpoint is alive: ' + af_api_endpoint)
+        logger.info('Endpoint is alive: %s', af_api_endpoint)
     elif r.status_code == 404:
-        print('Not expecting a 404 ...')
-        aerisutils.print_http_error(r)
+        logger.warning('Not expecting a 404 ...')
+        aerisutils.log_http_error(logger, r)
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
 
     # Check Longpoll:
     af_lp_endpoint = aerisconfig.get_aerframe_longpoll_url()
-    r = requests.get(af_lp_endpoint)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(af_lp_endpoint)
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 403:  # We are expecting this since we don't have valid parameters
-        print('Endpoint is alive: ' + af_lp_endpoint)
+        logger.info('Endpoint is alive: %s', af_lp_endpoint)
     elif r.status_code == 404:
-        print('Not expecting a 404 ...')
-        aerisutils.print_http_error(r)
+        logger.warning('Not expecting a 404 ...')
+        aerisutils.log_http_error(logger, r)
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
 
 
-def get_applications(accountId, apiKey, searchAppShortName, verbose=False):
+def clear_caches():
+    """Forgets every cached application ID, channel index and subscription index.
+    """
+    application_id_cache.clear()
+    channel_index_cache.clear()
+    subscription_cache.clear()
+
+
+def get_applications(accountId, apiKey, searchAppShortName, verbose=False, useCache=True):
     """Gets a list of all registered applications for the account.
+    The IDs of every application in the list are stored in "application_id_cache", so later lookups of any of them
+    skip the list call until they expire.
 
     Parameters
     ----------
@@ -75,7 +143,9 @@ def get_applications(accountId, apiKey, searchAppShortName, verbose=False):
     searchAppShortName : str
         String short name of the application to search for
     verbose : bool, optional
-        True to enable verbose printing
+        True to enable verbose logging
+    useCache : bool, optional
+        False to always list the applications
 
     Returns
     -------
@@ -89,26 +159,44 @@ def get_applications(accountId, apiKey, searchAppShortName, verbose=False):
 
     """
     endpoint = get_application_endpoint(accountId)  # Get app endpoint based on account ID
+    if useCache:
+        appId = _cached_application_id(endpoint, apiKey, searchAppShortName)
+        if appId is not None:
+            return appId
     myparams = {'apiKey': apiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_applications(r, searchAppShortName, verbose, endpoint, apiKey)
+
+
+def _cached_application_id(applicationsUrl, apiKey, searchAppShortName):
+    appId = application_id_cache.get((applicationsUrl, apiKey, searchAppShortName))
+    if appId is not None:
+        logger.debug('%s application ID %s found in cache', searchAppShortName, appId)
+    return appId
+
+
+def _handle_get_applications(r, searchAppShortName, verbose, applicationsUrl=None, apiKey=None):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        apps = json.loads(r.text)
-        aerisutils.vprint(verbose, json.dumps(apps['application'], indent=4))  # Print formatted json
+        apps = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, '%s', aerisutils.LazyJson(apps['application']))
         searchAppShortNameExists = False
         searchAppShortNameId = None
         for app in apps['application']:  # Iterate applications to try and find application we are looking for
+            appId = app['resourceURL'].split('/applications/', 1)[1]
+            if applicationsUrl is not None:
+                application_id_cache.put((applicationsUrl, apiKey, app['applicationShortName']), appId)
             if app['applicationShortName'] == searchAppShortName:
                 searchAppShortNameExists = True
-                searchAppShortNameId = app['resourceURL'].split('/applications/', 1)[1]
+                searchAppShortNameId = appId
         if searchAppShortNameExists:
-            print(searchAppShortName + ' application exists. Application ID: ' + searchAppShortNameId)
+            logger.info('%s application exists. Application ID: %s', searchAppShortName, searchAppShortNameId)
             return searchAppShortNameId
         else:
-            print(searchAppShortName + ' application does not exist')
+            logger.info('%s application does not exist', searchAppShortName)
             return searchAppShortNameId
     else:  # Response code was not 200
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
@@ -124,7 +212,7 @@ def get_application_by_app_id(accountId, apiKey, appId, verbose=False):
     appId : str
         String version of the GUID app ID returned by the create_application call
     verbose : bool
-        True to enable verbose printing
+        True to enable verbose logging
 
     Returns
     -------
@@ -134,14 +222,18 @@ def get_application_by_app_id(accountId, apiKey, appId, verbose=False):
     """
     endpoint = get_application_endpoint(accountId, appId)  # Get app endpoint based on account ID and appID
     myparams = {'apiKey': apiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_application(r, verbose)
+
+
+def _handle_get_application(r, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        appConfig = json.loads(r.text)
-        aerisutils.vprint(verbose, json.dumps(appConfig))
+        appConfig = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, '%s', aerisutils.LazyJson(appConfig, indent=None))
         return appConfig
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
@@ -158,7 +250,7 @@ def create_application(accountId, apiKey, appShortName, appDescription='Applicat
     appShortName : str
         String to use for the short name of the application
     verbose : bool, optional
-        True to print verbose output
+        True to log verbose output
 
     Returns
     -------
@@ -171,20 +263,29 @@ def create_application(accountId, apiKey, appShortName, appDescription='Applicat
         in case of an API error.
     """
     endpoint = get_application_endpoint(accountId)  # Get app endpoint based on account ID
-    payload = {'applicationName': appShortName,
-               'description': appDescription,
-               'applicationShortName': appShortName,
-               'applicationTag': appShortName}
+    payload = _application_payload(appShortName, appDescription)
     myparams = {"apiKey": apiKey}
-    r = requests.post(endpoint, params=myparams, json=payload)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.post(endpoint, params=myparams, json=payload)
+    _invalidate_application_short_name(endpoint, appShortName)
+    return _handle_create_application(r, appShortName, verbose)
+
+
+def _application_payload(appShortName, appDescription):
+    return {'applicationName': appShortName,
+            'description': appDescription,
+            'applicationShortName': appShortName,
+            'applicationTag': appShortName}
+
+
+def _handle_create_application(r, appShortName, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 201:  # Check for 'created' http response
-        appConfig = json.loads(r.text)
-        print('Created application ' + appShortName)
-        aerisutils.vprint(verbose, 'Application info:\n' + json.dumps(appConfig, indent=4))
+        appConfig = aerisjson.loads(r.content)
+        logger.info('Created application %s', appShortName)
+        aerisutils.vlog(logger, verbose, 'Application info:\n%s', aerisutils.LazyJson(appConfig))
         return appConfig
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
@@ -200,7 +301,7 @@ def delete_application(accountId, apiKey, appId, verbose=False):
     appId : str
         String version of the GUID app ID returned by the create_application call
     verbose : bool, optional
-        True to print verbose output; currently unused.
+        True to log verbose output; currently unused.
 
     Returns
     -------
@@ -216,24 +317,37 @@ def delete_application(accountId, apiKey, appId, verbose=False):
     """
     endpoint = get_application_endpoint(accountId, appId)  # Get app endpoint based on account ID and appID
     myparams = {"apiKey": apiKey}
-    r = requests.delete(endpoint, params=myparams)
+    r = aerishttp.delete(endpoint, params=myparams)
+    _invalidate_application_id(get_application_endpoint(accountId), appId)
+    return _handle_delete_application(r)
+
+
+def _invalidate_application_short_name(applicationsUrl, appShortName):
+    application_id_cache.invalidate_if(lambda key, value: key[0] == applicationsUrl and key[2] == appShortName)
+
+
+def _invalidate_application_id(applicationsUrl, appId):
+    application_id_cache.invalidate_if(lambda key, value: key[0] == applicationsUrl and value == appId)
+
+
+def _handle_delete_application(r):
     if r.status_code == 204:  # Check for 'no content' http response
-        print('Application successfully deleted.')
+        logger.info('Application successfully deleted.')
         return True
     elif r.status_code == 404:  # Check if no matching app ID
-        print('Application ID does not match current application.')
+        logger.info('Application ID does not match current application.')
         return False
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
 # ========================================================================
 
 
-def get_channel_id_by_tag(accountId, apiKey, searchAppTag, verbose=False):
+def get_channel_id_by_tag(accountId, apiKey, searchAppTag, verbose=False, useCache=True):
     """Gets a channel's ID by its application tag. If there are multiple channels with the same application tag, returns
-    only one of them.
+    only the last one listed; see get_channel_ids_by_tag.
     Parameters
     ----------
     accountId: str
@@ -241,6 +355,8 @@ def get_channel_id_by_tag(accountId, apiKey, searchAppTag, verbose=False):
     searchAppTag: str
         the application tag that the channel was created with
     verbose: bool
+    useCache: bool, optional
+        False to always list the channels
 
     Returns
     -------
@@ -253,33 +369,76 @@ def get_channel_id_by_tag(accountId, apiKey, searchAppTag, verbose=False):
         if there was an API problem.
 
     """
+    return _channel_id_by_tag(_get_channel_index(accountId, apiKey, verbose, useCache), searchAppTag)
+
+
+def get_channel_ids_by_tag(accountId, apiKey, searchAppTag, verbose=False, useCache=True):
+    """Gets the IDs of every channel with an application tag.
+    The channels are listed once and indexed by application tag in "channel_index_cache", so later lookups of any tag
+    skip the list call until the index expires, or a channel is created or deleted.
+    Parameters
+    ----------
+    accountId: str
+    apiKey: str
+    searchAppTag: str
+        the application tag that the channels were created with
+    verbose: bool
+    useCache: bool, optional
+        False to always list the channels
+
+    Returns
+    -------
+    list
+        The channel IDs, in the order they were listed; empty if none were found
+
+    Raises
+    ------
+    ApiException
+        if there was an API problem.
+
+    """
+    return list(_get_channel_index(accountId, apiKey, verbose, useCache).get(searchAppTag, ()))
+
+
+def _get_channel_index(accountId, apiKey, verbose, useCache):
+    if useCache:
+        index = channel_index_cache.get(accountId)
+        if index is not None:
+            return index
     endpoint = get_channel_endpoint(accountId)
     myparams = {'apiKey': apiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_channel_index(r, verbose, accountId)
+
+
+def _handle_get_channel_index(r, verbose, accountId=None):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        channels = json.loads(r.text)
-        aerisutils.vprint(verbose, json.dumps(channels['notificationChannel'], indent=4))  # Print formatted json
-        searchAppTagExists = False
-        searchAppTagId = None
-        sdkchannel = None
-        for channel in channels['notificationChannel']:  # Iterate channels to try and find sdk application
-            if channel['applicationTag'] == searchAppTag:
-                searchAppTagExists = True
-                sdkchannel = channel
-                searchAppTagId = channel['resourceURL'].split('/channels/', 1)[1]
-        if searchAppTagExists:
-            print(searchAppTag + ' channel exists. Channel ID: ' + searchAppTagId)
-            aerisutils.vprint(verbose, 'Channel config: ' + json.dumps(sdkchannel, indent=4))
-            return searchAppTagId
-        else:
-            print(searchAppTag + ' channel does not exist')
-            return searchAppTagId
+        channels = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, '%s', aerisutils.LazyJson(channels['notificationChannel']))
+        index = {}
+        for channel in channels['notificationChannel']:
+            channelId = channel['resourceURL'].rsplit('/', 1)[-1]
+            index.setdefault(channel['applicationTag'], []).append(channelId)
+        index = {tag: tuple(channelIds) for tag, channelIds in index.items()}
+        if accountId is not None:
+            channel_index_cache.put(accountId, index)
+        return index
     else:  # Response code was not 200
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
+def _channel_id_by_tag(index, searchAppTag):
+    channelIds = index.get(searchAppTag)
+    if channelIds:
+        logger.info('%s channel exists. Channel ID: %s', searchAppTag, channelIds[-1])
+        return channelIds[-1]
+    else:
+        logger.info('%s channel does not exist', searchAppTag)
+        return None
+
+
 def get_channel(accountId, apiKey, channelId, verbose=False):
     """Gets details of a channel.
 
@@ -302,21 +461,25 @@ def get_channel(accountId, apiKey, channelId, verbose=False):
     """
     endpoint = get_channel_endpoint(accountId, channelId)
     myparams = {'apiKey': apiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_channel(r, verbose)
+
+
+def _handle_get_channel(r, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        channelConfig = json.loads(r.text)
-        aerisutils.vprint(verbose, json.dumps(channelConfig))
+        channelConfig = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, '%s', aerisutils.LazyJson(channelConfig, indent=None))
         return channelConfig
     elif r.status_code == 404:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         return None
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
-def create_channel(accountId, apiKey, applicationTag, verbose=False):
+def create_channel(accountId, apiKey, applicationTag, verbose=False, maxNotifications=DEFAULT_MAX_NOTIFICATIONS):
     """Creates a channel
 
     Parameters
@@ -326,6 +489,8 @@ def create_channel(accountId, apiKey, applicationTag, verbose=False):
     applicationTag: str
         a tag for this channel
     verbose: bool, optional
+    maxNotifications: int, optional
+        the most notifications that one poll of the channel returns
 
     Returns
     -------
@@ -338,21 +503,30 @@ def create_channel(accountId, apiKey, applicationTag, verbose=False):
         if there was a problem
     """
     endpoint = get_channel_endpoint(accountId)
-    channelData = {'maxNotifications': '15',
-                   'type': 'nc:LongPollingData'}
-    payload = {'applicationTag': applicationTag,
-               'channelData': channelData,
-               'channelType': 'LongPolling'}
+    payload = _channel_payload(applicationTag, maxNotifications)
     myparams = {"apiKey": apiKey}
-    r = requests.post(endpoint, params=myparams, json=payload)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.post(endpoint, params=myparams, json=payload)
+    channel_index_cache.invalidate(accountId)
+    return _handle_create_channel(r, applicationTag, verbose)
+
+
+def _channel_payload(applicationTag, maxNotifications=DEFAULT_MAX_NOTIFICATIONS):
+    channelData = {'maxNotifications': str(maxNotifications),
+                   'type': 'nc:LongPollingData'}
+    return {'applicationTag': applicationTag,
+            'channelData': channelData,
+            'channelType': 'LongPolling'}
+
+
+def _handle_create_channel(r, applicationTag, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:  # In this case, we get a 200 for success rather than 201 like for application
-        channelConfig = json.loads(r.text)
-        print('Created notification channel for ' + applicationTag)
-        aerisutils.vprint(verbose, 'Notification channel info:\n' + json.dumps(channelConfig, indent=4))
+        channelConfig = aerisjson.loads(r.content)
+        logger.info('Created notification channel for %s', applicationTag)
+        aerisutils.vlog(logger, verbose, 'Notification channel info:\n%s', aerisutils.LazyJson(channelConfig))
         return channelConfig
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
@@ -379,15 +553,20 @@ def delete_channel(accountId, apiKey, channelId, verbose=False):
     """
     endpoint = get_channel_endpoint(accountId, channelId)
     myparams = {"apiKey": apiKey}
-    r = requests.delete(endpoint, params=myparams)
+    r = aerishttp.delete(endpoint, params=myparams)
+    channel_index_cache.invalidate(accountId)
+    return _handle_delete_channel(r)
+
+
+def _handle_delete_channel(r):
     if r.status_code == 204:  # Check for 'no content' http response
-        print('Channel successfully deleted.')
+        logger.info('Channel successfully deleted.')
         return True
     elif r.status_code == 404:  # Check if no matching channel ID
-        print('Channel ID does not match current application.')
+        logger.info('Channel ID does not match current application.')
         return False
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
@@ -395,7 +574,7 @@ def delete_channel(accountId, apiKey, channelId, verbose=False):
 
 
 def get_subscriptions_by_app_short_name(accountId, appApiKey, appShortName, verbose=False):
-    """Prints the subscription ID for an inbound and an outbound subscription for the application given by appShortName
+    """Logs the subscription ID for an inbound and an outbound subscription for the application given by appShortName
 
     Parameters
     ----------
@@ -406,7 +585,7 @@ def get_subscriptions_by_app_short_name(accountId, appApiKey, appShortName, verb
     appShortName: str
         The short name of the application
     verbose: bool
-        True to print verbose output.
+        True to log verbose output.
 
     Returns
     -------
@@ -416,9 +595,9 @@ def get_subscriptions_by_app_short_name(accountId, appApiKey, appShortName, verb
     get_outbound_subscription_id_by_app_short_name(accountId, appApiKey, appShortName, verbose)
 
 
-def get_inbound_subscription_by_app_short_name(accountId, appApiKey, appShortName, verbose=False):
+def get_inbound_subscription_by_app_short_name(accountId, appApiKey, appShortName, verbose=False, useCache=True):
     """
-    Prints and returns the subscription ID of the first inbound subscription for the application given by appShortName
+    Logs and returns the subscription ID of the first inbound subscription for the application given by appShortName
 
     Parameters
     ----------
@@ -429,7 +608,9 @@ def get_inbound_subscription_by_app_short_name(accountId, appApiKey, appShortNam
     appShortName: str
         The short name of the application
     verbose: bool
-        True to print verbose output.
+        True to log verbose output.
+    useCache: bool, optional
+        False to always list the inbound subscriptions
 
     Returns
     -------
@@ -441,29 +622,11 @@ def get_inbound_subscription_by_app_short_name(accountId, appApiKey, appShortNam
     ApiException
         if there was another problem with the API.
     """
-    endpoint = aerisconfig.get_aerframe_api_url() + '/smsmessaging/v2/' + accountId + '/inbound/subscriptions'
-    myparams = {'apiKey': appApiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
-    if r.status_code == 200:
-        subscriptions = json.loads(r.text)
-        aerisutils.vprint(verbose, json.dumps(subscriptions['subscription'], indent=4))  # Print formatted json
-        if 'subscription' not in subscriptions.keys():
-            print(f'No inbound subscriptions for application short name {appShortName}')
-            return None
-        print('Inbound subscriptions:\n')
-        for subscription in subscriptions['subscription']:  # Iterate subscriptions to try and find sdk application
-            print(subscription['destinationAddress'])
-            if appShortName in subscription['destinationAddress']:
-                subscription_id = subscription['resourceURL'].split('/')[-1]
-                print(appShortName + ' inbound subscription ID: ' + subscription_id)
-                return subscription_id
-    else:  # Response code was not 200
-        aerisutils.print_http_error(r)
-        raise ApiException('HTTP status code was: ' + str(r.status_code), r)
+    index = _get_inbound_subscription_index(accountId, appApiKey, verbose, useCache)
+    return _first_subscription_id(index, appShortName, INBOUND)
 
 
-def get_outbound_subscription_id_by_app_short_name(accountId, appApiKey, appShortName, verbose=False):
+def get_outbound_subscription_id_by_app_short_name(accountId, appApiKey, appShortName, verbose=False, useCache=True):
     """Gets the Subscription ID of the first outbound subscription for the application given by appShortName
 
     Parameters
@@ -475,7 +638,9 @@ def get_outbound_subscription_id_by_app_short_name(accountId, appApiKey, appShor
     appShortName: str
         The short name of the application
     verbose: bool
-        True to print verbose output.
+        True to log verbose output.
+    useCache: bool, optional
+        False to always list the outbound subscriptions
 
     Returns
     -------
@@ -488,28 +653,168 @@ def get_outbound_subscription_id_by_app_short_name(accountId, appApiKey, appShor
         if there was another problem with the API.
 
     """
+    index = _get_outbound_subscription_index(accountId, appApiKey, appShortName, verbose, useCache)
+    return _first_subscription_id(index, appShortName, OUTBOUND)
+
+
+def find_subscriptions(accountId, appApiKey, appShortName, direction=None, channelId=None, verbose=False,
+                       useCache=True):
+    """Finds the subscriptions of an application.
+    Each subscription list is fetched once and indexed in "subscription_cache", so later lookups skip the list calls
+    until the index expires, or an outbound subscription of the application is created or deleted.
+
+    Parameters
+    ----------
+    accountId: str
+        The account ID that owns the application
+    appApiKey: str
+        The application API key for the application
+    appShortName: str
+        The short name of the application; must match a destination address exactly
+    direction: str, optional
+        INBOUND (MO-SMS) or OUTBOUND (MT delivery receipt) to find only one kind of subscription
+    channelId: str, optional
+        The ID of a notification channel, to find only the subscriptions that notify it
+    verbose: bool, optional
+        True to log verbose output.
+    useCache: bool, optional
+        False to always list the subscriptions
+
+    Returns
+    -------
+    list
+        Subscription tuples; inbound subscriptions first
+
+    Raises
+    ------
+    ApiException
+        if there was a problem with the API.
+    """
+    found = []
+    if direction in (None, INBOUND):
+        index = _get_inbound_subscription_index(accountId, appApiKey, verbose, useCache)
+        found.extend(index.find(appShortName, INBOUND, channelId))
+    if direction in (None, OUTBOUND):
+        index = _get_outbound_subscription_index(accountId, appApiKey, appShortName, verbose, useCache)
+        found.extend(index.find(appShortName, OUTBOUND, channelId))
+    return found
+
+
+class SubscriptionIndex:
+    """
+    The subscriptions of one subscription list, indexed by application short name and direction, and by callback
+    channel ID. Built by the subscription lookups of this module; not modified after it is built.
+    """
+
+    def __init__(self, subscriptions):
+        self.subscriptions = tuple(subscriptions)
+        self._by_app = {}
+        self._by_channel = {}
+        for subscription in self.subscriptions:
+            for appShortName in subscription.appShortNames:
+                self._by_app.setdefault((appShortName, subscription.direction), []).append(subscription)
+            if subscription.channelId is not None:
+                self._by_channel.setdefault(subscription.channelId, []).append(subscription)
+
+    def find(self, appShortName=None, direction=None, channelId=None):
+        """
+        Returns the subscriptions that match every given criterion exactly, in the order they were listed.
+        """
+        if appShortName is not None:
+            directions = (direction,) if direction is not None else (INBOUND, OUTBOUND)
+            found = [s for d in directions for s in self._by_app.get((appShortName, d), ())]
+        elif channelId is not None:
+            found = list(self._by_channel.get(channelId, ()))
+        else:
+            found = list(self.subscriptions)
+        return [s for s in found
+                if (direction is None or s.direction == direction) and (channelId is None or s.channelId == channelId)]
+
+
+def _inbound_subscriptions_key(accountId, appApiKey):
+    return (accountId, INBOUND, appApiKey)
+
+
+def _outbound_subscriptions_key(accountId, appShortName):
+    return (accountId, OUTBOUND, appShortName)
+
+
+def _invalidate_outbound_subscriptions(accountId, appShortName):
+    subscription_cache.invalidate(_outbound_subscriptions_key(accountId, appShortName))
+
+
+def _get_inbound_subscription_index(accountId, appApiKey, verbose, useCache):
+    if useCache:
+        index = subscription_cache.get(_inbound_subscriptions_key(accountId, appApiKey))
+        if index is not None:
+            return index
+    endpoint = aerisconfig.get_aerframe_api_url() + '/smsmessaging/v2/' + accountId + '/inbound/subscriptions'
+    myparams = {'apiKey': appApiKey}
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_inbound_subscription_index(r, verbose, accountId, appApiKey)
+
+
+def _get_outbound_subscription_index(accountId, appApiKey, appShortName, verbose, useCache):
+    if useCache:
+        index = subscription_cache.get(_outbound_subscriptions_key(accountId, appShortName))
+        if index is not None:
+            return index
     url = aerisconfig.get_aerframe_api_url()
     endpoint = url + '/smsmessaging/v2/' + accountId + '/outbound/' + appShortName + '/subscriptions'
     myparams = {'apiKey': appApiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_outbound_subscription_index(r, appShortName, verbose, accountId)
+
+
+def _subscription(subscriptionJson, direction, appShortNames):
+    notifyURL = subscriptionJson.get('callbackReference', {}).get('notifyURL', '')
+    channelId = None
+    if '/channels/' in notifyURL:
+        channelId = notifyURL.split('/channels/', 1)[1].split('/', 1)[0]
+    return Subscription(subscriptionJson['resourceURL'].rsplit('/', 1)[-1], direction, tuple(appShortNames),
+                        channelId, subscriptionJson)
+
+
+def _handle_get_inbound_subscription_index(r, verbose, accountId=None, appApiKey=None):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        subscriptions = json.loads(r.text)
-        if 'deliveryReceiptSubscription' in subscriptions.keys():
-            aerisutils.vprint(verbose, appShortName + ' has outbound (MT-DR) subscriptions.' + json.dumps(subscriptions,
-                                                                                                          indent=4))
-            subscriptionId \
-                = subscriptions['deliveryReceiptSubscription'][0]['resourceURL'].split('/subscriptions/', 1)[1]
-            print(appShortName + ' outbound subscription ID: ' + subscriptionId)
-            return subscriptionId
-        else:
-            print(appShortName + ' has no outbound (MT-DR) subscriptions.')
-            return None
+        subscriptions = aerisjson.loads(r.content).get('subscription', [])
+        aerisutils.vlog(logger, verbose, 'Inbound subscriptions:\n%s', aerisutils.LazyJson(subscriptions))
+        index = SubscriptionIndex(_subscription(subscription, INBOUND, subscription.get('destinationAddress', []))
+                                  for subscription in subscriptions)
+        if accountId is not None:
+            subscription_cache.put(_inbound_subscriptions_key(accountId, appApiKey), index)
+        return index
+    else:  # Response code was not 200
+        aerisutils.log_http_error(logger, r)
+        raise ApiException('HTTP status code was: ' + str(r.status_code), r)
+
+
+def _handle_get_outbound_subscription_index(r, appShortName, verbose, accountId=None):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
+    if r.status_code == 200:
+        subscriptions = aerisjson.loads(r.content).get('deliveryReceiptSubscription', [])
+        aerisutils.vlog(logger, verbose, '%s outbound (MT-DR) subscriptions:\n%s', appShortName,
+                        aerisutils.LazyJson(subscriptions))
+        index = SubscriptionIndex(_subscription(subscription, OUTBOUND, [appShortName])
+                                  for subscription in subscriptions)
+        if accountId is not None:
+            subscription_cache.put(_outbound_subscriptions_key(accountId, appShortName), index)
+        return index
     else:  # Response code was not 200
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was: ' + str(r.status_code), r)
 
 
+def _first_subscription_id(index, appShortName, direction):
+    subscriptions = index.find(appShortName, direction)
+    if subscriptions:
+        logger.info('%s %s subscription ID: %s', appShortName, direction, subscriptions[0].subscriptionId)
+        return subscriptions[0].subscriptionId
+    logger.info('%s has no %s subscriptions.', appShortName, direction)
+    return None
+
+
 def get_outbound_subscription(accountId, appApiKey, appShortName, subscriptionId, verbose=False):
     """Gets the details of an outbound subscription, given its subscription ID
     and the short name of the associated application.
@@ -525,7 +830,7 @@ def get_outbound_subscription(accountId, appApiKey, appShortName, subscriptionId
     subscriptionId: str
         The ID of the subscription
     verbose: bool, optional
-        True to print verbose output.
+        True to log verbose output.
 
     Returns
     -------
@@ -540,15 +845,19 @@ def get_outbound_subscription(accountId, appApiKey, appShortName, subscriptionId
     url = aerisconfig.get_aerframe_api_url()
     endpoint = url + '/smsmessaging/v2/' + accountId + '/outbound/' + appShortName + '/subscriptions/' + subscriptionId
     myparams = {'apiKey': appApiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_outbound_subscription(r, verbose)
+
+
+def _handle_get_outbound_subscription(r, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        subscription = json.loads(r.text)
+        subscription = aerisjson.loads(r.content)
         return subscription
     if r.status_code == 404:
         return None
     else:  # Response code was not 200
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was: ' + str(r.status_code), r)
 
 
@@ -566,7 +875,7 @@ def create_outbound_subscription(accountId, appApiKey, appShortName, appChannelI
     appChannelId: str
         The ID of a notification channel associated with the application identified by appShortName
     verbose: bool, optional
-        True to print verbose output.
+        True to log verbose output.
     Returns
     -------
     dict
@@ -578,24 +887,33 @@ def create_outbound_subscription(accountId, appApiKey, appShortName, appChannelI
     """
     url = aerisconfig.get_aerframe_api_url()
     endpoint = url + '/smsmessaging/v2/' + accountId + '/outbound/' + appShortName + '/subscriptions'
+    notifyURL = get_channel_endpoint(accountId, appChannelId) + '/callback'
+    payload = _outbound_subscription_payload(appShortName, notifyURL)
+    myparams = {"apiKey": appApiKey}
+    r = aerishttp.post(endpoint, params=myparams, json=payload)
+    _invalidate_outbound_subscriptions(accountId, appShortName)
+    return _handle_create_outbound_subscription(r, appShortName, verbose)
+
+
+def _outbound_subscription_payload(appShortName, notifyURL):
     callbackReference = {
         'callbackData': appShortName + '-mt',
-        'notifyURL': aerisconfig.get_aerframe_api_url() + '/notificationchannel/v2/'
-        + accountId + '/channels/' + appChannelId + '/callback'
+        'notifyURL': notifyURL
     }
-    payload = {'callbackReference': callbackReference,
-               'filterCriteria': 'SP:*',  # Could use SP:Aeris as example of service profile
-               'destinationAddress': [appShortName]}
-    myparams = {"apiKey": appApiKey}
-    r = requests.post(endpoint, params=myparams, json=payload)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    return {'callbackReference': callbackReference,
+            'filterCriteria': 'SP:*',  # Could use SP:Aeris as example of service profile
+            'destinationAddress': [appShortName]}
+
+
+def _handle_create_outbound_subscription(r, appShortName, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 201:  # In this case, we get a 201 'created' for success
-        subscriptionConfig = json.loads(r.text)
-        print('Created outbound (MT-DR) subscription for ' + appShortName)
-        aerisutils.vprint(verbose, 'Subscription info:\n' + json.dumps(subscriptionConfig, indent=4))
+        subscriptionConfig = aerisjson.loads(r.content)
+        logger.info('Created outbound (MT-DR) subscription for %s', appShortName)
+        aerisutils.vlog(logger, verbose, 'Subscription info:\n%s', aerisutils.LazyJson(subscriptionConfig))
         return subscriptionConfig
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was: ' + str(r.status_code), r)
 
 
@@ -613,7 +931,7 @@ def delete_outbound_subscription(accountId, appApiKey, appShortName, subscriptio
     subscriptionId: str
         The ID of the subscription to delete.
     verbose: bool, optional
-        True to print verbose output.
+        True to log verbose output.
 
     Returns
     -------
@@ -628,22 +946,27 @@ def delete_outbound_subscription(accountId, appApiKey, appShortName, subscriptio
     url = aerisconfig.get_aerframe_api_url()
     endpoint = url + '/smsmessaging/v2/' + accountId + '/outbound/' + appShortName + '/subscriptions/' + subscriptionId
     myparams = {"apiKey": appApiKey}
-    r = requests.delete(endpoint, params=myparams)
+    r = aerishttp.delete(endpoint, params=myparams)
+    _invalidate_outbound_subscriptions(accountId, appShortName)
+    return _handle_delete_outbound_subscription(r)
+
+
+def _handle_delete_outbound_subscription(r):
     if r.status_code == 204:  # Check for 'no content' http response
-        print('Subscription successfully deleted.')
+        logger.info('Subscription successfully deleted.')
         return True
     elif r.status_code == 404:  # Check if no matching subscription ID
-        print('Subscription ID does not match current application.')
+        logger.info('Subscription ID does not match current application.')
         return False
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was: ' + str(r.status_code), r)
 
 
 # ========================================================================
 
 
-def send_mt_sms(accountId, apiKey, appShortName, imsiDestination, smsText, verbose=False):
+def send_mt_sms(accountId, apiKey, appShortName, imsiDestination, smsText, verbose=False, clientCorrelator=None):
     """Sends a Mobile-Terminated Short Message (MT-SM) to a device.
 
     Parameters
@@ -659,7 +982,10 @@ def send_mt_sms(accountId, apiKey, appShortName, imsiDestination, smsText, verbo
     smsText: str
         The text payload to send to the device.
     verbose: bool, optional
-        True to enable verbose printing.
+        True to enable verbose logging.
+    clientCorrelator: str, optional
+        The clientCorrelator to send the MT-SM with, which its delivery receipts refer to. Defaults to a new, unique
+        one (see aeriscorrelation.new_client_correlator), which is returned in the response.
 
     Returns
     -------
@@ -673,31 +999,132 @@ def send_mt_sms(accountId, apiKey, appShortName, imsiDestination, smsText, verbo
     """
     url = aerisconfig.get_aerframe_api_url()
     endpoint = f'{url}/smsmessaging/v2/{accountId}/outbound/{appShortName}/requests'
-    address = [imsiDestination]
-    outboundSMSTextMessage = {"message": smsText}
-    payload = {'address': address,
-               'senderAddress': appShortName,
-               'outboundSMSTextMessage': outboundSMSTextMessage,
-               'clientCorrelator': '123456',
-               'senderName': appShortName}
+    payload = _mt_sms_payload(appShortName, [imsiDestination], smsText, clientCorrelator)
     myparams = {"apiKey": apiKey}
-    # print('Payload: \n' + json.dumps(payload, indent=4))
-    r = requests.post(endpoint, params=myparams, json=payload)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.post(endpoint, params=myparams, json=payload)
+    return _handle_send_mt_sms(r, verbose)
+
+
+def _mt_sms_payload(appShortName, address, smsText, clientCorrelator=None):
+    outboundSMSTextMessage = {"message": smsText}
+    return {'address': address,
+            'senderAddress': appShortName,
+            'outboundSMSTextMessage': outboundSMSTextMessage,
+            'clientCorrelator': clientCorrelator or aeriscorrelation.new_client_correlator(),
+            'senderName': appShortName}
+
+
+def _handle_send_mt_sms(r, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 201:  # In this case, we get a 201 'created' for success
-        sendsmsresponse = json.loads(r.text)
-        print('Sent SMS:\n' + json.dumps(sendsmsresponse, indent=4))
+        sendsmsresponse = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, 'Sent SMS:\n%s', aerisutils.LazyJson(sendsmsresponse))
         return sendsmsresponse
     elif r.status_code == 404:  # Check if no matching device IMSI or IMSI not support SMS
-        print('IMSI is not found or does not support SMS.')
-        print(r.text)
+        logger.info('IMSI is not found or does not support SMS.\n%s', r.text)
         return None
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
 
 
-def poll_notification_channel(accountId, apiKey, channelURL, verbose=False):
+def send_mt_sms_batch(accountId, apiKey, appShortName, recipients, smsText=None,
+                      batchSize=DEFAULT_SMS_BATCH_SIZE, maxWorkers=DEFAULT_MAX_WORKERS, verbose=False,
+                      transliterate=False):
+    """Sends Mobile-Terminated Short Messages (MT-SMs) to many devices.
+
+    Recipients that get the same text are grouped into requests of up to batchSize addresses each, and up to
+    maxWorkers requests are sent at the same time.
+
+    Parameters
+    ----------
+    accountId: str
+        The account ID that owns the destination devices.
+    apiKey: str
+        An API key for the account.
+    appShortName: str
+        The application short name.
+    recipients: iterable
+        The IMSIs of the destination devices, each either a str (to send smsText) or an (IMSI, text) pair.
+    smsText: str, optional
+        The text payload to send to recipients given without their own text.
+    batchSize: int, optional
+        The maximum number of addresses per request.
+    maxWorkers: int, optional
+        The maximum number of requests in flight at once.
+    verbose: bool, optional
+        True to enable verbose logging.
+    transliterate: bool, optional
+        True to replace characters outside the GSM-7 alphabet where possible (see aerissegments.transliterate), so
+        that texts are sent as GSM-7 rather than UCS-2 and in fewer messages.
+
+    Returns
+    -------
+    list
+        One SmsResult per recipient, with the text as given. If a request fails, every recipient in it gets the
+        same ApiException (or transport error) as its "error". If a request of several addresses is rejected because
+        a device was not found, its recipients are retried one at a time so that one unknown IMSI does not fail the
+        others. This relies on the API rejecting such a request as a whole (HTTP 404) without sending the MT-SM to
+        any of its addresses. Each retry is sent with a clientCorrelator derived from the request's and the IMSI
+        (see aeriscorrelation.derive_client_correlator), which is the one reported in its SmsResult.
+    """
+    url = aerisconfig.get_aerframe_api_url()
+    endpoint = f'{url}/smsmessaging/v2/{accountId}/outbound/{appShortName}/requests'
+    myparams = {"apiKey": apiKey}
+
+    def send_batch(address, text, clientCorrelator):
+        payload = _mt_sms_payload(appShortName, address, text, clientCorrelator)
+        r = aerishttp.post(endpoint, params=myparams, json=payload)
+        return _handle_send_mt_sms(r, verbose)
+
+    return _send_mt_sms_batches(send_batch, recipients, smsText, batchSize, maxWorkers, transliterate)
+
+
+def _send_mt_sms_batches(send_batch, recipients, smsText, batchSize, maxWorkers, transliterate=False):
+    """
+    Groups recipients by text into batches of at most batchSize addresses, calls
+    send_batch(address, text, clientCorrelator) for each batch with a new clientCorrelator and at most maxWorkers in
+    flight, and returns one SmsResult per recipient. Each distinct text is segmented (and transliterated) once.
+    """
+    if batchSize < 1:
+        raise ValueError('batchSize must be at least 1')
+    addresses_by_text = {}
+    for recipient in recipients:
+        if isinstance(recipient, str):
+            if smsText is None:
+                raise ValueError('smsText is required for recipients given without their own text')
+            imsi, text = recipient, smsText
+        else:
+            imsi, text = recipient
+        addresses_by_text.setdefault(text, []).append(imsi)
+
+    segments = {text: aerissegments.segment(text, transliterate) for text in addresses_by_text}
+    batches = [(address[i:i + batchSize], text, aeriscorrelation.new_client_correlator())
+               for text, address in addresses_by_text.items()
+               for i in range(0, len(address), batchSize)]
+
+    def send(batch):
+        address, text, clientCorrelator = batch
+        sent = segments[text].text
+        response = send_batch(address, sent, clientCorrelator)
+        if response is None and len(address) > 1:
+            # the API rejects the whole request if any device is unknown; find out which ones
+            retries = [(imsi, aeriscorrelation.derive_client_correlator(clientCorrelator, imsi)) for imsi in address]
+            return [(imsi, send_batch([imsi], sent, retry), retry) for imsi, retry in retries]
+        return [(imsi, response, clientCorrelator) for imsi in address]
+
+    results = []
+    for (address, text, clientCorrelator), responses, error in aerisutils.imap_unordered(send, batches, maxWorkers):
+        parts = len(segments[text].parts)
+        if error is None:
+            results.extend(SmsResult(imsi, text, response, None, correlator, parts)
+                           for imsi, response, correlator in responses)
+        else:
+            results.extend(SmsResult(imsi, text, None, error, clientCorrelator, parts) for imsi in address)
+    return results
+
+
+def poll_notification_channel(accountId, apiKey, channelURL, verbose=False, timeout=None):
     """
     Polls a notification channel for notifications.
 
@@ -710,7 +1137,10 @@ def poll_notification_channel(accountId, apiKey, channelURL, verbose=False):
     channelURL: str
         The URL of the notification channel to poll. See method ``get_channel`` for details of a notification channel.
     verbose: bool, optional
-        True to verbosely print.
+        True to verbosely log.
+    timeout: float or tuple, optional
+        The connect and read timeouts in seconds, as for requests. The read timeout should be longer than the time the
+        server holds a long-poll open.
 
     Returns
     -------
@@ -723,22 +1153,27 @@ def poll_notification_channel(accountId, apiKey, channelURL, verbose=False):
         if there was a problem.
     """
     myparams = {'apiKey': apiKey}
-    print('Polling channelURL for polling interval: ' + channelURL)
-    r = requests.get(channelURL, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    aerisutils.vlog(logger, verbose, 'Polling channelURL for polling interval: %s', channelURL)
+    r = aerishttp.get(channelURL, params=myparams, timeout=timeout)
+    return _handle_poll_notification_channel(r, verbose)
+
+
+def _handle_poll_notification_channel(r, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        notifications = json.loads(r.text)
-        aerisutils.vprint(verbose, 'MO SMS and MT SMS DR:\n' + json.dumps(notifications, indent=4))
+        notifications = aerisjson.loads(r.content)
+        aerisutils.vlog(logger, verbose, 'MO SMS and MT SMS DR:\n%s', aerisutils.LazyJson(notifications))
         return notifications
     else:  # Response code was not 200
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was: ' + str(r.status_code), r)
 
 
-def notifications_flush_search(accountId, apiKey, channelURL, num, search, verbose=True):
+def notifications_flush_search(accountId, apiKey, channelURL, num, search, verbose=True, limit=None):
     """
-    Polls an AerFrame Notification Channel until there are no MT-SM delivery
-    receipts remaining, or num polls have completed, whichever happens first.
+    Polls an AerFrame Notification Channel until a poll returns no notifications, num polls have completed, or
+    "limit" notifications have matched the search, whichever happens first.
+    Every notification polled is removed from the channel, whether it matches or not.
 
     Parameters
     ----------
@@ -750,27 +1185,48 @@ def notifications_flush_search(accountId, apiKey, channelURL, num, search, verbo
         The URL of the notification channel to poll. See the 'get_channel' method for details of a notification channel.
     num: int
         The maximum number of polls to issue.
-    search: str
-        Unused.
+    search: str, function or None
+        What to look for: an aerisfilters.NotificationFilter, or any function that takes an aerisfilters.Notification
+        and returns True for a match; a str, to find MO-SMs whose text contains it; or None, to match everything.
     verbose: bool, optional
-        True to print all notifications encountered, plus verbose information.
-        If set to False, may omit information you wanted printed.
+        True to log all notifications encountered, plus verbose information, at INFO level.
+        If set to False, those are only logged at DEBUG level.
         True by default.
+    limit: int, optional
+        Stop once this many notifications have matched.
 
     Returns
     -------
-    None
+    list
+        The aerisfilters.Notification tuples that matched, in the order they were received.
     """
-    print('Polling channelURL for polling interval: ' + channelURL)
+    if search is None:
+        def matches(notification):
+            return True
+    elif isinstance(search, str):
+        matches = aerisfilters.NotificationFilter(text=search)
+    else:
+        matches = search
+    found = []
+    aerisutils.vlog(logger, verbose, 'Polling channelURL for polling interval: %s', channelURL)
     for x in range(num):  # Poll up to num times
         notifications = poll_notification_channel(accountId, apiKey, channelURL, verbose)
-        if notifications is not None:
-            if len(notifications['deliveryInfoNotification']) == 0:
-                print('No pending notifications')
-                return None
-            else:
-                num_notifications = len(notifications['deliveryInfoNotification'][0]['deliveryInfo'])
-                print('Number of notifications = ' + str(num_notifications))
+        received = 0
+        for notification in aerisfilters.iter_notifications(notifications):
+            received += 1
+            if matches(notification):
+                found.append(notification)
+                aerisutils.vlog(logger, verbose, 'Matching %s notification: %s', notification.kind,
+                                aerisutils.LazyJson(notification.data, indent=None))
+                if limit is not None and len(found) >= limit:
+                    logger.info('Found %s matching notifications', len(found))
+                    return found
+        if received == 0:
+            logger.info('No pending notifications')
+            break
+        logger.info('Number of notifications = %s', received)
+    logger.info('Found %s matching notifications', len(found))
+    return found
 
 
 def get_location(accountId, apiKey, deviceIdType, deviceId, verbose=False):
@@ -787,7 +1243,7 @@ def get_location(accountId, apiKey, deviceIdType, deviceId, verbose=False):
     deviceId: str
         The device ID.
     verbose: bool, optional
-        True to verbosely print output.
+        True to verbosely log output.
 
     Returns
     -------
@@ -802,11 +1258,57 @@ def get_location(accountId, apiKey, deviceIdType, deviceId, verbose=False):
     url = aerisconfig.get_aerframe_api_url()
     endpoint = f'{url}/networkservices/v2/{accountId}/devices/{deviceIdType}/{deviceId}/networkLocation'
     myparams = {'apiKey': apiKey}
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_location(r, verbose)
+
+
+def _handle_get_location(r, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if r.status_code == 200:
-        locationInfo = json.loads(r.text)
+        locationInfo = aerisjson.loads(r.content)
         return locationInfo
     else:  # Response code was not 200
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
         raise ApiException('HTTP status code was ' + str(r.status_code), r)
+
+
+def get_locations(accountId, apiKey, devices, maxWorkers=DEFAULT_MAX_WORKERS, verbose=False):
+    """Gets information about the locations of many devices, with several requests in flight at once.
+
+    Devices are taken from the iterable only as earlier requests complete, so it may be a generator over a fleet of
+    any size.
+
+    Parameters
+    ----------
+    accountId: str
+        The account ID that owns the devices.
+    apiKey: str
+        An API key for the account ID.
+    devices: iterable
+        Of (deviceIdType, deviceId) pairs; see ``get_location``.
+    maxWorkers: int, optional
+        The maximum number of requests in flight at once.
+    verbose: bool, optional
+        True to verbosely log output.
+
+    Returns
+    -------
+    generator
+        Of LocationResult, in the order the requests complete. A failed lookup does not stop the others; its
+        exception is in the result's "error".
+    """
+    url = aerisconfig.get_aerframe_api_url()
+    endpoint_prefix = f'{url}/networkservices/v2/{accountId}/devices/'
+    myparams = {'apiKey': apiKey}
+
+    def get_one(device):
+        deviceIdType, deviceId = device
+        r = aerishttp.get(endpoint_prefix + deviceIdType + '/' + deviceId + '/networkLocation', params=myparams)
+        return _handle_get_location(r, verbose)
+
+    return _location_results(get_one, devices, maxWorkers)
+
+
+def _location_results(get_one, devices, maxWorkers):
+    for (deviceIdType, deviceId), location, error in aerisutils.imap_unordered(get_one, devices, maxWorkers):
+        yield LocationResult(deviceIdType, deviceId, location, error)
@@ -0,0 +1,292 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An asyncio client for the AerFrame, AerAdmin and AerTraffic APIs.
+
+Requires the optional aiohttp dependency, e.g., "pip install aerisapisdk[async]".
+"""
+
+import aerisapisdk.aeradminsdk as aeradminsdk
+import aerisapisdk.aerframesdk as aerframesdk
+import aerisapisdk.aerisjson as aerisjson
+import aerisapisdk.aertrafficsdk as aertrafficsdk
+from aerisapisdk.aerisclient import BaseAerisClient
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional; AsyncAerisClient explains what is missing
+    aiohttp = None
+
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 0  # no per-host limit beyond DEFAULT_CONNECTION_LIMIT
+DEFAULT_KEEPALIVE_TIMEOUT_SECONDS = 60
+
+
+class AsyncResponse:
+    """
+    The parts of an aiohttp response that the response handlers and ApiException need, read while the
+    connection was still open. Has the same status_code, headers, content and text attributes as a
+    requests.Response.
+    """
+
+    def __init__(self, status_code, headers, content, encoding):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class AsyncAerisClient(BaseAerisClient):
+    """
+    An asyncio client for the AerFrame, AerAdmin and AerTraffic APIs that is bound to one account.
+
+    Every method is a coroutine with the same name, return value and exceptions as the matching AerisClient method.
+    All requests share one pooled aiohttp session, so many location lookups or notification long-polls can be in
+    flight at once without blocking the event loop.
+
+    Use it as an async context manager, or call close() when done:
+
+        async with AsyncAerisClient(accountId, apiKey, appApiKey=appApiKey) as client:
+            location = await client.get_location('IMSI', imsi)
+    """
+
+    def __init__(self, accountId, apiKey, appApiKey=None, email=None, urls=None, session=None,
+                 limit=DEFAULT_CONNECTION_LIMIT, limit_per_host=DEFAULT_CONNECTION_LIMIT_PER_HOST,
+                 keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT_SECONDS, timeout=None, verbose=False):
+        """
+        Parameters
+        ----------
+        accountId: str
+        apiKey: str
+        appApiKey: str, optional
+        email: str, optional
+        urls: dict, optional
+            See BaseAerisClient.
+        session: aiohttp.ClientSession, optional
+            A session to send requests with. The client does not close a session it was given.
+            By default the client creates its own session on first use.
+        limit: int, optional
+            The maximum number of simultaneous connections of the client's own session.
+        limit_per_host: int, optional
+            The maximum number of simultaneous connections to one API host; 0 for no limit.
+        keepalive_timeout: float, optional
+            How many seconds an idle connection is kept open for reuse.
+        timeout: aiohttp.ClientTimeout, optional
+            Timeouts for the client's own session. Long-polls need a read timeout longer than the server's
+            long-poll timeout.
+        verbose: bool, optional
+            True to enable verbose logging for every call
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncAerisClient requires aiohttp; install it with "pip install aerisapisdk[async]"')
+        super().__init__(accountId, apiKey, appApiKey, email, urls, verbose)
+        self.session = session
+        self._owns_session = session is None
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = timeout
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the client's own session and its connections.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        # created lazily so that it belongs to the running event loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit, limit_per_host=self._limit_per_host,
+                                             keepalive_timeout=self._keepalive_timeout)
+            kwargs = {'connector': connector}
+            if self._timeout is not None:
+                kwargs['timeout'] = self._timeout
+            self.session = aiohttp.ClientSession(**kwargs)
+        return self.session
+
+    async def _request(self, method, url, **kwargs):
+        async with self._get_session().request(method, url, **kwargs) as r:
+            content = await r.read()
+            return AsyncResponse(r.status, dict(r.headers), content, r.charset)
+
+    async def _get(self, url, params):
+        return await self._request('GET', url, params=params)
+
+    async def _post(self, url, params, payload):
+        return await self._request('POST', url, params=params, data=aerisjson.dumps(payload),
+                                   headers={'Content-Type': 'application/json'})
+
+    async def _delete(self, url, params):
+        return await self._request('DELETE', url, params=params)
+
+    # ========================================================================
+    # AerFrame applications
+
+    async def get_applications(self, searchAppShortName, useCache=True):
+        if useCache:
+            appId = aerframesdk._cached_application_id(self._applications_url, self.apiKey, searchAppShortName)
+            if appId is not None:
+                return appId
+        r = await self._get(self._applications_url, self._params)
+        return aerframesdk._handle_get_applications(r, searchAppShortName, self.verbose, self._applications_url,
+                                                    self.apiKey)
+
+    async def get_application_by_app_id(self, appId):
+        r = await self._get(self._application_url_prefix + appId, self._params)
+        return aerframesdk._handle_get_application(r, self.verbose)
+
+    async def create_application(self, appShortName, appDescription='Application for aerframe sdk'):
+        payload = aerframesdk._application_payload(appShortName, appDescription)
+        r = await self._post(self._applications_url, self._params, payload)
+        aerframesdk._invalidate_application_short_name(self._applications_url, appShortName)
+        return aerframesdk._handle_create_application(r, appShortName, self.verbose)
+
+    async def delete_application(self, appId):
+        r = await self._delete(self._application_url_prefix + appId, self._params)
+        aerframesdk._invalidate_application_id(self._applications_url, appId)
+        return aerframesdk._handle_delete_application(r)
+
+    # ========================================================================
+    # AerFrame notification channels
+
+    async def get_channel_id_by_tag(self, searchAppTag, useCache=True):
+        return aerframesdk._channel_id_by_tag(await self._get_channel_index(useCache), searchAppTag)
+
+    async def get_channel_ids_by_tag(self, searchAppTag, useCache=True):
+        return list((await self._get_channel_index(useCache)).get(searchAppTag, ()))
+
+    async def _get_channel_index(self, useCache):
+        if useCache:
+            index = aerframesdk.channel_index_cache.get(self.accountId)
+            if index is not None:
+                return index
+        r = await self._get(self._channels_url, self._params)
+        return aerframesdk._handle_get_channel_index(r, self.verbose, self.accountId)
+
+    async def get_channel(self, channelId):
+        r = await self._get(self._channel_url_prefix + channelId, self._params)
+        return aerframesdk._handle_get_channel(r, self.verbose)
+
+    async def create_channel(self, applicationTag, maxNotifications=aerframesdk.DEFAULT_MAX_NOTIFICATIONS):
+        payload = aerframesdk._channel_payload(applicationTag, maxNotifications)
+        r = await self._post(self._channels_url, self._params, payload)
+        aerframesdk.channel_index_cache.invalidate(self.accountId)
+        return aerframesdk._handle_create_channel(r, applicationTag, self.verbose)
+
+    async def delete_channel(self, channelId):
+        r = await self._delete(self._channel_url_prefix + channelId, self._params)
+        aerframesdk.channel_index_cache.invalidate(self.accountId)
+        return aerframesdk._handle_delete_channel(r)
+
+    # ========================================================================
+    # AerFrame subscriptions
+
+    async def get_inbound_subscription_by_app_short_name(self, appShortName, useCache=True):
+        index = await self._get_inbound_subscription_index(useCache)
+        return aerframesdk._first_subscription_id(index, appShortName, aerframesdk.INBOUND)
+
+    async def get_outbound_subscription_id_by_app_short_name(self, appShortName, useCache=True):
+        index = await self._get_outbound_subscription_index(appShortName, useCache)
+        return aerframesdk._first_subscription_id(index, appShortName, aerframesdk.OUTBOUND)
+
+    async def find_subscriptions(self, appShortName, direction=None, channelId=None, useCache=True):
+        found = []
+        if direction in (None, aerframesdk.INBOUND):
+            index = await self._get_inbound_subscription_index(useCache)
+            found.extend(index.find(appShortName, aerframesdk.INBOUND, channelId))
+        if direction in (None, aerframesdk.OUTBOUND):
+            index = await self._get_outbound_subscription_index(appShortName, useCache)
+            found.extend(index.find(appShortName, aerframesdk.OUTBOUND, channelId))
+        return found
+
+    async def _get_inbound_subscription_index(self, useCache):
+        key = aerframesdk._inbound_subscriptions_key(self.accountId, self.appApiKey)
+        if useCache:
+            index = aerframesdk.subscription_cache.get(key)
+            if index is not None:
+                return index
+        r = await self._get(self._inbound_subscriptions_url, self._app_params)
+        return aerframesdk._handle_get_inbound_subscription_index(r, self.verbose, self.accountId, self.appApiKey)
+
+    async def _get_outbound_subscription_index(self, appShortName, useCache):
+        key = aerframesdk._outbound_subscriptions_key(self.accountId, appShortName)
+        if useCache:
+            index = aerframesdk.subscription_cache.get(key)
+            if index is not None:
+                return index
+        r = await self._get(self._outbound_subscriptions_url(appShortName), self._app_params)
+        return aerframesdk._handle_get_outbound_subscription_index(r, appShortName, self.verbose, self.accountId)
+
+    async def get_outbound_subscription(self, appShortName, subscriptionId):
+        r = await self._get(self._outbound_subscriptions_url(appShortName) + '/' + subscriptionId, self._app_params)
+        return aerframesdk._handle_get_outbound_subscription(r, self.verbose)
+
+    async def create_outbound_subscription(self, appShortName, appChannelId):
+        notifyURL = self._channel_url_prefix + appChannelId + '/callback'
+        payload = aerframesdk._outbound_subscription_payload(appShortName, notifyURL)
+        r = await self._post(self._outbound_subscriptions_url(appShortName), self._app_params, payload)
+        aerframesdk._invalidate_outbound_subscriptions(self.accountId, appShortName)
+        return aerframesdk._handle_create_outbound_subscription(r, appShortName, self.verbose)
+
+    async def delete_outbound_subscription(self, appShortName, subscriptionId):
+        r = await self._delete(self._outbound_subscriptions_url(appShortName) + '/' + subscriptionId,
+                               self._app_params)
+        aerframesdk._invalidate_outbound_subscriptions(self.accountId, appShortName)
+        return aerframesdk._handle_delete_outbound_subscription(r)
+
+    # ========================================================================
+    # AerFrame SMS, notifications and location
+
+    async def send_mt_sms(self, appShortName, imsiDestination, smsText, clientCorrelator=None):
+        payload = aerframesdk._mt_sms_payload(appShortName, [imsiDestination], smsText, clientCorrelator)
+        r = await self._post(self._outbound_url_prefix + appShortName + '/requests', self._app_params, payload)
+        return aerframesdk._handle_send_mt_sms(r, self.verbose)
+
+    async def poll_notification_channel(self, channelURL):
+        r = await self._get(channelURL, self._app_params)
+        return aerframesdk._handle_poll_notification_channel(r, self.verbose)
+
+    async def get_location(self, deviceIdType, deviceId):
+        r = await self._get(self._location_url(deviceIdType, deviceId), self._app_params)
+        return aerframesdk._handle_get_location(r, self.verbose)
+
+    # ========================================================================
+    # AerAdmin and AerTraffic
+
+    async def get_device_details(self, deviceIdType, deviceId):
+        r = await self._post(self._device_details_url, self._params,
+                             self._device_details_payload(deviceIdType, deviceId))
+        return aeradminsdk._handle_get_device_details(r, self.verbose)
+
+    async def get_device_network_details(self, deviceIdType, deviceId):
+        params = self._device_network_details_params(deviceIdType, deviceId)
+        r = await self._get(self._device_network_details_url, params)
+        return aeradminsdk._handle_get_device_network_details(r, self.verbose)
+
+    async def get_device_summary_report(self):
+        r = await self._get(self._device_summary_report_url, self._device_summary_report_params)
+        return aertrafficsdk._handle_get_device_summary_report(r, self.verbose)
@@ -0,0 +1,109 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process caches for resolved AerFrame resource IDs.
+"""
+
+import collections
+import threading
+import time
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_SIZE = 1024
+
+
+class TtlLruCache:
+    """
+    A thread-safe mapping whose entries expire a fixed number of seconds after they were stored, and whose least
+    recently used entries are evicted once it holds more than "maxsize" entries.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        maxsize: int, optional
+            The maximum number of entries to keep.
+        ttl: float, optional
+            How many seconds an entry stays valid. 0 disables the cache.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        """
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = collections.OrderedDict()  # key -> (value, expiry time), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for the key, or "default" if there is none or it has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[1] <= self._clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Stores a value for the key, evicting the least recently used entries if the cache is full.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Removes the entry for the key, if there is one.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_if(self, predicate):
+        """
+        Removes every entry for which predicate(key, value) is true.
+
+        Returns
+        -------
+        int
+            The number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key, (value, expiry) in self._entries.items() if predicate(key, value)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,341 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import aerisapisdk.aeradminsdk as aeradminsdk
+import aerisapisdk.aerframesdk as aerframesdk
+import aerisapisdk.aerishttp as aerishttp
+import aerisapisdk.aerisconfig as aerisconfig
+import aerisapisdk.aertrafficsdk as aertrafficsdk
+
+
+def get_urls():
+    """
+    Returns a snapshot of the configured Aeris API URLs as a dict, suitable for the "urls" argument of AerisClient.
+    """
+    return {'aerframe_ws_api': aerisconfig.get_aerframe_api_url(),
+            'aerframe_lp_api': aerisconfig.get_aerframe_longpoll_url(),
+            'aeradmin_api': aerisconfig.get_aeradmin_url(),
+            'aertraffic_api': aerisconfig.get_aertraffic_url()}
+
+
+class BaseAerisClient:
+    """
+    Holds the account, API keys and precomputed endpoints shared by AerisClient and the asyncio client in
+    aerisasyncclient. Not useful on its own.
+    """
+
+    def __init__(self, accountId, apiKey, appApiKey=None, email=None, urls=None, verbose=False):
+        """
+        Parameters
+        ----------
+        accountId: str
+            String version of the numerical account ID
+        apiKey: str
+            An API key for the account
+        appApiKey: str, optional
+            The API key of an AerFrame application of the account. Defaults to apiKey.
+        email: str, optional
+            The email address of the user; required for AerAdmin and AerTraffic calls.
+        urls: dict, optional
+            The Aeris API URLs to use, with the same keys as the "urls" object of the configuration file.
+            Missing URLs are taken from aerisconfig when the client is created.
+        verbose: bool, optional
+            True to enable verbose logging for every call
+        """
+        self.accountId = accountId
+        self.apiKey = apiKey
+        self.appApiKey = appApiKey or apiKey
+        self.email = email
+        self.urls = get_urls()
+        self.urls.update(urls or {})
+        self.verbose = verbose
+
+        self._params = {'apiKey': self.apiKey}
+        self._app_params = {'apiKey': self.appApiKey}
+
+        af = self.urls['aerframe_ws_api']
+        self._applications_url = f'{af}/registration/v2/{accountId}/applications'
+        self._application_url_prefix = self._applications_url + '/'
+        self._channels_url = f'{af}/notificationchannel/v2/{accountId}/channels'
+        self._channel_url_prefix = self._channels_url + '/'
+        self._inbound_subscriptions_url = f'{af}/smsmessaging/v2/{accountId}/inbound/subscriptions'
+        self._outbound_url_prefix = f'{af}/smsmessaging/v2/{accountId}/outbound/'
+        self._devices_url_prefix = f'{af}/networkservices/v2/{accountId}/devices/'
+
+        admin = self.urls['aeradmin_api'] + '/AerAdmin_WS_5_0/rest/'
+        self._device_details_url = admin + 'devices/details'
+        self._device_network_details_url = admin + 'devices/network/details'
+
+        traffic = self.urls['aertraffic_api'] + '/v1/'
+        self._device_summary_report_url = traffic + accountId + '/systemReports/deviceSummary'
+        self._device_summary_report_params = {'apiKey': self.apiKey, 'durationInMonths': '3', 'subAccounts': 'false'}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """
+        Creates a client from a configuration object, like the one returned by aerisconfig.load_config.
+        Uses the API key of the "aerframeApplication" created by "aeriscli aerframe init" as the application API
+        key, if there is one.
+
+        Parameters
+        ----------
+        config: dict
+        kwargs
+            Any other keyword arguments of AerisClient
+
+        Returns
+        -------
+        AerisClient
+        """
+        kwargs.setdefault('appApiKey', config.get('aerframeApplication', {}).get('apiKey'))
+        kwargs.setdefault('email', config.get('email'))
+        kwargs.setdefault('urls', config.get('urls'))
+        return cls(config['accountId'], config['apiKey'], **kwargs)
+
+    def _outbound_subscriptions_url(self, appShortName):
+        return self._outbound_url_prefix + appShortName + '/subscriptions'
+
+    def _location_url(self, deviceIdType, deviceId):
+        return self._devices_url_prefix + deviceIdType + '/' + deviceId + '/networkLocation'
+
+    def _device_details_payload(self, deviceIdType, deviceId):
+        return {"accountID": self.accountId,
+                "email": self.email,
+                deviceIdType: deviceId}
+
+    def _device_network_details_params(self, deviceIdType, deviceId):
+        return {"accountID": self.accountId,
+                "apiKey": self.apiKey,
+                "email": self.email,
+                deviceIdType: deviceId}
+
+
+class AerisClient(BaseAerisClient):
+    """
+    A client for the AerFrame, AerAdmin and AerTraffic APIs that is bound to one account.
+
+    The account ID, API keys, API URLs and HTTP transport are fixed when the client is created, and every endpoint
+    is computed once up front, so calls made through a long-lived client do not re-read configuration or rebuild
+    URLs. Methods have the same names, return values and exceptions as the module-level functions in aerframesdk,
+    aeradminsdk and aertrafficsdk, minus the account ID and API key arguments.
+
+    Registration, notification channel, AerAdmin and AerTraffic calls use the account API key. SMS, subscription,
+    notification polling and location calls use the application API key, which defaults to the account API key.
+    """
+
+    def __init__(self, accountId, apiKey, appApiKey=None, email=None, urls=None, transport=aerishttp,
+                 verbose=False):
+        """
+        Parameters
+        ----------
+        accountId: str
+        apiKey: str
+        appApiKey: str, optional
+        email: str, optional
+        urls: dict, optional
+            See BaseAerisClient.
+        transport: optional
+            Any object with a "request(method, url, **kwargs)" function returning a requests.Response.
+            Defaults to the shared pooled transport in aerishttp.
+        verbose: bool, optional
+            True to enable verbose logging for every call
+        """
+        super().__init__(accountId, apiKey, appApiKey, email, urls, verbose)
+        self.transport = transport
+
+    def _get(self, url, params):
+        return self.transport.request('GET', url, params=params)
+
+    def _post(self, url, params, payload):
+        return self.transport.request('POST', url, params=params, json=payload)
+
+    def _delete(self, url, params):
+        return self.transport.request('DELETE', url, params=params)
+
+    # ========================================================================
+    # AerFrame applications
+
+    def get_applications(self, searchAppShortName, useCache=True):
+        if useCache:
+            appId = aerframesdk._cached_application_id(self._applications_url, self.apiKey, searchAppShortName)
+            if appId is not None:
+                return appId
+        r = self._get(self._applications_url, self._params)
+        return aerframesdk._handle_get_applications(r, searchAppShortName, self.verbose, self._applications_url,
+                                                    self.apiKey)
+
+    def get_application_by_app_id(self, appId):
+        r = self._get(self._application_url_prefix + appId, self._params)
+        return aerframesdk._handle_get_application(r, self.verbose)
+
+    def create_application(self, appShortName, appDescription='Application for aerframe sdk'):
+        payload = aerframesdk._application_payload(appShortName, appDescription)
+        r = self._post(self._applications_url, self._params, payload)
+        aerframesdk._invalidate_application_short_name(self._applications_url, appShortName)
+        return aerframesdk._handle_create_application(r, appShortName, self.verbose)
+
+    def delete_application(self, appId):
+        r = self._delete(self._application_url_prefix + appId, self._params)
+        aerframesdk._invalidate_application_id(self._applications_url, appId)
+        return aerframesdk._handle_delete_application(r)
+
+    # ========================================================================
+    # AerFrame notification channels
+
+    def get_channel_id_by_tag(self, searchAppTag, useCache=True):
+        return aerframesdk._channel_id_by_tag(self._get_channel_index(useCache), searchAppTag)
+
+    def get_channel_ids_by_tag(self, searchAppTag, useCache=True):
+        return list((self._get_channel_index(useCache)).get(searchAppTag, ()))
+
+    def _get_channel_index(self, useCache):
+        if useCache:
+            index = aerframesdk.channel_index_cache.get(self.accountId)
+            if index is not None:
+                return index
+        r = self._get(self._channels_url, self._params)
+        return aerframesdk._handle_get_channel_index(r, self.verbose, self.accountId)
+
+    def get_channel(self, channelId):
+        r = self._get(self._channel_url_prefix + channelId, self._params)
+        return aerframesdk._handle_get_channel(r, self.verbose)
+
+    def create_channel(self, applicationTag, maxNotifications=aerframesdk.DEFAULT_MAX_NOTIFICATIONS):
+        payload = aerframesdk._channel_payload(applicationTag, maxNotifications)
+        r = self._post(self._channels_url, self._params, payload)
+        aerframesdk.channel_index_cache.invalidate(self.accountId)
+        return aerframesdk._handle_create_channel(r, applicationTag, self.verbose)
+
+    def delete_channel(self, channelId):
+        r = self._delete(self._channel_url_prefix + channelId, self._params)
+        aerframesdk.channel_index_cache.invalidate(self.accountId)
+        return aerframesdk._handle_delete_channel(r)
+
+    # ========================================================================
+    # AerFrame subscriptions
+
+    def get_inbound_subscription_by_app_short_name(self, appShortName, useCache=True):
+        index = self._get_inbound_subscription_index(useCache)
+        return aerframesdk._first_subscription_id(index, appShortName, aerframesdk.INBOUND)
+
+    def get_outbound_subscription_id_by_app_short_name(self, appShortName, useCache=True):
+        index = self._get_outbound_subscription_index(appShortName, useCache)
+        return aerframesdk._first_subscription_id(index, appShortName, aerframesdk.OUTBOUND)
+
+    def find_subscriptions(self, appShortName, direction=None, channelId=None, useCache=True):
+        found = []
+        if direction in (None, aerframesdk.INBOUND):
+            index = self._get_inbound_subscription_index(useCache)
+            found.extend(index.find(appShortName, aerframesdk.INBOUND, channelId))
+        if direction in (None, aerframesdk.OUTBOUND):
+            index = self._get_outbound_subscription_index(appShortName, useCache)
+            found.extend(index.find(appShortName, aerframesdk.OUTBOUND, channelId))
+        return found
+
+    def _get_inbound_subscription_index(self, useCache):
+        key = aerframesdk._inbound_subscriptions_key(self.accountId, self.appApiKey)
+        if useCache:
+            index = aerframesdk.subscription_cache.get(key)
+            if index is not None:
+                return index
+        r = self._get(self._inbound_subscriptions_url, self._app_params)
+        return aerframesdk._handle_get_inbound_subscription_index(r, self.verbose, self.accountId, self.appApiKey)
+
+    def _get_outbound_subscription_index(self, appShortName, useCache):
+        key = aerframesdk._outbound_subscriptions_key(self.accountId, appShortName)
+        if useCache:
+            index = aerframesdk.subscription_cache.get(key)
+            if index is not None:
+                return index
+        r = self._get(self._outbound_subscriptions_url(appShortName), self._app_params)
+        return aerframesdk._handle_get_outbound_subscription_index(r, appShortName, self.verbose, self.accountId)
+
+    def get_outbound_subscription(self, appShortName, subscriptionId):
+        r = self._get(self._outbound_subscriptions_url(appShortName) + '/' + subscriptionId, self._app_params)
+        return aerframesdk._handle_get_outbound_subscription(r, self.verbose)
+
+    def create_outbound_subscription(self, appShortName, appChannelId):
+        notifyURL = self._channel_url_prefix + appChannelId + '/callback'
+        payload = aerframesdk._outbound_subscription_payload(appShortName, notifyURL)
+        r = self._post(self._outbound_subscriptions_url(appShortName), self._app_params, payload)
+        aerframesdk._invalidate_outbound_subscriptions(self.accountId, appShortName)
+        return aerframesdk._handle_create_outbound_subscription(r, appShortName, self.verbose)
+
+    def delete_outbound_subscription(self, appShortName, subscriptionId):
+        r = self._delete(self._outbound_subscriptions_url(appShortName) + '/' + subscriptionId, self._app_params)
+        aerframesdk._invalidate_outbound_subscriptions(self.accountId, appShortName)
+        return aerframesdk._handle_delete_outbound_subscription(r)
+
+    # ========================================================================
+    # AerFrame SMS, notifications and location
+
+    def send_mt_sms(self, appShortName, imsiDestination, smsText, clientCorrelator=None):
+        payload = aerframesdk._mt_sms_payload(appShortName, [imsiDestination], smsText, clientCorrelator)
+        r = self._post(self._outbound_url_prefix + appShortName + '/requests', self._app_params, payload)
+        return aerframesdk._handle_send_mt_sms(r, self.verbose)
+
+    def send_mt_sms_batch(self, appShortName, recipients, smsText=None,
+                          batchSize=aerframesdk.DEFAULT_SMS_BATCH_SIZE, maxWorkers=aerframesdk.DEFAULT_MAX_WORKERS,
+                          transliterate=False):
+        endpoint = self._outbound_url_prefix + appShortName + '/requests'
+
+        def send_batch(address, text, clientCorrelator):
+            payload = aerframesdk._mt_sms_payload(appShortName, address, text, clientCorrelator)
+            return aerframesdk._handle_send_mt_sms(self._post(endpoint, self._app_params, payload), self.verbose)
+
+        return aerframesdk._send_mt_sms_batches(send_batch, recipients, smsText, batchSize, maxWorkers, transliterate)
+
+    def poll_notification_channel(self, channelURL):
+        r = self._get(channelURL, self._app_params)
+        return aerframesdk._handle_poll_notification_channel(r, self.verbose)
+
+    def get_location(self, deviceIdType, deviceId):
+        r = self._get(self._location_url(deviceIdType, deviceId), self._app_params)
+        return aerframesdk._handle_get_location(r, self.verbose)
+
+    def get_locations(self, devices, maxWorkers=aerframesdk.DEFAULT_MAX_WORKERS):
+        def get_one(device):
+            return self.get_location(*device)
+
+        return aerframesdk._location_results(get_one, devices, maxWorkers)
+
+    # ========================================================================
+    # AerAdmin and AerTraffic
+
+    def get_device_details(self, deviceIdType, deviceId):
+        r = self._post(self._device_details_url, self._params, self._device_details_payload(deviceIdType, deviceId))
+        return aeradminsdk._handle_get_device_details(r, self.verbose)
+
+    def get_device_network_details(self, deviceIdType, deviceId):
+        params = self._device_network_details_params(deviceIdType, deviceId)
+        r = self._get(self._device_network_details_url, params)
+        return aeradminsdk._handle_get_device_network_details(r, self.verbose)
+
+    def get_device_details_bulk(self, devices, maxWorkers=aeradminsdk.DEFAULT_MAX_WORKERS):
+        def get_one(device):
+            r = self._post(self._device_details_url, self._params, self._device_details_payload(*device))
+            return aeradminsdk._handle_get_device_details(r, False, quiet=True)
+
+        return aeradminsdk._device_results(get_one, devices, maxWorkers)
+
+    def get_device_network_details_bulk(self, devices, maxWorkers=aeradminsdk.DEFAULT_MAX_WORKERS):
+        def get_one(device):
+            r = self._get(self._device_network_details_url, self._device_network_details_params(*device))
+            return aeradminsdk._handle_get_device_network_details(r, False, quiet=True)
+
+        return aeradminsdk._device_results(get_one, devices, maxWorkers)
+
+    def get_device_summary_report(self):
+        r = self._get(self._device_summary_report_url, self._device_summary_report_params)
+        return aertrafficsdk._handle_get_device_summary_report(r, self.verbose)
@@ -0,0 +1,410 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Correlation of MT-SMs with the delivery receipts that report on them.
+"""
+
+import collections
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+import uuid
+
+from aerisapisdk.aerisfilters import DELIVERY_RECEIPT, device_address, mt_request_link
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELIVERY_TIMEOUT_SECONDS = 60 * 60
+DEFAULT_WHEEL_TICK_SECONDS = 1.0
+DEFAULT_WHEEL_SLOTS = 512
+
+# namespace of the clientCorrelators derived from another one (see derive_client_correlator)
+_DERIVED_CORRELATOR_NAMESPACE = uuid.UUID('294a8480-a121-40d7-b121-c725fd45aab1')
+
+# delivery statuses after which no further receipts are expected for a recipient
+FINAL_DELIVERY_STATUSES = frozenset(['DeliveredToTerminal', 'DeliveryImpossible', 'DeliveryUncertain',
+                                     'DeliveryNotificationNotSupported'])
+
+DeliveryReceipt = collections.namedtuple('DeliveryReceipt',
+                                         ['clientCorrelator', 'imsi', 'deliveryStatus', 'latency', 'notification'])
+DeliveryReceipt.__doc__ = """The final delivery receipt of an MT-SM to one recipient.
+
+latency is the number of seconds between sending the MT-SM and receiving this receipt; notification is the
+aerisfilters.Notification of the receipt.
+"""
+
+
+class DeliveryTimeout(Exception):
+    """
+    Raised by the future of a tracked MT-SM when no final delivery receipt arrived in time.
+    """
+    def __init__(self, clientCorrelator, imsi):
+        super().__init__(f'No delivery receipt for {clientCorrelator} to {imsi}')
+        self.clientCorrelator = clientCorrelator
+        self.imsi = imsi
+
+
+def new_client_correlator():
+    """
+    Returns a new, unique clientCorrelator for an MT-SM request, as a string of 32 hexadecimal digits.
+    """
+    return uuid.uuid4().hex
+
+
+def derive_client_correlator(clientCorrelator, imsi):
+    """
+    Returns the clientCorrelator for resending one recipient of an MT-SM request on its own, as a string of 32
+    hexadecimal digits. It only depends on the original request's clientCorrelator and the IMSI, so resending the same
+    recipient again reuses it and the API can recognise the repeat.
+    """
+    return uuid.uuid5(_DERIVED_CORRELATOR_NAMESPACE, f'{clientCorrelator}/{imsi}').hex
+
+
+class TimerWheel:
+    """
+    A hashed timer wheel: "slots" buckets of "tick" seconds each, used round-robin. Scheduling and cancelling a timer
+    take constant time, and advancing the wheel only looks at the buckets whose ticks have passed, so expiring stale
+    entries never scans every timer. Not thread-safe.
+    """
+
+    def __init__(self, tick=DEFAULT_WHEEL_TICK_SECONDS, slots=DEFAULT_WHEEL_SLOTS, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        tick: float, optional
+            The resolution of the wheel in seconds; timers fire up to one tick late.
+        slots: int, optional
+            The number of buckets. Timers further away than "tick * slots" seconds share buckets with nearer ones and
+            are passed over until they are due.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        """
+        if tick <= 0:
+            raise ValueError('tick must be positive')
+        if slots < 1:
+            raise ValueError('slots must be at least 1')
+        self.tick = tick
+        self._clock = clock
+        self._slots = [dict() for _ in range(slots)]
+        self._current = self._tick_of(clock())
+
+    def _tick_of(self, seconds):
+        return int(math.floor(seconds / self.tick))
+
+    def __len__(self):
+        return sum(len(slot) for slot in self._slots)
+
+    def schedule(self, key, delay):
+        """
+        Schedules a timer for "key" to fire in "delay" seconds, and returns a handle for cancel. A key has at most one
+        timer; cancel the old one before scheduling another.
+        """
+        due = max(self._tick_of(self._clock() + delay), self._current + 1)
+        slot = self._slots[due % len(self._slots)]
+        slot[key] = due
+        return due
+
+    def cancel(self, key, handle):
+        """
+        Cancels the timer of "key" that schedule returned "handle" for. Cancelling a timer that fired is a no-op.
+        """
+        slot = self._slots[handle % len(self._slots)]
+        if slot.get(key) == handle:
+            del slot[key]
+
+    def advance(self):
+        """
+        Moves the wheel to the current time, and returns the keys of the timers that are due, in no particular order.
+        """
+        now = self._tick_of(self._clock())
+        expired = []
+        if now <= self._current:
+            return expired
+        # after a long pause every bucket is visited once; timers not yet due stay where they are
+        for tick in range(self._current + 1, min(now, self._current + len(self._slots)) + 1):
+            slot = self._slots[tick % len(self._slots)]
+            due = [key for key, handle in slot.items() if handle <= now]
+            for key in due:
+                del slot[key]
+            expired.extend(due)
+        self._current = now
+        return expired
+
+
+class _Pending:
+    __slots__ = ('clientCorrelator', 'imsi', 'future', 'sentAt', 'timer', 'deliveryStatus')
+
+    def __init__(self, clientCorrelator, imsi, future, sentAt):
+        self.clientCorrelator = clientCorrelator
+        self.imsi = imsi
+        self.future = future
+        self.sentAt = sentAt
+        self.timer = None
+        self.deliveryStatus = None
+
+
+class DeliveryTracker:
+    """
+    Keeps a table of MT-SMs in flight, and matches the delivery receipts from a notification channel to them.
+
+    Every recipient of a tracked MT-SM gets a concurrent.futures.Future, which resolves to a DeliveryReceipt when a
+    final delivery receipt (see FINAL_DELIVERY_STATUSES) arrives, or fails with DeliveryTimeout when none arrives
+    within "timeout" seconds. In flight MT-SMs are indexed by clientCorrelator, by the URL of their MT-SM request and
+    by IMSI, so each receipt is matched in constant time, and stale entries expire through a TimerWheel instead of a
+    scan of the table.
+
+        tracker = DeliveryTracker()
+        future = tracker.send_mt_sms(accountId, appApiKey, appShortName, imsi, 'hello')
+        with NotificationConsumer(accountId, appApiKey, channelURL, deliveryTracker=tracker):
+            receipt = future.result()
+
+    A receipt is matched by the clientCorrelator it carries or by the MT-SM request it links to, together with its
+    device address. A receipt with neither is matched to the oldest MT-SM in flight to its device.
+
+    Timers are checked whenever the tracker is used; call expire() to check them at other times. NotificationConsumer
+    calls it after every poll.
+    """
+
+    def __init__(self, timeout=DEFAULT_DELIVERY_TIMEOUT_SECONDS, tick=DEFAULT_WHEEL_TICK_SECONDS,
+                 slots=DEFAULT_WHEEL_SLOTS, finalStatuses=FINAL_DELIVERY_STATUSES, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        timeout: float, optional
+            Seconds to wait for the final delivery receipt of a recipient.
+        tick: float, optional
+        slots: int, optional
+            The resolution and size of the TimerWheel that expires entries.
+        finalStatuses: set, optional
+            The delivery statuses that complete a recipient's future; receipts with other statuses, like
+            "DeliveredToNetwork", are only recorded.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        """
+        self.timeout = timeout
+        self.finalStatuses = frozenset(finalStatuses)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(tick, slots, clock)
+        self._by_correlator = {}
+        self._by_imsi = {}
+        self._by_request = {}
+        self._requests = {}
+        self._stats = {'delivered': 0, 'expired': 0, 'failed': 0, 'unmatched': 0, 'latency': 0.0}
+
+    def track(self, clientCorrelator, address, callback=None):
+        """
+        Starts tracking an MT-SM about to be sent. Call this before sending, so that a receipt that arrives before
+        the send returns can still be matched.
+
+        Parameters
+        ----------
+        clientCorrelator: str
+            The clientCorrelator the MT-SM is sent with; see new_client_correlator.
+        address: str or list
+            The IMSI, or IMSIs, the MT-SM is sent to.
+        callback: function, optional
+            Called with each recipient's future when it is done, as with Future.add_done_callback.
+
+        Returns
+        -------
+        dict
+            A Future per IMSI.
+        """
+        if isinstance(address, str):
+            address = [address]
+        now = self._clock()
+        futures = {}
+        with self._lock:
+            if clientCorrelator in self._by_correlator:
+                raise ValueError(f'clientCorrelator {clientCorrelator} is already being tracked')
+            entries = self._by_correlator[clientCorrelator] = {}
+            for imsi in address:
+                future = concurrent.futures.Future()
+                future.set_running_or_notify_cancel()
+                entry = _Pending(clientCorrelator, imsi, future, now)
+                entry.timer = self._wheel.schedule(entry, self.timeout)
+                entries[imsi] = entry
+                self._by_imsi.setdefault(imsi, collections.OrderedDict())[clientCorrelator] = entry
+                futures[imsi] = future
+            expired = self._expire_locked()
+        self._complete(expired)
+        if callback is not None:
+            for future in futures.values():
+                future.add_done_callback(callback)
+        return futures
+
+    def sent(self, clientCorrelator, response):
+        """
+        Records the outcome of sending a tracked MT-SM.
+
+        Parameters
+        ----------
+        clientCorrelator: str
+        response: dict
+            The response of aerframesdk.send_mt_sms; its "resourceURL" is what delivery receipts link to. None (the
+            devices were not found or do not support SMS) resolves every recipient's future to None.
+        """
+        with self._lock:
+            entries = self._by_correlator.get(clientCorrelator)
+            if entries is None:
+                return
+            if response is None:
+                removed = [self._remove_locked(entry) for entry in list(entries.values())]
+            else:
+                removed = []
+                resourceURL = response.get('resourceURL')
+                if resourceURL:
+                    self._by_request[resourceURL] = clientCorrelator
+                    self._requests[clientCorrelator] = resourceURL
+        for entry in removed:
+            entry.future.set_result(None)
+
+    def failed(self, clientCorrelator, error):
+        """
+        Stops tracking an MT-SM that could not be sent, and fails every recipient's future with "error".
+        """
+        with self._lock:
+            entries = self._by_correlator.get(clientCorrelator) or {}
+            removed = [self._remove_locked(entry) for entry in list(entries.values())]
+            self._stats['failed'] += len(removed)
+        for entry in removed:
+            entry.future.set_exception(error)
+
+    def send_mt_sms(self, accountId, apiKey, appShortName, imsiDestination, smsText, callback=None, verbose=False):
+        """
+        Sends an MT-SM with aerframesdk.send_mt_sms and a new clientCorrelator, and tracks it.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to a DeliveryReceipt, or to None if the device was not found or does not support SMS. Fails with
+            the exception raised while sending, or with DeliveryTimeout.
+        """
+        # imported here, since aerframesdk imports this module
+        import aerisapisdk.aerframesdk as aerframesdk
+        clientCorrelator = new_client_correlator()
+        future = self.track(clientCorrelator, imsiDestination, callback)[imsiDestination]
+        try:
+            response = aerframesdk.send_mt_sms(accountId, apiKey, appShortName, imsiDestination, smsText, verbose,
+                                               clientCorrelator=clientCorrelator)
+        except Exception as e:
+            self.failed(clientCorrelator, e)
+        else:
+            self.sent(clientCorrelator, response)
+        return future
+
+    def __call__(self, notification):
+        """
+        Matches a notification to the MT-SM in flight it reports on. Returns True if it was a delivery receipt for a
+        tracked MT-SM, and False otherwise.
+        """
+        if notification.kind != DELIVERY_RECEIPT:
+            return False
+        imsi = device_address(notification)
+        status = notification.data.get('deliveryStatus')
+        now = self._clock()
+        with self._lock:
+            entry = self._match_locked(notification, imsi)
+            final = entry is not None and status in self.finalStatuses
+            if entry is None:
+                self._stats['unmatched'] += 1
+            else:
+                entry.deliveryStatus = status
+                if final:
+                    self._remove_locked(entry)
+                    self._stats['delivered'] += 1
+                    self._stats['latency'] += now - entry.sentAt
+            expired = self._expire_locked()
+        self._complete(expired)
+        if final:
+            entry.future.set_result(DeliveryReceipt(entry.clientCorrelator, imsi, status, now - entry.sentAt,
+                                                    notification))
+        return entry is not None
+
+    def _match_locked(self, notification, imsi):
+        clientCorrelator = notification.data.get('clientCorrelator')
+        if clientCorrelator is None:
+            request = mt_request_link(notification)
+            if request is not None:
+                clientCorrelator = self._by_request.get(request)
+        if clientCorrelator is not None:
+            return self._by_correlator.get(clientCorrelator, {}).get(imsi)
+        pending = self._by_imsi.get(imsi)
+        if pending:
+            return next(iter(pending.values()))
+        return None
+
+    def pending(self, imsi=None):
+        """
+        Returns the clientCorrelators of the MT-SMs in flight, oldest first; only those to "imsi", if given.
+        """
+        with self._lock:
+            if imsi is not None:
+                return list(self._by_imsi.get(imsi, ()))
+            return list(self._by_correlator)
+
+    def expire(self):
+        """
+        Fails the futures of the recipients whose receipts are overdue with DeliveryTimeout, and returns how many
+        there were.
+        """
+        with self._lock:
+            expired = self._expire_locked()
+        self._complete(expired)
+        return len(expired)
+
+    def stats(self):
+        """
+        Returns counters of recipients delivered, expired, failed and still in flight, receipts that matched no
+        MT-SM, and the mean send to final receipt latency in seconds (None before the first), as a dict.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = sum(len(entries) for entries in self._by_correlator.values())
+        latency = stats.pop('latency')
+        stats['meanLatency'] = latency / stats['delivered'] if stats['delivered'] else None
+        return stats
+
+    def _remove_locked(self, entry):
+        self._wheel.cancel(entry, entry.timer)
+        entries = self._by_correlator.get(entry.clientCorrelator)
+        if entries is not None:
+            entries.pop(entry.imsi, None)
+            if not entries:
+                del self._by_correlator[entry.clientCorrelator]
+                request = self._requests.pop(entry.clientCorrelator, None)
+                if request is not None:
+                    del self._by_request[request]
+        byImsi = self._by_imsi.get(entry.imsi)
+        if byImsi is not None:
+            byImsi.pop(entry.clientCorrelator, None)
+            if not byImsi:
+                del self._by_imsi[entry.imsi]
+        return entry
+
+    def _expire_locked(self):
+        expired = self._wheel.advance()
+        for entry in expired:
+            self._remove_locked(entry)
+        self._stats['expired'] += len(expired)
+        return expired
+
+    def _complete(self, expired):
+        for entry in expired:
+            logger.debug('No delivery receipt for %s to %s', entry.clientCorrelator, entry.imsi)
+            entry.future.set_exception(DeliveryTimeout(entry.clientCorrelator, entry.imsi))
@@ -0,0 +1,210 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fixed-memory detection of notifications that were delivered more than once.
+"""
+
+import collections
+import hashlib
+import json
+import math
+import threading
+import time
+
+from aerisapisdk.aerisfilters import DELIVERY_RECEIPT, MO_SMS, mt_request_link
+
+DEFAULT_CAPACITY = 1000000
+DEFAULT_ERROR_RATE = 1e-6
+DEFAULT_WINDOW_SECONDS = 24 * 60 * 60
+DEFAULT_GENERATIONS = 4
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def notification_key(notification):
+    """
+    Returns the bytes that identify a notification, so that a notification polled twice has the same key.
+
+    MO-SMs are identified by their "resourceURL" or "messageId", and delivery receipts by the MT-SM request they
+    link to (or their "resourceURL" or "clientCorrelator"), together with the device address and delivery status, since
+    one request has a receipt per recipient and status. Notifications without such fields are identified by their
+    callback data and full content.
+    """
+    data = notification.data
+    identity = None
+    if notification.kind == MO_SMS:
+        identity = data.get('resourceURL') or data.get('messageId')
+    elif notification.kind == DELIVERY_RECEIPT:
+        request = mt_request_link(notification) or data.get('resourceURL') or data.get('clientCorrelator')
+        if request:
+            identity = _canonical([request, data.get('address'), data.get('deliveryStatus')])
+    if identity is None:
+        identity = _canonical([notification.callbackData, data])
+    return (notification.kind + '\n' + identity).encode('utf-8')
+
+
+class BloomFilter:
+    """
+    A set of keys in a fixed number of bits. Membership tests have no false negatives, and a false positive rate of
+    about "errorRate" while no more than "capacity" keys have been added.
+    """
+
+    def __init__(self, capacity, errorRate=DEFAULT_ERROR_RATE):
+        """
+        Parameters
+        ----------
+        capacity: int
+            The number of keys the filter is sized for.
+        errorRate: float
+            The false positive rate at capacity, between 0 and 1.
+        """
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        if not 0 < errorRate < 1:
+            raise ValueError('errorRate must be between 0 and 1')
+        self.capacity = capacity
+        self.errorRate = errorRate
+        self.bits = max(8, int(math.ceil(-capacity * math.log(errorRate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.bits / capacity * math.log(2))))
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, key):
+        # enhanced double hashing: k positions from two 64-bit halves of one digest. The step is never a multiple of
+        # the size, and the cubic term keeps the positions apart even when the step shares a factor with it.
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = 1 + int.from_bytes(digest[8:], 'little') % (self.bits - 1)
+        return [(first + i * step + (i * i * i - i) // 6) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        """
+        Adds a key (bytes).
+
+        Returns
+        -------
+        bool
+            True if the key was (probably) in the filter already.
+        """
+        present = True
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self._array[byte] & (1 << bit):
+                present = False
+                self._array[byte] |= 1 << bit
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, key):
+        return all(self._array[position // 8] & (1 << (position % 8)) for position in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+
+class NotificationDeduplicator:
+    """
+    Remembers the notifications seen in a sliding time window, in fixed memory, and tells whether a notification is
+    new. Use it as NotificationConsumer's deduplicator, or call it on notifications directly:
+
+        deduplicator = NotificationDeduplicator()
+        fresh = [n for n in notifications if deduplicator(n)]
+
+    The window is split into generations, each a BloomFilter. New keys go into the newest generation; once it is
+    "window / (generations - 1)" seconds old, or holds its share of "capacity" keys, a new generation starts and the
+    oldest is forgotten. A notification is therefore remembered for at least "window" seconds, unless more than
+    "capacity" notifications arrive within the window, in which case it is remembered for the last "capacity"
+    notifications instead. The memory used is fixed when the deduplicator is created (see memory_bytes), e.g. about
+    5 MB with the defaults.
+
+    A false positive drops a notification that was not a duplicate; the chance that a new notification is mistaken
+    for a duplicate is at most about "errorRate".
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, errorRate=DEFAULT_ERROR_RATE, window=DEFAULT_WINDOW_SECONDS,
+                 generations=DEFAULT_GENERATIONS, key=notification_key, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        capacity: int, optional
+            How many notifications the window is sized for.
+        errorRate: float, optional
+            The largest acceptable chance of a new notification being taken for a duplicate.
+        window: float, optional
+            How many seconds a notification is remembered, at least.
+        generations: int, optional
+            Into how many Bloom filters the window is split; at least 2. More generations forget keys closer to the
+            end of the window, at the cost of more memory and slower lookups.
+        key: function, optional
+            Returns the identity of a notification as bytes; see notification_key.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        """
+        if generations < 2:
+            raise ValueError('generations must be at least 2')
+        self.capacity = capacity
+        self.errorRate = errorRate
+        self.window = window
+        self.key = key
+        self._clock = clock
+        self._span = window / (generations - 1)
+        self._generation_capacity = max(1, int(math.ceil(capacity / (generations - 1))))
+        # a lookup checks every generation, so each gets a share of the error rate
+        self._generation_error_rate = errorRate / generations
+        self._lock = threading.Lock()
+        self._generations = collections.deque(
+            [self._new_generation() for _ in range(generations)], maxlen=generations)
+        self._started = clock()
+        self.duplicates = 0
+
+    def _new_generation(self):
+        return BloomFilter(self._generation_capacity, self._generation_error_rate)
+
+    def _rotate_locked(self, now):
+        current = self._generations[-1]
+        if now - self._started < self._span and len(current) < self._generation_capacity:
+            return
+        elapsed = int((now - self._started) // self._span) if self._span > 0 else 1
+        # after a long idle period, every generation older than the window is forgotten at once
+        for _ in range(min(max(1, elapsed), len(self._generations))):
+            self._generations.append(self._new_generation())
+        self._started = now
+
+    def seen(self, key):
+        """
+        Records a key (bytes) and returns True if it was seen within the window before.
+        """
+        with self._lock:
+            self._rotate_locked(self._clock())
+            if any(key in generation for generation in self._generations):
+                self.duplicates += 1
+                return True
+            self._generations[-1].add(key)
+            return False
+
+    def __call__(self, notification):
+        """
+        Returns True if the notification is new, and False if it is a duplicate.
+        """
+        return not self.seen(self.key(notification))
+
+    def memory_bytes(self):
+        """
+        Returns the size of the Bloom filters' bit arrays.
+        """
+        return sum((generation.bits + 7) // 8 for generation in self._generations)
@@ -0,0 +1,197 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Parsing and filtering of notification channel responses.
+"""
+
+import base64
+import binascii
+import calendar
+import collections
+import datetime
+import re
+import time
+
+MO_SMS = 'MO-SMS'
+DELIVERY_RECEIPT = 'MT-DR'
+
+Notification = collections.namedtuple('Notification', ['kind', 'callbackData', 'data'])
+Notification.__doc__ = """One notification from a notification channel.
+
+kind: MO_SMS or DELIVERY_RECEIPT
+callbackData: the callback data of the subscription that produced the notification
+data: the "inboundSMSMessage" of an MO-SM, or one "deliveryInfo" of a delivery receipt, as a dict
+"""
+
+_DATE_TIME_FORMATS = ('%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%SZ')
+
+# the delivery receipt "link" that points at the MT-SM request the receipt is about
+_MT_REQUEST_LINK_REL = 'MTMessageRequest'
+
+
+def iter_notifications(response):
+    """
+    Splits the response of aerframesdk.poll_notification_channel into single notifications.
+
+    Parameters
+    ----------
+    response: dict
+
+    Returns
+    -------
+    generator
+        Of Notification tuples; delivery receipts first, then MO-SMs, each in the order received.
+    """
+    for notification in response.get('deliveryInfoNotification') or ():
+        for deliveryInfo in notification.get('deliveryInfo') or ():
+            yield Notification(DELIVERY_RECEIPT, notification.get('callbackData'), deliveryInfo)
+    for notification in response.get('inboundSMSMessageNotification') or ():
+        messages = notification.get('inboundSMSMessage')
+        if isinstance(messages, dict):
+            messages = [messages]
+        for message in messages or ():
+            yield Notification(MO_SMS, notification.get('callbackData'), message)
+
+
+def device_address(notification):
+    """
+    Returns the address (e.g., the IMSI) of the device a notification is about, without any "tel:" prefix.
+    """
+    key = 'senderAddress' if notification.kind == MO_SMS else 'address'
+    address = notification.data.get(key) or ''
+    return address[4:] if address.startswith('tel:') else address
+
+
+def mt_request_link(notification):
+    """
+    Returns the URL of the MT-SM request a delivery receipt is about (the "resourceURL" returned when the MT-SM was
+    sent), or None if the notification has no such link, like MO-SMs.
+    """
+    if notification.kind != DELIVERY_RECEIPT:
+        return None
+    for link in notification.data.get('link') or ():
+        if isinstance(link, dict) and link.get('rel') == _MT_REQUEST_LINK_REL:
+            return link.get('href')
+    return None
+
+
+def message_texts(notification):
+    """
+    Returns the texts an MO-SM may carry, as a tuple: the message as received, followed by the message decoded from
+    base64 when it is valid base64-encoded UTF-8. Delivery receipts carry no text and return an empty tuple.
+    """
+    if notification.kind != MO_SMS:
+        return ()
+    message = notification.data.get('message') or ''
+    try:
+        return (message, base64.b64decode(message, validate=True).decode('utf-8'))
+    except (binascii.Error, ValueError):
+        return (message,)
+
+
+def timestamp(notification):
+    """
+    Returns the time an MO-SM was sent as seconds since the epoch, or None if the notification has no (valid) time,
+    like delivery receipts.
+    """
+    dateTime = notification.data.get('dateTime')
+    if not dateTime:
+        return None
+    for dateTimeFormat in _DATE_TIME_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(dateTime, dateTimeFormat)
+        except ValueError:
+            continue
+        return calendar.timegm(parsed.timetuple()) + parsed.microsecond / 1e6
+    return None
+
+
+def _epoch_seconds(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return calendar.timegm(value.timetuple()) + value.microsecond / 1e6  # naive datetimes are UTC
+        return value.timestamp()
+    return float(value)
+
+
+class NotificationFilter:
+    """
+    A notification filter compiled once from its criteria; only the criteria given are checked, cheapest first.
+
+    A notification matches if it matches every criterion given:
+
+    * kinds: its kind is one of these (MO_SMS, DELIVERY_RECEIPT)
+    * imsis: its device address is one of these
+    * deliveryStatuses: it is a delivery receipt with one of these delivery statuses, e.g. "DeliveredToTerminal"
+    * text: it is an MO-SM whose text contains this substring
+    * pattern: it is an MO-SM whose text matches this regular expression (re.search)
+    * since, until: its time is within [since, until). The time of an MO-SM is its "dateTime"; notifications without
+      one, like delivery receipts, use the time they were checked. Takes datetimes (naive ones are UTC) or seconds
+      since the epoch.
+
+    Message texts are matched both as received and decoded from base64; see message_texts.
+    """
+
+    def __init__(self, imsis=None, deliveryStatuses=None, text=None, pattern=None, since=None, until=None, kinds=None,
+                 clock=time.time):
+        checks = []
+        if kinds is not None:
+            kinds = frozenset(kinds)
+            checks.append(lambda n: n.kind in kinds)
+        if deliveryStatuses is not None:
+            deliveryStatuses = frozenset(deliveryStatuses)
+            checks.append(lambda n: n.kind == DELIVERY_RECEIPT and n.data.get('deliveryStatus') in deliveryStatuses)
+        if imsis is not None:
+            imsis = frozenset(imsis)
+            checks.append(lambda n: device_address(n) in imsis)
+        if since is not None or until is not None:
+            since = _epoch_seconds(since) if since is not None else float('-inf')
+            until = _epoch_seconds(until) if until is not None else float('inf')
+
+            def in_window(n):
+                seconds = timestamp(n)
+                if seconds is None:
+                    seconds = clock()
+                return since <= seconds < until
+            checks.append(in_window)
+        if text is not None:
+            checks.append(lambda n: any(text in t for t in message_texts(n)))
+        if pattern is not None:
+            regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+            checks.append(lambda n: any(regex.search(t) for t in message_texts(n)))
+        self._checks = tuple(checks)
+
+    def __call__(self, notification):
+        return all(check(notification) for check in self._checks)
+
+    def matches(self, notification):
+        """
+        Returns True if the notification matches every criterion of the filter.
+        """
+        return self(notification)
+
+    def filter(self, notifications, limit=None):
+        """
+        Yields the notifications that match, lazily, and stops once "limit" have matched.
+        """
+        if limit is not None and limit <= 0:
+            return
+        matched = 0
+        for notification in notifications:
+            if self(notification):
+                yield notification
+                matched += 1
+                if limit is not None and matched >= limit:
+                    return
@@ -0,0 +1,466 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Locations of a whole fleet at once, compared with NumPy instead of device by device, and their history.
+
+Requires the optional numpy dependency, e.g., "pip install aerisapisdk[fleet]".
+"""
+
+import collections
+import os
+import threading
+
+from aerisapisdk.aerisgeofence import CELL_FIELDS, Cell, cell_of
+
+try:
+    import numpy
+    import numpy.lib.format
+except ImportError:  # numpy is optional; FleetSnapshot and LocationHistory explain what is missing
+    numpy = None
+
+# wide enough for 24-bit tracking area codes and 36-bit NR cell identities
+FIELD_DTYPES = (('mcc', 'uint16'), ('mnc', 'uint16'), ('lac', 'uint32'), ('cellId', 'uint64'))
+HISTORY_DTYPES = (('timestamp', 'float64'), ('device', 'uint32')) + FIELD_DTYPES
+
+DEFAULT_HISTORY_CHUNK_ROWS = 1 << 20
+
+_ROWS_FILE = 'rows'
+_CHUNK_SUFFIX = '.npy'
+
+FleetChanges = collections.namedtuple('FleetChanges', ['moved', 'present', 'absent'])
+FleetChanges.__doc__ = """How a fleet changed between two snapshots, as arrays of device indices.
+
+moved are the devices located in both snapshots, in different cells; present are the devices located now but not
+before; absent are the devices located before but not now.
+"""
+
+Visit = collections.namedtuple('Visit', ['cell', 'arrived', 'left'])
+Visit.__doc__ = """A stay of a device in one cell, from LocationHistory.visits.
+
+arrived is the timestamp it was first seen in the cell; left is the timestamp it was next seen elsewhere or without a
+location, or None if it has not been yet.
+"""
+
+
+def _require_numpy(name):
+    if numpy is None:
+        raise ImportError(f'{name} requires numpy; install it with "pip install aerisapisdk[fleet]"')
+
+
+def _chunk_name(firstRow, column):
+    return '%020d.%s%s' % (firstRow, column, _CHUNK_SUFFIX)
+
+
+class FleetSnapshot:
+    """
+    The cells of a fleet of devices at one time, as parallel mcc, mnc, lac and cellId arrays indexed by device.
+
+    Devices without a location have an mcc of 0, as in the "no location available" response. Snapshots of the same
+    fleet share their device order, so comparing two of them is a handful of vectorised array operations:
+
+        previous = FleetSnapshot.from_locations(imsis, locations)
+        ...
+        current = FleetSnapshot.from_locations(imsis, newLocations)
+        changes = current.compare(previous)
+        for i in changes.moved:
+            print(f'{imsis[i]} moved to {current.cell(i)}')
+    """
+
+    def __init__(self, size=0, deviceIds=None):
+        """
+        Creates a snapshot in which no device has a location.
+
+        Parameters
+        ----------
+        size: int, optional
+            The number of devices; the length of deviceIds, if given.
+        deviceIds: sequence, optional
+            The IDs of the devices, in index order, for index and from_locations.
+        """
+        _require_numpy('FleetSnapshot')
+        if deviceIds is not None:
+            deviceIds = tuple(deviceIds)
+            size = len(deviceIds)
+        self.deviceIds = deviceIds
+        self._indexes = None
+        for field, dtype in FIELD_DTYPES:
+            setattr(self, field, numpy.zeros(size, dtype=dtype))
+
+    @classmethod
+    def from_locations(cls, deviceIds, locations):
+        """
+        Creates a snapshot from location results.
+
+        Parameters
+        ----------
+        deviceIds: sequence
+            The IDs of the devices, in index order.
+        locations: dict or sequence
+            The results of aerframesdk.get_location (or Cells) by device ID, or in the order of deviceIds. Devices
+            without one, or whose result has no location, have no location.
+        """
+        snapshot = cls(deviceIds=deviceIds)
+        if isinstance(locations, dict):
+            locations = [locations.get(deviceId) for deviceId in snapshot.deviceIds]
+        for i, location in enumerate(locations):
+            snapshot.set(i, location)
+        return snapshot
+
+    @classmethod
+    def from_arrays(cls, mcc, mnc, lac, cellId, deviceIds=None):
+        """
+        Creates a snapshot from array-likes of equal length, e.g., columns read from a database.
+        """
+        snapshot = cls(len(mcc), deviceIds)
+        for (field, dtype), values in zip(FIELD_DTYPES, (mcc, mnc, lac, cellId)):
+            array = numpy.asarray(values, dtype=dtype)
+            if array.shape != (len(snapshot),):
+                raise ValueError(f'{field} has shape {array.shape}, not ({len(snapshot)},)')
+            setattr(snapshot, field, array)
+        return snapshot
+
+    def __len__(self):
+        return len(self.mcc)
+
+    def copy(self):
+        """
+        Returns a snapshot with copies of this one's arrays, to keep as the previous snapshot while this one is
+        updated in place.
+        """
+        return FleetSnapshot.from_arrays(*(getattr(self, field).copy() for field in CELL_FIELDS),
+                                         deviceIds=self.deviceIds)
+
+    def index(self, deviceId):
+        """
+        Returns the index of a device.
+
+        Raises
+        ------
+        KeyError
+            if the snapshot has no device IDs, or not this one.
+        """
+        if self._indexes is None:
+            self._indexes = {d: i for i, d in enumerate(self.deviceIds or ())}
+        return self._indexes[deviceId]
+
+    def set(self, index, location):
+        """
+        Sets the location of the device at an index, from a location result or Cell; None, or a result with no
+        location, clears it.
+        """
+        cell = cell_of(location) or (0, 0, 0, 0)
+        for field, value in zip(CELL_FIELDS, cell):
+            getattr(self, field)[index] = value
+
+    def cell(self, index):
+        """
+        Returns the Cell of the device at an index, or None if it has no location.
+        """
+        if not self.mcc[index]:
+            return None
+        return Cell(*(int(getattr(self, field)[index]) for field in CELL_FIELDS))
+
+    @property
+    def present(self):
+        """
+        A boolean array, True for the devices that have a location.
+        """
+        return self.mcc != 0
+
+    def compare(self, previous):
+        """
+        Finds the devices that moved, appeared or disappeared since a previous snapshot of the same fleet, with the
+        same rules as aerisgeofence.location_changed and is_location_present.
+
+        Parameters
+        ----------
+        previous: FleetSnapshot
+
+        Returns
+        -------
+        FleetChanges
+        """
+        if len(previous) != len(self):
+            raise ValueError(f'cannot compare snapshots of {len(self)} and {len(previous)} devices')
+        # reuse one buffer for every comparison rather than allocating an array for each
+        changed = numpy.not_equal(self.cellId, previous.cellId)
+        buffer = numpy.empty_like(changed)
+        for field in ('lac', 'mnc', 'mcc'):
+            changed |= numpy.not_equal(getattr(self, field), getattr(previous, field), out=buffer)
+        present = self.present
+        wasPresent = previous.present
+        changed &= numpy.logical_and(present, wasPresent, out=buffer)
+        moved = numpy.flatnonzero(changed)
+        appeared = numpy.flatnonzero(present > wasPresent)
+        disappeared = numpy.flatnonzero(wasPresent > present)
+        return FleetChanges(moved, appeared, disappeared)
+
+
+class LocationHistory:
+    """
+    The cells devices were seen in over time, as a directory of memory-mapped columns.
+
+    Rows are (timestamp, device, mcc, mnc, lac, cellId), with devices as indices like those of FleetSnapshot and an
+    mcc of 0 when a device has no location. Only changes are written: a device seen in the same cell as before adds
+    nothing, so a mostly stationary fleet takes little room however often it is looked up. Each column is a
+    fixed-width NumPy array, in chunks of "chunkSize" rows (one .npy file per column and chunk, named after the chunk's
+    first row), so adding rows never copies earlier ones, and queries read only the chunks they need from the page
+    cache.
+
+        with LocationHistory('history') as history:
+            history.record(time.time(), fleet.index(imsi), location)
+            ...
+            for visit in history.visits(fleet.index(imsi)):
+                print(visit.cell, visit.left - visit.arrived if visit.left else 'still there')
+
+    Timestamps may not go backwards, which keeps every chunk sorted by time, so a time range is found with a binary
+    search. Rows are durable once flush (or close) writes the row count; rows after it are ignored when the history
+    is opened again.
+    """
+
+    def __init__(self, directory, chunkSize=DEFAULT_HISTORY_CHUNK_ROWS):
+        """
+        Opens a history, creating its directory if it does not exist.
+
+        Parameters
+        ----------
+        directory: str
+        chunkSize: int, optional
+            The rows per chunk of a new history; an existing one keeps the size it was created with.
+        """
+        _require_numpy('LocationHistory')
+        self.directory = directory
+        self.chunkSize = chunkSize
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._rows = 0
+        self._lastTimestamp = float('-inf')
+        self._last = FleetSnapshot(0)
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._rows
+
+    def record(self, timestamp, device, location):
+        """
+        Records the location of a device, if it is not where the device was last recorded.
+
+        Parameters
+        ----------
+        timestamp: float
+            E.g., time.time(); not less than that of any earlier record.
+        device: int
+            The index of the device.
+        location: dict or Cell
+            A result of aerframesdk.get_location; None, or a result with no location, records that the device has
+            no location.
+
+        Returns
+        -------
+        bool
+            True if a row was written.
+        """
+        cell = cell_of(location)
+        values = cell or (0, 0, 0, 0)
+        with self._lock:
+            self._check_timestamp_locked(timestamp)
+            self._ensure_devices_locked(device + 1)
+            if all(getattr(self._last, field)[device] == value for field, value in zip(CELL_FIELDS, values)):
+                return False
+            self._last.set(device, cell)
+            self._append_locked(timestamp, numpy.array([device]), *([value] for value in values))
+            return True
+
+    def record_snapshot(self, timestamp, snapshot):
+        """
+        Records the locations of a fleet, writing rows only for the devices that changed since they were last
+        recorded; device i is the i-th device of the snapshot.
+
+        Returns
+        -------
+        int
+            The number of rows written.
+        """
+        present = snapshot.present
+        # a device without a location is recorded as all zeros, whatever else a snapshot made from arrays has
+        columns = [getattr(snapshot, field) * present for field in CELL_FIELDS]
+        with self._lock:
+            self._check_timestamp_locked(timestamp)
+            size = len(snapshot)
+            self._ensure_devices_locked(size)
+            last = [getattr(self._last, field)[:size] for field in CELL_FIELDS]
+            changed = columns[0] != last[0]
+            for column, lastColumn in zip(columns[1:], last[1:]):
+                changed |= column != lastColumn
+            devices = numpy.flatnonzero(changed)
+            columns = [column[devices] for column in columns]
+            for column, lastColumn in zip(columns, last):
+                lastColumn[devices] = column
+            self._append_locked(timestamp, devices, *columns)
+            return len(devices)
+
+    def query(self, start=None, end=None, device=None):
+        """
+        Returns the rows recorded from "start" up to, but not including, "end", optionally of one device only, as a
+        NumPy structured array with the fields of HISTORY_DTYPES, in time order.
+        """
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+        parts = []
+        with self._lock:
+            for first, chunk in enumerate(self._chunks):
+                count = min(self._rows - first * self.chunkSize, self.chunkSize)
+                timestamps = chunk['timestamp'][:count]
+                if not count or timestamps[0] >= end or timestamps[count - 1] < start:
+                    continue
+                low = numpy.searchsorted(timestamps, start, 'left')
+                high = numpy.searchsorted(timestamps, end, 'left')
+                selection = slice(low, high)
+                if device is not None:
+                    selection = low + numpy.flatnonzero(chunk['device'][low:high] == device)
+                part = numpy.empty(len(timestamps[selection]), dtype=list(HISTORY_DTYPES))
+                for column, _ in HISTORY_DTYPES:
+                    part[column] = chunk[column][selection]
+                parts.append(part)
+        if not parts:
+            return numpy.empty(0, dtype=list(HISTORY_DTYPES))
+        return numpy.concatenate(parts)
+
+    def visits(self, device, start=None, end=None):
+        """
+        Returns the stays of a device in cells that began from "start" up to "end", as a list of Visits in time order,
+        e.g., for dwell times. Times without a location are not visits.
+        """
+        rows = self.query(start, None, device)
+        visits = []
+        for i, row in enumerate(rows):
+            if end is not None and row['timestamp'] >= end:
+                break
+            if not row['mcc']:
+                continue
+            left = float(rows['timestamp'][i + 1]) if i + 1 < len(rows) else None
+            visits.append(Visit(Cell(*(int(row[field]) for field in CELL_FIELDS)), float(row['timestamp']), left))
+        return visits
+
+    def cell(self, device):
+        """
+        Returns the Cell a device was last recorded in, or None.
+        """
+        with self._lock:
+            if device >= len(self._last):
+                return None
+            return self._last.cell(device)
+
+    def flush(self):
+        """
+        Writes recorded rows to disk and makes them durable.
+        """
+        with self._lock:
+            for chunk in self._chunks:
+                for array in chunk.values():
+                    array.flush()
+            path = os.path.join(self.directory, _ROWS_FILE)
+            with open(path + '.tmp', 'w') as rowsFile:
+                rowsFile.write(str(self._rows))
+                rowsFile.flush()
+                os.fsync(rowsFile.fileno())
+            os.replace(path + '.tmp', path)
+
+    def close(self):
+        """
+        Flushes the history, and unmaps its files.
+        """
+        self.flush()
+        with self._lock:
+            self._chunks = []
+
+    def _open(self):
+        try:
+            with open(os.path.join(self.directory, _ROWS_FILE)) as rowsFile:
+                rows = int(rowsFile.read().strip() or 0)
+        except FileNotFoundError:
+            rows = 0
+        firstRows = sorted(int(name.split('.')[0]) for name in os.listdir(self.directory)
+                           if name.endswith('.timestamp' + _CHUNK_SUFFIX))
+        if len(firstRows) > 1:
+            self.chunkSize = firstRows[1] - firstRows[0]
+        for firstRow in firstRows:
+            if firstRow >= rows:
+                break
+            chunk = {column: numpy.lib.format.open_memmap(os.path.join(self.directory, _chunk_name(firstRow, column)),
+                                                          mode='r+')
+                     for column, _ in HISTORY_DTYPES}
+            self.chunkSize = len(chunk['timestamp'])
+            self._chunks.append(chunk)
+        self._rows = rows
+        # the last row of each device is where it was last recorded
+        for first, chunk in enumerate(self._chunks):
+            count = min(rows - first * self.chunkSize, self.chunkSize)
+            devices = chunk['device'][:count]
+            if not count:
+                continue
+            self._lastTimestamp = float(chunk['timestamp'][count - 1])
+            uniqueDevices, lastIndexes = numpy.unique(devices[::-1], return_index=True)
+            lastIndexes = count - 1 - lastIndexes
+            self._ensure_devices_locked(int(uniqueDevices[-1]) + 1)
+            for field in CELL_FIELDS:
+                getattr(self._last, field)[uniqueDevices] = chunk[field][lastIndexes]
+
+    def _check_timestamp_locked(self, timestamp):
+        if timestamp < self._lastTimestamp:
+            raise ValueError(f'timestamp {timestamp} is before the last recorded one, {self._lastTimestamp}')
+
+    def _ensure_devices_locked(self, size):
+        if size <= len(self._last):
+            return
+        capacity = max(size, 2 * len(self._last))
+        arrays = []
+        for field, dtype in FIELD_DTYPES:
+            array = numpy.zeros(capacity, dtype=dtype)
+            previous = getattr(self._last, field)
+            array[:len(previous)] = previous
+            arrays.append(array)
+        self._last = FleetSnapshot.from_arrays(*arrays)
+
+    def _new_chunk_locked(self):
+        firstRow = len(self._chunks) * self.chunkSize
+        chunk = {column: numpy.lib.format.open_memmap(os.path.join(self.directory, _chunk_name(firstRow, column)),
+                                                      mode='w+', dtype=dtype, shape=(self.chunkSize,))
+                 for column, dtype in HISTORY_DTYPES}
+        self._chunks.append(chunk)
+        return chunk
+
+    def _append_locked(self, timestamp, devices, mcc, mnc, lac, cellId):
+        columns = {'device': devices, 'mcc': mcc, 'mnc': mnc, 'lac': lac, 'cellId': cellId}
+        written = 0
+        while written < len(devices):
+            index, offset = divmod(self._rows, self.chunkSize)
+            chunk = self._chunks[index] if index < len(self._chunks) else self._new_chunk_locked()
+            count = min(len(devices) - written, self.chunkSize - offset)
+            chunk['timestamp'][offset:offset + count] = timestamp
+            for column, values in columns.items():
+                chunk[column][offset:offset + count] = values[written:written + count]
+            written += count
+            self._rows += count
+        if written:
+            self._lastTimestamp = timestamp
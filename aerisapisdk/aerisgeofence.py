@@ -0,0 +1,816 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cell-level geofencing of many devices with the AerFrame location API; see also sample/aerframe_budget_geofence.py.
+"""
+
+import collections
+import concurrent.futures
+import heapq
+import logging
+import math
+import threading
+import time
+
+import aerisapisdk.aerframesdk as aerframesdk
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCATION_PERIOD_SECONDS = 60 * 60
+DEFAULT_GEOFENCE_WORKERS = 8
+DEFAULT_MIN_LOCATION_PERIOD_SECONDS = 60
+DEFAULT_MOBILITY_HALF_LIFE_SECONDS = 6 * 60 * 60
+
+# mobility scores are kept relative to a reference time, which is moved forward before they grow this large
+_RESCALE_EXPONENT = 50.0
+
+CELL_FIELDS = ('mcc', 'mnc', 'lac', 'cellId')
+
+# bits of each field of a packed cell; wide enough for 24-bit tracking area codes and 36-bit NR cell identities
+_MCC_BITS = 10
+_MNC_BITS = 10
+_LAC_BITS = 24
+_CELL_ID_BITS = 36
+_LAC_KEY_LIMITS = ((1 << _MCC_BITS), (1 << _MNC_BITS), (1 << _LAC_BITS))
+
+# the cell ID of a fence file entry that covers a whole LAC
+LAC_WILDCARD = '*'
+
+Cell = collections.namedtuple('Cell', CELL_FIELDS)
+Cell.__doc__ = """The cell a device was last located in, as returned by aerframesdk.get_location."""
+
+FenceTransition = collections.namedtuple('FenceTransition', ['deviceId', 'entered', 'exited', 'fences'])
+FenceTransition.__doc__ = """A device entering or leaving geofences.
+
+entered and exited are frozensets of the names of the fences the device entered and left; fences are the names of
+every fence it is in now.
+"""
+
+_NO_FENCES = frozenset()
+
+
+def is_location_present(location):
+    """
+    Checks to see if a location result has actual data, or if it is the "no location available" response (an "mcc"
+    of 0).
+
+    Parameters
+    ----------
+    location: dict or Cell
+
+    Returns
+    -------
+    bool
+        True if there is actually some location data in there.
+    """
+    if location is None:
+        return False
+    mcc = location.mcc if isinstance(location, Cell) else location.get('mcc', 0)
+    return bool(mcc)
+
+
+def cell_of(location):
+    """
+    Returns the Cell of a location result, or None if no location is available.
+    """
+    if isinstance(location, Cell):
+        return location
+    if not is_location_present(location):
+        return None
+    return Cell(*(int(location[field]) for field in CELL_FIELDS))
+
+
+def location_changed(newLocation, previousLocation):
+    """
+    Examines device locations to determine if a device has moved to another cell.
+
+    Parameters
+    ----------
+    newLocation: dict or Cell
+    previousLocation: dict or Cell
+
+    Returns
+    -------
+    bool
+        True if both locations are present and differ in mcc, mnc, lac or cellId.
+    """
+    new = cell_of(newLocation)
+    previous = cell_of(previousLocation)
+    return new is not None and previous is not None and new != previous
+
+
+def pack_lac(mcc, mnc, lac):
+    """
+    Packs an mcc, mnc and lac into one integer.
+
+    Raises
+    ------
+    ValueError
+        if a field is negative or too large.
+    """
+    for value, limit in zip((mcc, mnc, lac), _LAC_KEY_LIMITS):
+        if not 0 <= value < limit:
+            raise ValueError(f'{value} is out of range for a packed cell')
+    return (((mcc << _MNC_BITS) | mnc) << _LAC_BITS) | lac
+
+
+def pack_cell(mcc, mnc, lac, cellId):
+    """
+    Packs an mcc, mnc, lac and cellId into one integer, e.g., to use a cell as a dict key cheaply.
+
+    Raises
+    ------
+    ValueError
+        if a field is negative or too large.
+    """
+    if not 0 <= cellId < (1 << _CELL_ID_BITS):
+        raise ValueError(f'{cellId} is out of range for a packed cell')
+    return (pack_lac(mcc, mnc, lac) << _CELL_ID_BITS) | cellId
+
+
+def unpack_cell(packed):
+    """
+    Returns the Cell of an integer made by pack_cell.
+    """
+    cellId = packed & ((1 << _CELL_ID_BITS) - 1)
+    packed >>= _CELL_ID_BITS
+    lac = packed & ((1 << _LAC_BITS) - 1)
+    packed >>= _LAC_BITS
+    return Cell(packed >> _MNC_BITS, packed & ((1 << _MNC_BITS) - 1), lac, cellId)
+
+
+class GeofenceIndex:
+    """
+    Named geofences, each a set of cells and of whole LACs, indexed so that the fences a location is in are found
+    with two dict lookups however many fences there are.
+
+    Cells are keyed by pack_cell and LACs by pack_lac. A location is in a fence if its cell, or its LAC, is part of
+    the fence. The sets of fence names are shared between keys with the same fences, so large fences cost a dict
+    entry per cell and little more, and a set is dropped once no key has it.
+
+    Fence files have one fence per line: its name (without whitespace) followed by its cells as "mcc-mnc-lac-cellId",
+    or whole LACs as "mcc-mnc-lac-*", separated by whitespace. Blank lines and lines starting with "#" are ignored.
+
+        # name   cells and LACs
+        depot-1  204-4-1234-5678 204-4-1234-5679 204-4-1300-*
+    """
+
+    def __init__(self):
+        self._cells = {}
+        self._lacs = {}
+        self._definitions = {}
+        # shared sets of fence names, each with the number of cell and LAC keys that have it
+        self._interned = {}
+        # the fences of locations in both a cell and a LAC with fences, by (cell fences, LAC fences); only valid until
+        # the fences change
+        self._unions = {}
+
+    def __len__(self):
+        return len(self._definitions)
+
+    def __contains__(self, name):
+        return name in self._definitions
+
+    @property
+    def names(self):
+        """
+        The names of the fences, as a list.
+        """
+        return list(self._definitions)
+
+    def _intern(self, fences):
+        entry = self._interned.get(fences)
+        if entry is None:
+            entry = self._interned[fences] = [fences, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release(self, fences):
+        entry = self._interned[fences]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._interned[fences]
+
+    def add(self, name, cells=(), lacs=()):
+        """
+        Adds a fence, replacing any fence of the same name.
+
+        Parameters
+        ----------
+        name: str
+        cells: iterable, optional
+            Of Cells or (mcc, mnc, lac, cellId) tuples.
+        lacs: iterable, optional
+            Of (mcc, mnc, lac) tuples; every cell in these LACs is in the fence.
+        """
+        if name in self._definitions:
+            self.remove(name)
+        cellKeys = frozenset(pack_cell(*cell) for cell in cells)
+        lacKeys = frozenset(pack_lac(*lac) for lac in lacs)
+        self._definitions[name] = (cellKeys, lacKeys)
+        self._unions.clear()
+        for index, keys in ((self._cells, cellKeys), (self._lacs, lacKeys)):
+            for key in keys:
+                previous = index.get(key)
+                index[key] = self._intern((previous or _NO_FENCES) | {name})
+                if previous is not None:
+                    self._release(previous)
+
+    def remove(self, name):
+        """
+        Removes a fence, if there is one with the name.
+        """
+        cellKeys, lacKeys = self._definitions.pop(name, (_NO_FENCES, _NO_FENCES))
+        self._unions.clear()
+        for index, keys in ((self._cells, cellKeys), (self._lacs, lacKeys)):
+            for key in keys:
+                previous = index[key]
+                fences = previous - {name}
+                if fences:
+                    index[key] = self._intern(fences)
+                else:
+                    del index[key]
+                self._release(previous)
+
+    def fences(self, location):
+        """
+        Returns the names of the fences a location is in, as a frozenset.
+
+        Parameters
+        ----------
+        location: dict or Cell
+            A result of aerframesdk.get_location. A location that is not available is in no fence.
+        """
+        cell = cell_of(location)
+        if cell is None:
+            return _NO_FENCES
+        try:
+            lacKey = pack_lac(cell.mcc, cell.mnc, cell.lac)
+            cellKey = (lacKey << _CELL_ID_BITS) | cell.cellId
+        except ValueError:
+            return _NO_FENCES
+        byCell = self._cells.get(cellKey, _NO_FENCES)
+        byLac = self._lacs.get(lacKey, _NO_FENCES)
+        if not byLac:
+            return byCell
+        if not byCell:
+            return byLac
+        fences = self._unions.get((byCell, byLac))
+        if fences is None:
+            fences = self._unions[byCell, byLac] = byCell | byLac
+        return fences
+
+    def contains(self, name, location):
+        """
+        Returns True if a location is in the named fence.
+        """
+        return name in self.fences(location)
+
+    def transition(self, previousFences, location):
+        """
+        Returns the fences entered and exited by a device that was in "previousFences" and is now at "location", and
+        the fences it is in now, as three frozensets. A location that is not available changes nothing.
+        """
+        if not is_location_present(location):
+            return _NO_FENCES, _NO_FENCES, previousFences
+        fences = self.fences(location)
+        if fences == previousFences:
+            return _NO_FENCES, _NO_FENCES, fences
+        return fences - previousFences, previousFences - fences, fences
+
+    @classmethod
+    def load(cls, path):
+        """
+        Creates an index from a fence file.
+
+        Raises
+        ------
+        ValueError
+            if a line is not valid.
+        """
+        index = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                cells = []
+                lacs = []
+                for entry in fields[1:]:
+                    parts = entry.split('-')
+                    try:
+                        if len(parts) != 4:
+                            raise ValueError(entry)
+                        if parts[3] == LAC_WILDCARD:
+                            lacs.append(tuple(int(part) for part in parts[:3]))
+                        else:
+                            cells.append(tuple(int(part) for part in parts))
+                    except ValueError:
+                        raise ValueError(f'{path}:{number}: {entry} is not mcc-mnc-lac-cellId or mcc-mnc-lac-*')
+                index.add(fields[0], cells, lacs)
+        return index
+
+    def dump(self, path):
+        """
+        Writes the fences to a fence file.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for name, (cellKeys, lacKeys) in self._definitions.items():
+                entries = ['-'.join(map(str, unpack_cell(key))) for key in sorted(cellKeys)]
+                entries.extend('-'.join(map(str, unpack_cell(key << _CELL_ID_BITS)[:3])) + '-' + LAC_WILDCARD
+                               for key in sorted(lacKeys))
+                f.write(' '.join([name] + entries) + '\n')
+
+
+class GeofenceTracker:
+    """
+    Remembers which fences of a GeofenceIndex each device is in, and reports when devices enter or leave fences.
+
+    Use it as GeofenceWatcher's onLocation, or call update with location results directly:
+
+        tracker = GeofenceTracker(GeofenceIndex.load('fences.txt'), onTransition=print)
+        watcher = GeofenceWatcher(accountId, appApiKey, imsis, onLocation=tracker)
+
+    Only the fences a device is in are stored per device, as a frozenset shared with the index.
+    """
+
+    def __init__(self, index, onTransition=None):
+        """
+        Parameters
+        ----------
+        index: GeofenceIndex
+        onTransition: function, optional
+            Called with a FenceTransition whenever a device enters or leaves a fence.
+        """
+        self.index = index
+        self.onTransition = onTransition
+        self._lock = threading.Lock()
+        self._fences = {}
+
+    def update(self, deviceId, location):
+        """
+        Records the location of a device, and returns a FenceTransition if it entered or left a fence, or None.
+        """
+        with self._lock:
+            previous = self._fences.get(deviceId, _NO_FENCES)
+            entered, exited, fences = self.index.transition(previous, location)
+            if fences:
+                self._fences[deviceId] = fences
+            else:
+                self._fences.pop(deviceId, None)
+        if not entered and not exited:
+            return None
+        transition = FenceTransition(deviceId, entered, exited, fences)
+        if self.onTransition is not None:
+            self.onTransition(transition)
+        return transition
+
+    def __call__(self, deviceId, location, cell=None):
+        self.update(deviceId, location)
+
+    def fences(self, deviceId):
+        """
+        Returns the names of the fences a device was last seen in, as a frozenset.
+        """
+        with self._lock:
+            return self._fences.get(deviceId, _NO_FENCES)
+
+    def forget(self, deviceId):
+        """
+        Forgets the fences of a device, e.g., when it is no longer watched.
+        """
+        with self._lock:
+            self._fences.pop(deviceId, None)
+
+
+class PollingBudget:
+    """
+    Spreads a budget of location lookups per hour over a fleet, looking up the devices that move often more often,
+    and stationary ones less and less often.
+
+    Each device has a weight of priority * (1 + mobilityWeight * mobility), where mobility is the rate at which it
+    has recently changed cells, in moves per hour, decaying with a half-life of "halfLife" seconds. Each device gets
+    its weight's share of the budget, so it is looked up every 3600 * totalWeight / (callsPerHour * weight) seconds,
+    which keeps the whole fleet within callsPerHour, then limited to between minInterval and maxInterval.
+
+    It is GeofenceWatcher's interval function:
+
+        budget = PollingBudget(callsPerHour=10000, devices=imsis)
+        watcher = GeofenceWatcher(accountId, appApiKey, imsis, period=budget.interval(), interval=budget)
+
+    Updating a device and finding its interval take constant time, however many devices there are: every mobility
+    decays at the same rate, so they are all kept relative to one reference time and only their totals are updated.
+    """
+
+    def __init__(self, callsPerHour, devices=(), priorities=None, mobilityWeight=1.0,
+                 halfLife=DEFAULT_MOBILITY_HALF_LIFE_SECONDS, minInterval=DEFAULT_MIN_LOCATION_PERIOD_SECONDS,
+                 maxInterval=None, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        callsPerHour: float
+            The number of location lookups per hour to spread over all the devices.
+        devices: iterable, optional
+            The IDs of the devices to share the budget between; devices are also added the first time they are
+            updated, but giving them up front keeps the first few from taking the whole budget.
+        priorities: dict, optional
+            Priorities by device ID; the default priority is 1. A device of priority 2 gets twice the lookups of one
+            of priority 1 that moves as much.
+        mobilityWeight: float, optional
+            How much a move per hour adds to the weight of a device, relative to not moving at all.
+        halfLife: float, optional
+            Seconds after which a move counts half as much towards a device's mobility.
+        minInterval: float, optional
+            The fewest seconds between lookups of a device, however much it moves.
+        maxInterval: float, optional
+            The most seconds between lookups of a device, however little it moves. This can take the fleet over
+            budget when the budget is too small for it; None for no limit.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        """
+        if callsPerHour <= 0:
+            raise ValueError('callsPerHour must be positive')
+        if maxInterval is not None and maxInterval < minInterval:
+            raise ValueError('maxInterval must not be less than minInterval')
+        self.callsPerHour = callsPerHour
+        self.mobilityWeight = mobilityWeight
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self._tau = halfLife / math.log(2)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reference = clock()
+        # priority and mobility score (the mobility at the reference time) by device, and their totals
+        self._priorities = {}
+        self._scores = {}
+        self._totalPriority = 0.0
+        self._totalScore = 0.0
+        priorities = priorities or {}
+        for deviceId in devices:
+            self._add_locked(deviceId, priorities.get(deviceId, 1.0))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._priorities)
+
+    def __call__(self, deviceId, moved):
+        """
+        Records that a device was looked up, and whether it had moved, and returns the seconds until its next lookup.
+        """
+        return self.update(deviceId, moved)
+
+    def update(self, deviceId, moved):
+        """
+        Records that a device was looked up, and whether it had moved, and returns the seconds until its next lookup.
+        """
+        with self._lock:
+            now = self._clock()
+            decay = self._decay_locked(now)
+            if deviceId not in self._priorities:
+                self._add_locked(deviceId, 1.0)
+            if moved:
+                # a move adds 1 / tau moves per hour now, so that a steady rate of moves converges to itself
+                score = 3600.0 / (self._tau * decay)
+                self._scores[deviceId] += score
+                self._totalScore += self._priorities[deviceId] * score
+            return self._interval_locked(deviceId, decay)
+
+    def interval(self, deviceId=None):
+        """
+        Returns the seconds between lookups of a device at its current mobility, without recording a lookup; for no
+        device, the mean interval of the fleet if no device moved, e.g., as GeofenceWatcher's period.
+        """
+        with self._lock:
+            decay = self._decay_locked(self._clock())
+            if deviceId is None:
+                return self._clamp(3600.0 * max(len(self._priorities), 1) / self.callsPerHour)
+            if deviceId not in self._priorities:
+                self._add_locked(deviceId, 1.0)
+            return self._interval_locked(deviceId, decay)
+
+    def mobility(self, deviceId):
+        """
+        Returns the recent moves per hour of a device.
+        """
+        with self._lock:
+            decay = self._decay_locked(self._clock())
+            return self._scores.get(deviceId, 0.0) * decay
+
+    def set_priority(self, deviceId, priority):
+        """
+        Sets the priority of a device, adding it if it is new.
+        """
+        if priority <= 0:
+            raise ValueError('priority must be positive')
+        with self._lock:
+            if deviceId not in self._priorities:
+                self._add_locked(deviceId, priority)
+                return
+            previous = self._priorities[deviceId]
+            self._priorities[deviceId] = priority
+            self._totalPriority += priority - previous
+            self._totalScore += (priority - previous) * self._scores[deviceId]
+
+    def remove(self, deviceId):
+        """
+        Stops sharing the budget with a device.
+        """
+        with self._lock:
+            priority = self._priorities.pop(deviceId, None)
+            if priority is None:
+                return
+            self._totalPriority -= priority
+            self._totalScore -= priority * self._scores.pop(deviceId)
+
+    def _add_locked(self, deviceId, priority):
+        if priority <= 0:
+            raise ValueError('priority must be positive')
+        self._priorities[deviceId] = priority
+        self._scores[deviceId] = 0.0
+        self._totalPriority += priority
+
+    def _decay_locked(self, now):
+        exponent = (now - self._reference) / self._tau
+        if exponent > _RESCALE_EXPONENT:
+            factor = math.exp(-exponent)
+            for deviceId in self._scores:
+                self._scores[deviceId] *= factor
+            # also clears the rounding errors of the running total
+            self._totalScore = math.fsum(p * self._scores[d] for d, p in self._priorities.items())
+            self._reference = now
+            exponent = 0.0
+        return math.exp(-exponent)
+
+    def _interval_locked(self, deviceId, decay):
+        mobilityWeight = self.mobilityWeight * decay
+        totalWeight = self._totalPriority + mobilityWeight * max(self._totalScore, 0.0)
+        weight = self._priorities[deviceId] * (1.0 + mobilityWeight * self._scores[deviceId])
+        return self._clamp(3600.0 * totalWeight / (self.callsPerHour * weight))
+
+    def _clamp(self, interval):
+        interval = max(interval, self.minInterval)
+        if self.maxInterval is not None:
+            interval = min(interval, self.maxInterval)
+        return interval
+
+
+class GeofenceWatcher:
+    """
+    Watches where many devices are in the cellular network, and reports when they move to another cell.
+
+    Every device has a next-due time in a heap. A dispatcher thread takes the devices that are due and looks their
+    locations up on a pool of threads, with at most "maxWorkers" lookups in flight, then schedules each device's next
+    lookup "period" seconds later (or after "interval(deviceId, moved)" seconds, if given). Only the last known Cell of
+    each device is kept. The first lookups of the devices given up front are spread over one period.
+
+        def moved(deviceId, previous, cell):
+            logger.warning('%s moved from %s to %s', deviceId, previous, cell)
+
+        with GeofenceWatcher(accountId, appApiKey, imsis, onMove=moved):
+            ...
+
+    A lookup that fails is logged and counted, and retried after the same delay; the device keeps its last known Cell.
+    Lookups that return no location ("mcc" 0) leave it unchanged too.
+    """
+
+    def __init__(self, accountId, apiKey, devices=(), deviceIdType='IMSI', period=DEFAULT_LOCATION_PERIOD_SECONDS,
+                 maxWorkers=DEFAULT_GEOFENCE_WORKERS, onMove=None, onLocation=None, interval=None, locator=None,
+                 clock=time.monotonic, verbose=False):
+        """
+        Parameters
+        ----------
+        accountId: str
+            The account ID that owns the devices.
+        apiKey: str
+            An API key for the account ID.
+        devices: iterable, optional
+            The IDs of the devices to watch; more can be added with add_device.
+        deviceIdType: str, optional
+            The type of the device IDs, 'IMSI' or 'MSISDN'.
+        period: float, optional
+            Seconds between the lookups of a device.
+        maxWorkers: int, optional
+            The maximum number of lookups in flight at once.
+        onMove: function, optional
+            Called as onMove(deviceId, previousCell, cell) when a device is found in another cell than before.
+        onLocation: function, optional
+            Called as onLocation(deviceId, location, cell) with every location looked up; cell is None if the location
+            is not available.
+        interval: function, optional
+            Called as interval(deviceId, moved) after every lookup; returns the seconds until the device's next one.
+        locator: function, optional
+            Called as locator(deviceIdType, deviceId) to look a location up, e.g., AerisClient.get_location. Defaults
+            to aerframesdk.get_location with accountId and apiKey.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        verbose: bool, optional
+            True to verbosely log every lookup.
+        """
+        if maxWorkers < 1:
+            raise ValueError('maxWorkers must be at least 1')
+        self.accountId = accountId
+        self.apiKey = apiKey
+        self.deviceIdType = deviceIdType
+        self.period = period
+        self.maxWorkers = maxWorkers
+        self.onMove = onMove
+        self.onLocation = onLocation
+        self.interval = interval
+        self.locator = locator if locator is not None else self._get_location
+        self.verbose = verbose
+
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._cells = {}
+        self._heap = []
+        self._due = {}
+        self._slots = threading.BoundedSemaphore(maxWorkers)
+        self._stopping = threading.Event()
+        self._dispatcher = None
+        self._executor = None
+        self._stats = {'lookups': 0, 'errors': 0, 'moves': 0}
+
+        devices = list(devices)
+        now = clock()
+        for i, deviceId in enumerate(devices):
+            due = now + period * i / len(devices)
+            self._due[deviceId] = due
+            self._heap.append((due, deviceId))
+            self._cells[deviceId] = None
+        heapq.heapify(self._heap)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._cells)
+
+    @property
+    def running(self):
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def start(self):
+        """
+        Starts looking locations up.
+        """
+        if self.running:
+            raise RuntimeError('GeofenceWatcher is already running')
+        self._stopping.clear()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers,
+                                                               thread_name_prefix='aeris-geofence')
+        self._dispatcher = threading.Thread(target=self._dispatch, name='aeris-geofence-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops looking locations up, and waits for the lookups in flight to finish.
+        """
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def add_device(self, deviceId, delay=0, cell=None):
+        """
+        Starts watching a device, with its first lookup after "delay" seconds. "cell" is its last known Cell, if any.
+        Does nothing if the device is watched already.
+        """
+        with self._condition:
+            if deviceId in self._cells:
+                return
+            self._cells[deviceId] = cell
+            self._schedule_locked(deviceId, self._clock() + delay)
+
+    def remove_device(self, deviceId):
+        """
+        Stops watching a device.
+        """
+        with self._condition:
+            self._cells.pop(deviceId, None)
+            self._due.pop(deviceId, None)
+
+    def check_now(self, deviceId):
+        """
+        Moves the next lookup of a watched device to now.
+        """
+        with self._condition:
+            if deviceId in self._cells and deviceId in self._due:
+                self._schedule_locked(deviceId, self._clock())
+
+    def cell(self, deviceId):
+        """
+        Returns the last known Cell of a device, or None.
+        """
+        with self._condition:
+            return self._cells.get(deviceId)
+
+    def stats(self):
+        """
+        Returns counters of lookups made, failed lookups and moves seen, and the number of devices watched, as a dict.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats['devices'] = len(self._cells)
+            return stats
+
+    def _get_location(self, deviceIdType, deviceId):
+        return aerframesdk.get_location(self.accountId, self.apiKey, deviceIdType, deviceId, self.verbose)
+
+    def _schedule_locked(self, deviceId, due):
+        # earlier entries of the device stay in the heap, and are skipped when they come up
+        self._due[deviceId] = due
+        heapq.heappush(self._heap, (due, deviceId))
+        self._condition.notify()
+
+    def _next_due(self):
+        with self._condition:
+            while not self._stopping.is_set():
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                due, deviceId = self._heap[0]
+                if self._due.get(deviceId) != due:
+                    heapq.heappop(self._heap)
+                    continue
+                wait = due - self._clock()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                del self._due[deviceId]
+                return deviceId
+            return None
+
+    def _dispatch(self):
+        while True:
+            # wait for a free worker first, so that devices are taken from the heap only once they can be looked up
+            while not self._slots.acquire(timeout=0.5):
+                if self._stopping.is_set():
+                    return
+            deviceId = self._next_due()
+            if deviceId is None:
+                self._slots.release()
+                return
+            self._executor.submit(self._check, deviceId)
+
+    def _check(self, deviceId):
+        try:
+            try:
+                moved = False
+                try:
+                    location = self.locator(self.deviceIdType, deviceId)
+                except Exception as e:
+                    logger.warning('Looking up the location of %s failed: %s', deviceId, e)
+                    with self._condition:
+                        self._stats['errors'] += 1
+                else:
+                    moved = self._update(deviceId, location)
+                delay = self.interval(deviceId, moved) if self.interval is not None else self.period
+            except Exception:
+                logger.exception('Checking the location of %s failed', deviceId)
+                delay = self.period
+            with self._condition:
+                if deviceId in self._cells and deviceId not in self._due:
+                    self._schedule_locked(deviceId, self._clock() + delay)
+        finally:
+            self._slots.release()
+
+    def _update(self, deviceId, location):
+        cell = cell_of(location)
+        with self._condition:
+            self._stats['lookups'] += 1
+            if deviceId not in self._cells:
+                return False
+            previous = self._cells[deviceId]
+            moved = location_changed(cell, previous)
+            if cell is not None:
+                self._cells[deviceId] = cell
+            if moved:
+                self._stats['moves'] += 1
+        if self.onLocation is not None:
+            self.onLocation(deviceId, location, cell)
+        if moved:
+            logger.debug('Device %s moved from %s to %s', deviceId, previous, cell)
+            if self.onMove is not None:
+                self.onMove(deviceId, previous, cell)
+        return moved
@@ -0,0 +1,215 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Shared HTTP transport for the Aeris API modules.
+
+Keeps one keep-alive requests.Session per API host (scheme plus host plus port), so repeated calls to the same
+Aeris API reuse TCP and TLS connections instead of opening a new connection for every request.
+Sessions that have not been used for a while, and have no request in flight, are closed and recreated on their
+next use.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import aerisapisdk.aerisjson as aerisjson
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_POOL_BLOCK = False
+DEFAULT_MAX_IDLE_SECONDS = 60
+
+__settings = {'pool_connections': DEFAULT_POOL_CONNECTIONS,
+              'pool_maxsize': DEFAULT_POOL_MAXSIZE,
+              'pool_block': DEFAULT_POOL_BLOCK,
+              'max_idle_seconds': DEFAULT_MAX_IDLE_SECONDS}
+__sessions = {}  # maps a host key to a [session, last used time, requests in flight] list
+__lock = threading.Lock()
+__last_reap = time.monotonic()
+
+
+def configure(pool_connections=None, pool_maxsize=None, pool_block=None, max_idle_seconds=None):
+    """
+    Changes the connection pool settings. Settings that are omitted keep their current value.
+    Existing sessions are closed, so the new settings apply to every request made afterwards.
+
+    Parameters
+    ----------
+    pool_connections: int, optional
+        The number of connection pools to cache per session.
+    pool_maxsize: int, optional
+        The maximum number of connections to keep open to a single API host.
+    pool_block: bool, optional
+        True to make callers wait for a free connection when pool_maxsize connections to a host are in use,
+        False to open (and then discard) extra connections instead.
+    max_idle_seconds: float, optional
+        How long a host's session may go unused before its connections are closed; 0 disables reaping.
+
+    Returns
+    -------
+    dict
+        The settings now in effect.
+    """
+    with __lock:
+        if pool_connections is not None:
+            __settings['pool_connections'] = pool_connections
+        if pool_maxsize is not None:
+            __settings['pool_maxsize'] = pool_maxsize
+        if pool_block is not None:
+            __settings['pool_block'] = pool_block
+        if max_idle_seconds is not None:
+            __settings['max_idle_seconds'] = max_idle_seconds
+        __close_all_locked()
+        return dict(__settings)
+
+
+def get_settings():
+    """
+    Returns the connection pool settings now in effect as a dict.
+    """
+    with __lock:
+        return dict(__settings)
+
+
+def get_session(url):
+    """
+    Returns the shared requests.Session for the host of a URL, creating it if necessary.
+    Only requests sent through request() keep the session from being reaped while they are in flight.
+
+    Parameters
+    ----------
+    url: str
+        Any URL on the API host.
+
+    Returns
+    -------
+    requests.Session
+    """
+    now = time.monotonic()
+    with __lock:
+        return __entry_locked(_host_key(url), now)[0]
+
+
+def reap_idle_sessions():
+    """
+    Closes the sessions of hosts that have not been used for longer than the max_idle_seconds setting.
+    Sessions with a request in flight are kept.
+
+    Returns
+    -------
+    int
+        The number of sessions closed.
+    """
+    with __lock:
+        return __reap_idle_locked(time.monotonic(), force=True)
+
+
+def close():
+    """
+    Closes every shared session and its connections. Later requests open new sessions.
+    """
+    with __lock:
+        __close_all_locked()
+
+
+def request(method, url, **kwargs):
+    """
+    Sends an HTTP request over the shared session for the URL's host.
+    Takes the same arguments as requests.request; a "json" body is encoded with aerisjson.
+
+    Returns
+    -------
+    requests.Response
+    """
+    payload = kwargs.pop('json', None)
+    if payload is not None:
+        kwargs['data'] = aerisjson.dumps(payload)
+        headers = dict(kwargs.get('headers') or {})
+        headers.setdefault('Content-Type', 'application/json')
+        kwargs['headers'] = headers
+    key = _host_key(url)
+    with __lock:
+        entry = __entry_locked(key, time.monotonic())
+        entry[2] += 1
+    try:
+        return entry[0].request(method, url, **kwargs)
+    finally:
+        with __lock:
+            entry[1] = time.monotonic()
+            entry[2] -= 1
+
+
+def get(url, params=None, **kwargs):
+    return request('GET', url, params=params, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs):
+    return request('POST', url, data=data, json=json, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request('DELETE', url, **kwargs)
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return parts.scheme.lower() + '://' + parts.netloc.lower()
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=__settings['pool_connections'],
+                          pool_maxsize=__settings['pool_maxsize'],
+                          pool_block=__settings['pool_block'])
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def __entry_locked(key, now):
+    __reap_idle_locked(now)
+    entry = __sessions.get(key)
+    if entry is None:
+        entry = [_new_session(), now, 0]
+        __sessions[key] = entry
+    else:
+        entry[1] = now
+    return entry
+
+
+def __reap_idle_locked(now, force=False):
+    global __last_reap
+    max_idle = __settings['max_idle_seconds']
+    if not max_idle:
+        return 0
+    # scanning every host on every request is wasteful; only look once per idle period unless asked to
+    if not force and now - __last_reap < max_idle:
+        return 0
+    __last_reap = now
+    idle_keys = [key for key, (session, last_used, in_flight) in __sessions.items()
+                 if not in_flight and now - last_used > max_idle]
+    for key in idle_keys:
+        __sessions.pop(key)[0].close()
+    return len(idle_keys)
+
+
+def __close_all_locked():
+    for session, last_used, in_flight in __sessions.values():
+        session.close()
+    __sessions.clear()
@@ -0,0 +1,129 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+JSON encoding and decoding for request and response bodies.
+
+Decodes straight from response bytes, skipping the text decoding (and charset detection) of requests' Response.text,
+and encodes request bodies straight to bytes. Uses orjson or ujson when one is installed, and the standard library's
+json module otherwise.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional, faster backend
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # optional, faster backend
+    ujson = None
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+
+__backends = {'json': (_json_loads, _json_dumps)}
+if ujson is not None:
+    __backends['ujson'] = (ujson.loads, _ujson_dumps)
+if orjson is not None:
+    __backends['orjson'] = (orjson.loads, orjson.dumps)
+
+__backend = None
+__loads = None
+__dumps = None
+
+
+def get_available_backends():
+    """
+    Returns the names of the JSON backends that can be used, fastest first, as a list of str.
+    """
+    return [name for name in ('orjson', 'ujson', 'json') if name in __backends]
+
+
+def get_backend():
+    """
+    Returns the name of the JSON backend in use as a str.
+    """
+    return __backend
+
+
+def set_backend(name=None):
+    """
+    Chooses the JSON backend.
+
+    Parameters
+    ----------
+    name: str, optional
+        'orjson', 'ujson' or 'json'. If omitted, uses the fastest one installed.
+
+    Raises
+    ------
+    ValueError
+        if the named backend is not installed.
+    """
+    global __backend, __loads, __dumps
+    if name is None:
+        name = get_available_backends()[0]
+    if name not in __backends:
+        raise ValueError(f'JSON backend {name} is not available; choose one of {get_available_backends()}')
+    __backend = name
+    __loads, __dumps = __backends[name]
+
+
+def loads(data):
+    """
+    Parses a JSON document.
+
+    Parameters
+    ----------
+    data: bytes or str
+        The document, e.g., the "content" of an HTTP response. Bytes must be UTF-8 encoded, as the orjson and
+        ujson backends accept nothing else; decode other encodings to str first.
+
+    Returns
+    -------
+    The parsed object.
+
+    Raises
+    ------
+    ValueError
+        if the document is not valid JSON.
+    """
+    return __loads(data)
+
+
+def dumps(obj):
+    """
+    Serializes an object as compact, UTF-8 encoded JSON.
+
+    Returns
+    -------
+    bytes
+    """
+    return __dumps(obj)
+
+
+set_backend()
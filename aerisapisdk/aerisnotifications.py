@@ -0,0 +1,497 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Continuous consumption of AerFrame notification channels.
+"""
+
+import collections
+import logging
+import queue
+import threading
+
+import requests
+
+import aerisapisdk.aerframesdk as aerframesdk
+from aerisapisdk.aerisfilters import DELIVERY_RECEIPT, MO_SMS, Notification, iter_notifications
+from aerisapisdk.exceptions import ApiException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLLERS = 2
+DEFAULT_LONG_POLL_SECONDS = 30
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 10
+DEFAULT_READ_TIMEOUT_MARGIN_SECONDS = 10
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_ERROR_BACKOFF_SECONDS = 1
+DEFAULT_MAX_ERROR_BACKOFF_SECONDS = 30
+DEFAULT_TUNER_WINDOW = 50
+DEFAULT_TUNER_FULL_RATIO = 0.5
+DEFAULT_TUNER_SHRINK_RATIO = 0.25
+DEFAULT_MAX_TUNED_NOTIFICATIONS = 500
+DEFAULT_MIN_TUNED_NOTIFICATIONS = aerframesdk.DEFAULT_MAX_NOTIFICATIONS
+
+# how often a poller blocked on a full queue checks whether it should stop
+_QUEUE_PUT_INTERVAL_SECONDS = 0.5
+
+
+def recreate_channel(accountId, apiKey, appApiKey, appShortName, channelId, maxNotifications, verbose=False):
+    """
+    Creates a copy of a notification channel with a different maxNotifications, and moves the application's outbound
+    (MT delivery receipt) subscriptions from the old channel to the new one. Channels cannot be changed once created.
+
+    The old channel is left in place so that notifications already queued on it can still be polled; delete it with
+    aerframesdk.delete_channel once it is empty. A channel that an inbound (MO-SMS) subscription notifies is not
+    recreated: the SDK cannot move inbound subscriptions, and MO-SMs would keep arriving on the old channel after it
+    was drained.
+
+    Parameters
+    ----------
+    accountId: str
+    apiKey: str
+        An API key of the account.
+    appApiKey: str
+        The API key of the application.
+    appShortName: str
+        The short name of the application whose subscriptions notify the channel.
+    channelId: str
+        The ID of the channel to copy.
+    maxNotifications: int
+        The most notifications that one poll of the new channel returns.
+    verbose: bool, optional
+
+    Returns
+    -------
+    dict
+        The configuration of the new channel.
+
+    Raises
+    ------
+    ApiException
+        if there was a problem with the API.
+    ValueError
+        if an inbound subscription notifies the channel.
+    """
+    inbound = aerframesdk.find_subscriptions(accountId, appApiKey, None, aerframesdk.INBOUND, channelId, verbose,
+                                             useCache=False)
+    if inbound:
+        raise ValueError(f'Channel {channelId} has inbound subscriptions '
+                         f'({", ".join(s.subscriptionId for s in inbound)}), which cannot be moved to a new channel')
+    oldChannel = aerframesdk.get_channel(accountId, apiKey, channelId, verbose)
+    newChannel = aerframesdk.create_channel(accountId, apiKey, oldChannel['applicationTag'], verbose,
+                                            maxNotifications=maxNotifications)
+    newChannelId = newChannel['resourceURL'].rsplit('/', 1)[-1]
+    for subscription in aerframesdk.find_subscriptions(accountId, appApiKey, appShortName, aerframesdk.OUTBOUND,
+                                                       channelId, verbose):
+        aerframesdk.create_outbound_subscription(accountId, appApiKey, appShortName, newChannelId, verbose)
+        aerframesdk.delete_outbound_subscription(accountId, appApiKey, appShortName, subscription.subscriptionId,
+                                                 verbose)
+    logger.info('Recreated channel %s as %s with maxNotifications %s', channelId, newChannelId, maxNotifications)
+    return newChannel
+
+
+class PollSizeTuner:
+    """
+    Watches how many notifications each poll of a channel returns, and recommends a maxNotifications that matches
+    them: a larger one when most polls come back full, which means notifications are waiting for later polls, and a
+    smaller one when no poll comes close to full.
+    """
+
+    def __init__(self, maxNotifications, window=DEFAULT_TUNER_WINDOW, fullRatio=DEFAULT_TUNER_FULL_RATIO,
+                 maximum=DEFAULT_MAX_TUNED_NOTIFICATIONS, shrinkRatio=DEFAULT_TUNER_SHRINK_RATIO,
+                 minimum=DEFAULT_MIN_TUNED_NOTIFICATIONS):
+        """
+        Parameters
+        ----------
+        maxNotifications: int
+            The maxNotifications of the channel.
+        window: int, optional
+            How many of the latest polls to base a recommendation on.
+        fullRatio: float, optional
+            The fraction of full polls in the window above which a larger size is recommended.
+        maximum: int, optional
+            The largest size to recommend.
+        shrinkRatio: float, optional
+            The fraction of maxNotifications that every poll in the window must stay within for a smaller size to be
+            recommended.
+        minimum: int, optional
+            The smallest size to recommend.
+        """
+        self.maxNotifications = maxNotifications
+        self.window = window
+        self.fullRatio = fullRatio
+        self.maximum = maximum
+        self.shrinkRatio = shrinkRatio
+        self.minimum = minimum
+        self.polls = 0
+        self.notifications = 0
+        self._recent = collections.deque(maxlen=window)
+
+    def record(self, count):
+        """
+        Records that a poll returned "count" notifications.
+        """
+        self.polls += 1
+        self.notifications += count
+        self._recent.append(count)
+
+    def reset(self):
+        """
+        Forgets the polls in the window, so that the next recommendation is based on a full window of new polls.
+        """
+        self._recent.clear()
+
+    def polls_per_notification(self):
+        """
+        Returns the number of polls made per notification received, or None if no notifications were received.
+        """
+        return self.polls / self.notifications if self.notifications else None
+
+    def full_poll_ratio(self):
+        """
+        Returns the fraction of the polls in the window that returned maxNotifications notifications.
+        """
+        if not self._recent:
+            return 0.0
+        return sum(1 for count in self._recent if count >= self.maxNotifications) / len(self._recent)
+
+    def recommend(self):
+        """
+        Returns the recommended maxNotifications once the window is full: double the current one if too many of its
+        polls were full, half of it if none of them returned more than "shrinkRatio" of it, otherwise the current
+        one. Recommendations stay between minimum and maximum, unless the current size is already outside them.
+        """
+        if len(self._recent) < self.window:
+            return self.maxNotifications
+        if self.full_poll_ratio() > self.fullRatio:
+            return max(self.maxNotifications, min(self.maximum, self.maxNotifications * 2))
+        if max(self._recent) <= self.maxNotifications * self.shrinkRatio:
+            return min(self.maxNotifications, max(self.minimum, self.maxNotifications // 2))
+        return self.maxNotifications
+
+
+class NotificationConsumer:
+    """
+    Long-polls a notification channel from several threads, and hands every notification received to a callback or
+    a bounded queue.
+
+    Each poller issues its next long-poll as soon as the previous one returns, so with two or more pollers there is
+    always a long-poll waiting on the server and notifications are delivered without idle gaps between polls.
+
+    With a callback, the callback is called from the poller threads, possibly from several at once. Otherwise the
+    notifications are put on "queue"; when the queue is full the pollers wait for room before polling again, so a
+    slow reader slows polling down instead of letting notifications pile up in memory.
+
+        with NotificationConsumer(accountId, appApiKey, channelURL) as consumer:
+            while True:
+                notification = consumer.queue.get()
+    """
+
+    def __init__(self, accountId, apiKey, channelURL, callback=None, notificationQueue=None,
+                 maxQueueSize=DEFAULT_QUEUE_SIZE, pollers=DEFAULT_POLLERS, longPollSeconds=DEFAULT_LONG_POLL_SECONDS,
+                 connectTimeout=DEFAULT_CONNECT_TIMEOUT_SECONDS, errorBackoff=DEFAULT_ERROR_BACKOFF_SECONDS,
+                 maxErrorBackoff=DEFAULT_MAX_ERROR_BACKOFF_SECONDS, maxNotifications=None, onResize=None,
+                 notificationFilter=None, deduplicator=None, spool=None, deliveryTracker=None, verbose=False):
+        """
+        Parameters
+        ----------
+        accountId: str
+            The account ID that owns the notification channel.
+        apiKey: str
+            An API key of that account.
+        channelURL: str
+            The URL of the notification channel to poll. See aerframesdk.get_channel.
+        callback: function, optional
+            Called with each Notification. Exceptions it raises are logged and otherwise ignored.
+        notificationQueue: queue.Queue, optional
+            The queue to put notifications on when there is no callback. Defaults to a new queue of maxQueueSize.
+        maxQueueSize: int, optional
+            The size of the default queue.
+        pollers: int, optional
+            The number of concurrent long-polls.
+        longPollSeconds: float, optional
+            How long the server holds a long-poll open when there are no notifications. Polls time out when no
+            response arrives within this plus a safety margin.
+        connectTimeout: float, optional
+            Seconds to wait for a connection to the long-poll server.
+        errorBackoff: float, optional
+            Seconds to wait after a failed poll before polling again; doubles with each consecutive failure.
+        maxErrorBackoff: float, optional
+            The longest wait after a failed poll.
+        maxNotifications: int, optional
+            The maxNotifications of the channel. Enables a PollSizeTuner, whose metrics are included in stats().
+        onResize: function, optional
+            Adaptive mode: called from a poller thread with a recommended maxNotifications when polls keep coming back
+            full, or far from full; see PollSizeTuner. It should return the URL of a channel of that size to poll
+            instead, e.g., one made with recreate_channel, or None to keep the current channel. After switching, the
+            old channel is polled until it is empty. Requires maxNotifications.
+        notificationFilter: function, optional
+            Only notifications for which this returns True are delivered, e.g., an aerisfilters.NotificationFilter.
+        deduplicator: function, optional
+            Called with each notification that passes the filter; returns False for a notification that was delivered
+            before, which is then skipped and counted in stats(). See aerisdedup.NotificationDeduplicator.
+        spool: aerisspool.NotificationSpool, optional
+            Every poll response with notifications is appended to the spool, and on disk, before its notifications
+            are delivered, and acked once they have all been handed to the callback or put on the queue. start
+            first delivers the responses that are in the spool but were not committed, e.g., from before a crash or
+            dropped by a stop, and commits them; responses acked but not yet committed may be delivered again.
+        deliveryTracker: aeriscorrelation.DeliveryTracker, optional
+            Every delivery receipt that passes the filter and deduplicator is matched to the tracker's MT-SMs in
+            flight before it is delivered, and the tracker's overdue MT-SMs are expired after every poll.
+        verbose: bool, optional
+            True to verbosely log every poll.
+        """
+        if pollers < 1:
+            raise ValueError('pollers must be at least 1')
+        if onResize is not None and maxNotifications is None:
+            raise ValueError('onResize requires maxNotifications')
+        self.accountId = accountId
+        self.apiKey = apiKey
+        self.channelURL = channelURL
+        self.callback = callback
+        self.queue = None
+        if callback is None:
+            self.queue = notificationQueue if notificationQueue is not None else queue.Queue(maxsize=maxQueueSize)
+        self.pollers = pollers
+        self.timeout = (connectTimeout, longPollSeconds + DEFAULT_READ_TIMEOUT_MARGIN_SECONDS)
+        self.errorBackoff = errorBackoff
+        self.maxErrorBackoff = maxErrorBackoff
+        self.maxNotifications = maxNotifications
+        self.onResize = onResize
+        self.tuner = PollSizeTuner(maxNotifications) if maxNotifications is not None else None
+        self.notificationFilter = notificationFilter
+        self.deduplicator = deduplicator
+        self.spool = spool
+        self.deliveryTracker = deliveryTracker
+        self.verbose = verbose
+
+        self._resizing = False
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = {'polls': 0, 'notifications': 0, 'timeouts': 0, 'errors': 0, 'dropped': 0, 'duplicates': 0,
+                       'resizes': 0, 'replayed': 0}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        """
+        Starts the poller threads. With a spool, the first one delivers what is left in the spool before it polls.
+        """
+        if self.running:
+            raise RuntimeError('NotificationConsumer is already running')
+        self._stopping.clear()
+        self._threads = [threading.Thread(target=self._run, args=(i == 0 and self.spool is not None,),
+                                          name=f'aeris-notification-poller-{i}', daemon=True)
+                         for i in range(self.pollers)]
+        for thread in self._threads:
+            thread.start()
+        logger.info('Started %s pollers for %s', self.pollers, self.channelURL)
+
+    def stop(self, timeout=None):
+        """
+        Stops polling. Long-polls in flight are allowed to finish, and the notifications they return are still
+        delivered, unless the queue stays full; those notifications are dropped and counted in stats().
+
+        Parameters
+        ----------
+        timeout: float, optional
+            The longest time to wait for the pollers to finish. By default waits until they do, which may take up to
+            the read timeout of a poll.
+
+        Returns
+        -------
+        bool
+            True if every poller has finished.
+        """
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        stopped = not self.running
+        if stopped:
+            logger.info('Stopped polling %s', self.channelURL)
+        return stopped
+
+    def stats(self):
+        """
+        Returns counters of polls made, notifications delivered, polls that timed out, failed polls, notifications
+        dropped at shutdown, duplicate notifications skipped, channel resizes and spooled responses replayed, as a
+        dict. With maxNotifications, also has "pollsPerNotification" and "fullPollRatio" of the current channel, see
+        PollSizeTuner.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            if self.tuner is not None:
+                stats['maxNotifications'] = self.maxNotifications
+                stats['pollsPerNotification'] = self.tuner.polls_per_notification()
+                stats['fullPollRatio'] = self.tuner.full_poll_ratio()
+            return stats
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, increment in increments.items():
+                self._stats[name] += increment
+
+    def _run(self, replay=False):
+        if replay:
+            self._replay_spool()
+        backoff = self.errorBackoff
+        while not self._stopping.is_set():
+            channelURL = self.channelURL
+            try:
+                response = aerframesdk.poll_notification_channel(self.accountId, self.apiKey, channelURL,
+                                                                 self.verbose, timeout=self.timeout)
+            except requests.exceptions.ReadTimeout:
+                # the server held the poll for longer than expected; nothing was lost, so just poll again
+                self._count(timeouts=1)
+                continue
+            except (ApiException, requests.exceptions.RequestException, ValueError) as e:
+                self._count(errors=1)
+                logger.warning('Polling %s failed (%s); retrying in %s seconds', self.channelURL, e, backoff)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, self.maxErrorBackoff)
+                continue
+            try:
+                self._deliver_all(response, channelURL)
+                if self.deliveryTracker is not None:
+                    self.deliveryTracker.expire()
+                if self.onResize is not None:
+                    self._maybe_resize()
+            except Exception:
+                # e.g., the spool could not be written, or the response was not the expected shape
+                self._count(errors=1)
+                logger.exception('Delivering notifications from %s failed; polling again in %s seconds',
+                                 channelURL, backoff)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, self.maxErrorBackoff)
+                continue
+            backoff = self.errorBackoff
+
+    def _deliver_all(self, response, channelURL):
+        offset = None
+        if self.spool is not None and any(True for _ in iter_notifications(response)):
+            offset = self.spool.append(response)
+        received, delivered, dropped, duplicates = self._deliver_response(response)
+        with self._lock:
+            self._stats['polls'] += 1
+            self._stats['notifications'] += delivered
+            self._stats['duplicates'] += duplicates
+            if self.tuner is not None and channelURL == self.channelURL:
+                self.tuner.record(received)
+        if offset is not None and not dropped:
+            # a response with dropped notifications stays in the spool, and is replayed by the next start
+            self.spool.ack(offset)
+        return received
+
+    def _deliver_response(self, response):
+        received = delivered = dropped = duplicates = 0
+        for notification in iter_notifications(response):
+            received += 1
+            if self.notificationFilter is not None and not self.notificationFilter(notification):
+                continue
+            if self.deduplicator is not None and not self.deduplicator(notification):
+                duplicates += 1
+                continue
+            if self.deliveryTracker is not None:
+                self.deliveryTracker(notification)
+            if self._deliver(notification):
+                delivered += 1
+            else:
+                dropped += 1
+        return received, delivered, dropped, duplicates
+
+    def _replay_spool(self):
+        # the responses that were not delivered before a restart or a stop; until they are committed, the spool
+        # cannot commit past them, nor delete their segments
+        replayed = 0
+        try:
+            for entry in self.spool.replay():
+                if self._stopping.is_set():
+                    break
+                received, delivered, dropped, duplicates = self._deliver_response(entry.data)
+                self._count(notifications=delivered, duplicates=duplicates, replayed=1)
+                if dropped:
+                    break
+                self.spool.commit(entry.nextOffset)
+                replayed += 1
+        except Exception:
+            logger.exception('Replaying the spool in %s failed; the rest is replayed by the next start',
+                             self.spool.directory)
+        if replayed:
+            logger.info('Replayed %s spooled responses', replayed)
+
+    def _maybe_resize(self):
+        with self._lock:
+            recommended = self.tuner.recommend()
+            if self._resizing or recommended == self.maxNotifications:
+                return
+            self._resizing = True
+        try:
+            newChannelURL = self.onResize(recommended)
+        except Exception:
+            logger.exception('Resizing channel %s failed', self.channelURL)
+            newChannelURL = None
+        with self._lock:
+            oldChannelURL = self.channelURL
+            if newChannelURL:
+                self.channelURL = newChannelURL
+                self.maxNotifications = recommended
+                self.tuner = PollSizeTuner(recommended, self.tuner.window, self.tuner.fullRatio, self.tuner.maximum,
+                                           self.tuner.shrinkRatio, self.tuner.minimum)
+                self._stats['resizes'] += 1
+            else:
+                self.tuner.reset()
+            self._resizing = False
+        if newChannelURL:
+            logger.info('Polling %s with maxNotifications %s instead of %s', newChannelURL, recommended,
+                        oldChannelURL)
+            self._drain(oldChannelURL)
+
+    def _drain(self, channelURL):
+        # notifications already queued on the old channel are only reachable by polling it
+        while not self._stopping.is_set():
+            try:
+                response = aerframesdk.poll_notification_channel(self.accountId, self.apiKey, channelURL,
+                                                                 self.verbose, timeout=self.timeout)
+            except (ApiException, requests.exceptions.RequestException, ValueError) as e:
+                logger.warning('Stopped draining %s (%s)', channelURL, e)
+                return
+            if not self._deliver_all(response, channelURL):
+                return
+
+    def _deliver(self, notification):
+        if self.callback is not None:
+            try:
+                self.callback(notification)
+            except Exception:
+                logger.exception('Notification callback failed')
+            return True
+        while True:
+            try:
+                self.queue.put(notification, timeout=_QUEUE_PUT_INTERVAL_SECONDS)
+                return True
+            except queue.Full:
+                if self._stopping.is_set():
+                    logger.warning('Dropping a notification from %s: the queue is full', self.channelURL)
+                    self._count(dropped=1)
+                    return False
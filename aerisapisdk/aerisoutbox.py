@@ -0,0 +1,339 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A durable outbox of MT-SMs that survives restarts of the sender.
+"""
+
+import collections
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+import aerisapisdk.aeriscorrelation as aeriscorrelation
+import aerisapisdk.aerisjson as aerisjson
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+IN_FLIGHT = 'in-flight'
+SENT = 'sent'
+FAILED = 'failed'
+
+DEFAULT_COMMIT_INTERVAL_SECONDS = 0.05
+DEFAULT_COMMIT_BATCH_SIZE = 500
+DEFAULT_FEED_PAGE_SIZE = 500
+_SUBMIT_INTERVAL_SECONDS = 0.5
+
+OutboxMessage = collections.namedtuple('OutboxMessage', ['id', 'appShortName', 'imsiDestination', 'smsText', 'lane',
+                                                         'clientCorrelator', 'state', 'attempts', 'response',
+                                                         'error'])
+OutboxMessage.__doc__ = """An MT-SM in an SmsOutbox.
+
+state is PENDING, IN_FLIGHT, SENT or FAILED; attempts is how many times it was handed to the scheduler; response is
+the response of aerframesdk.send_mt_sms once SENT, and error the reason it FAILED.
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    appShortName TEXT NOT NULL,
+    imsiDestination TEXT NOT NULL,
+    smsText TEXT NOT NULL,
+    lane TEXT,
+    clientCorrelator TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    response TEXT,
+    error TEXT,
+    createdAt REAL NOT NULL,
+    updatedAt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_state ON messages (state, id);
+"""
+
+
+class SmsOutbox:
+    """
+    Stores MT-SMs in a SQLite database before they are sent, and sends them through an aerisscheduler.SmsScheduler.
+
+    add and add_many return once the MT-SMs are committed to the database. A feeder thread hands the stored MT-SMs to
+    the scheduler in order, as fast as the scheduler's lanes take them, and every MT-SM moves from PENDING to
+    IN_FLIGHT when it is handed over, then to SENT or FAILED. State changes are written in batches, by a thread that
+    commits every "commitInterval" seconds or "commitBatchSize" changes.
+
+    Every MT-SM gets its clientCorrelator when it is added, and keeps it. After a restart, the MT-SMs that were
+    PENDING or IN_FLIGHT (including any whose SENT state was not yet committed) are sent again with the same
+    clientCorrelator, which identifies a repeated request to AerFrame (as specified by OneAPI), so a deploy neither
+    drops nor duplicates MT-SMs. stop closes the database; create a new SmsOutbox to start again.
+
+        scheduler = SmsScheduler(accountId, appApiKey)
+        with SmsOutbox('outbox.db', scheduler) as outbox:
+            outbox.add_many((appShortName, imsi, 'wake') for imsi in imsis)
+
+    The database is used in WAL mode, so reads do not block the writers. Only one SmsOutbox should use a database at
+    a time.
+    """
+
+    def __init__(self, path, scheduler, commitInterval=DEFAULT_COMMIT_INTERVAL_SECONDS,
+                 commitBatchSize=DEFAULT_COMMIT_BATCH_SIZE, pageSize=DEFAULT_FEED_PAGE_SIZE, synchronous='NORMAL'):
+        """
+        Parameters
+        ----------
+        path: str
+            The path of the SQLite database; created if it does not exist.
+        scheduler: aerisscheduler.SmsScheduler
+            Sends the MT-SMs. The outbox starts and stops it.
+        commitInterval: float, optional
+            The longest time, in seconds, that a state change waits to be committed.
+        commitBatchSize: int, optional
+            The number of state changes that are committed at once without waiting for commitInterval.
+        pageSize: int, optional
+            How many stored MT-SMs the feeder reads at a time.
+        synchronous: str, optional
+            SQLite's "synchronous" setting. NORMAL survives crashes of the process; FULL also survives power loss,
+            at the cost of an fsync per commit.
+        """
+        self.path = path
+        self.scheduler = scheduler
+        self.commitInterval = commitInterval
+        self.commitBatchSize = commitBatchSize
+        self.pageSize = pageSize
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f'PRAGMA synchronous={synchronous}')
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._updates = []
+        self._updated = threading.Condition(threading.Lock())
+        self._added = threading.Event()
+        self._rescan = False
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        """
+        Starts the scheduler and the feeder and writer threads, and resumes sending what was left PENDING or
+        IN_FLIGHT.
+        """
+        self._stopping.clear()
+        # MT-SMs left IN_FLIGHT were handed to a scheduler that is gone, so they are sent again like PENDING ones;
+        # from here on, IN_FLIGHT always means handed to this outbox's scheduler, and is never resubmitted
+        with self._lock:
+            with self._db:
+                self._db.execute('UPDATE messages SET state = ? WHERE state = ?', (PENDING, IN_FLIGHT))
+        if not self.scheduler.running:
+            self.scheduler.start()
+        self._threads = [threading.Thread(target=self._feed, name='aeris-outbox-feeder', daemon=True),
+                         threading.Thread(target=self._write, name='aeris-outbox-writer', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops handing MT-SMs to the scheduler, waits for the scheduler to send the ones it has, commits every state
+        change and closes the database. MT-SMs not sent yet stay in the outbox for the next start. May be called
+        without start, e.g., to clean up after start failed.
+        """
+        self._stopping.set()
+        self._added.set()
+        # there are no threads if start was never called or failed before starting them
+        feeder, writer = self._threads or (None, None)
+        if feeder is not None:
+            feeder.join(timeout)
+        self.scheduler.stop(timeout=timeout)
+        with self._updated:
+            self._updated.notify()
+        if writer is not None:
+            writer.join(timeout)
+        self._commit_updates()
+        with self._lock:
+            self._db.close()
+
+    def add(self, appShortName, imsiDestination, smsText, lane=None):
+        """
+        Stores an MT-SM to send, and returns its ID.
+        """
+        return self.add_many([(appShortName, imsiDestination, smsText, lane)])[0]
+
+    def add_many(self, messages):
+        """
+        Stores many MT-SMs in one transaction, and returns their IDs.
+
+        Parameters
+        ----------
+        messages: iterable
+            Of (appShortName, imsiDestination, smsText) or (appShortName, imsiDestination, smsText, lane) tuples.
+
+        Returns
+        -------
+        list
+        """
+        now = time.time()
+        rows = []
+        for message in messages:
+            appShortName, imsiDestination, smsText = message[:3]
+            lane = message[3] if len(message) > 3 else None
+            rows.append((appShortName, imsiDestination, smsText, lane, aeriscorrelation.new_client_correlator(),
+                         PENDING, now, now))
+        ids = []
+        with self._lock:
+            with self._db:
+                self._db.execute('BEGIN')
+                for row in rows:
+                    cursor = self._db.execute(
+                        'INSERT INTO messages (appShortName, imsiDestination, smsText, lane, clientCorrelator, state,'
+                        ' createdAt, updatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', row)
+                    ids.append(cursor.lastrowid)
+        self._added.set()
+        return ids
+
+    def get(self, messageId):
+        """
+        Returns the OutboxMessage with an ID, or None. State changes not yet committed are not included.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT id, appShortName, imsiDestination, smsText, lane, clientCorrelator, state,'
+                                   ' attempts, response, error FROM messages WHERE id = ?', (messageId,)).fetchone()
+        if row is None:
+            return None
+        response = aerisjson.loads(row[8]) if row[8] is not None else None
+        return OutboxMessage(*row[:8], response, row[9])
+
+    def counts(self):
+        """
+        Returns the number of MT-SMs in each state, as a dict.
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT state, COUNT(*) FROM messages GROUP BY state').fetchall()
+        counts = dict.fromkeys((PENDING, IN_FLIGHT, SENT, FAILED), 0)
+        counts.update(rows)
+        return counts
+
+    def retry_failed(self):
+        """
+        Moves every FAILED MT-SM back to PENDING, to be sent again with its clientCorrelator, and returns how many
+        there were.
+        """
+        with self._lock:
+            with self._db:
+                cursor = self._db.execute('UPDATE messages SET state = ?, error = NULL, updatedAt = ? WHERE state = ?',
+                                          (PENDING, time.time(), FAILED))
+        self._rescan = True
+        self._added.set()
+        return cursor.rowcount
+
+    def purge(self, state=SENT, olderThan=None):
+        """
+        Deletes the MT-SMs in a state (SENT by default), optionally only those last updated more than "olderThan"
+        seconds ago, and returns how many there were.
+        """
+        cutoff = time.time() - olderThan if olderThan is not None else float('inf')
+        with self._lock:
+            with self._db:
+                cursor = self._db.execute('DELETE FROM messages WHERE state = ? AND updatedAt < ?', (state, cutoff))
+        return cursor.rowcount
+
+    def _update(self, messageId, state, response=None, error=None, attempts=0):
+        with self._updated:
+            self._updates.append((state, response, error, attempts, time.time(), messageId))
+            if len(self._updates) >= self.commitBatchSize:
+                self._updated.notify()
+
+    def _commit_updates(self):
+        with self._updated:
+            updates, self._updates = self._updates, []
+        if not updates:
+            return
+        with self._lock:
+            with self._db:
+                self._db.execute('BEGIN')
+                self._db.executemany('UPDATE messages SET state = ?, response = ?, error = ?,'
+                                     ' attempts = attempts + ?, updatedAt = ? WHERE id = ?', updates)
+
+    def _write(self):
+        while not self._stopping.is_set():
+            with self._updated:
+                if len(self._updates) < self.commitBatchSize:
+                    self._updated.wait(self.commitInterval)
+            try:
+                self._commit_updates()
+            except sqlite3.Error:
+                logger.exception('Committing outbox state changes to %s failed', self.path)
+
+    def _feed(self):
+        # everything PENDING at startup is sent; afterwards only what was added since
+        lastId = 0
+        while not self._stopping.is_set():
+            self._added.clear()
+            if self._rescan:
+                # retry_failed moved messages the feeder has passed back to PENDING
+                self._rescan = False
+                lastId = self._first_pending_id() - 1
+            with self._lock:
+                rows = self._db.execute(
+                    'SELECT id, appShortName, imsiDestination, smsText, lane, clientCorrelator FROM messages'
+                    ' WHERE state = ? AND id > ? ORDER BY id LIMIT ?',
+                    (PENDING, lastId, self.pageSize)).fetchall()
+            if not rows:
+                self._added.wait()
+                continue
+            for row in rows:
+                if not self._submit(row):
+                    return
+                lastId = row[0]
+
+    def _first_pending_id(self):
+        # only FAILED messages were moved back, and their state changes are committed, so PENDING here is reliable
+        self._commit_updates()
+        with self._lock:
+            row = self._db.execute('SELECT MIN(id) FROM messages WHERE state = ?', (PENDING,)).fetchone()
+        return row[0] if row[0] is not None else 0
+
+    def _submit(self, row):
+        messageId, appShortName, imsiDestination, smsText, lane, clientCorrelator = row
+        while True:
+            if self._stopping.is_set():
+                return False
+            try:
+                future = self.scheduler.submit(appShortName, imsiDestination, smsText, lane=lane,
+                                               clientCorrelator=clientCorrelator, timeout=_SUBMIT_INTERVAL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        self._update(messageId, IN_FLIGHT, attempts=1)
+        future.add_done_callback(lambda f: self._done(messageId, f))
+        return True
+
+    def _done(self, messageId, future):
+        if future.cancelled():
+            self._update(messageId, PENDING)
+            return
+        error = future.exception()
+        if error is not None:
+            self._update(messageId, FAILED, error=str(error) or type(error).__name__)
+        elif future.result() is None:
+            self._update(messageId, FAILED, error='The device was not found or does not support SMS')
+        else:
+            self._update(messageId, SENT, response=aerisjson.dumps(future.result()))
@@ -0,0 +1,430 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Rate-limited, prioritised sending of MT-SMs.
+"""
+
+import collections
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+
+import aerisapisdk.aeriscorrelation as aeriscorrelation
+import aerisapisdk.aerissegments as aerissegments
+import aerisapisdk.aerframesdk as aerframesdk
+from aerisapisdk.exceptions import ApiException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SMS_RATE = 10.0
+DEFAULT_LANES = ('alert', 'bulk')
+DEFAULT_SCHEDULER_QUEUE_SIZE = 1000
+# no more than the connections aerishttp keeps per host, so workers never wait for a connection
+DEFAULT_SCHEDULER_WORKERS = 8
+DEFAULT_MAX_THROTTLE_RETRIES = 5
+DEFAULT_THROTTLE_BACKOFF_SECONDS = 1.0
+
+HTTP_TOO_MANY_REQUESTS = 429
+
+
+class TokenBucket:
+    """
+    A token bucket: holds up to "burst" tokens, and gains "rate" tokens per second. Thread-safe.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        """
+        Parameters
+        ----------
+        rate: float
+            Tokens added per second.
+        burst: float, optional
+            The most tokens the bucket holds, i.e., how many can be taken at once after an idle period. Defaults to
+            one second's worth, and at least 1.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _refill_locked(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """
+        Takes tokens from the bucket, going into debt if there are not enough, and returns the number of seconds to
+        wait before using them. Callers that wait that long never exceed the rate, however many share the bucket.
+        """
+        with self._lock:
+            self._refill_locked()
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def wait_time(self, tokens=1):
+        """
+        Returns the number of seconds until "tokens" tokens can be taken, without taking any. More tokens than "burst"
+        can be taken once the bucket is full.
+        """
+        with self._lock:
+            self._refill_locked()
+            return max(0.0, min(tokens, self.burst) - self._tokens) / self.rate
+
+    def take(self, tokens=1):
+        """
+        Takes tokens from the bucket, going into debt if there are not enough; see wait_time.
+        """
+        with self._lock:
+            self._refill_locked()
+            self._tokens -= tokens
+
+    def pause(self, seconds):
+        """
+        Empties the bucket, so that no tokens are available for the next "seconds" seconds.
+        """
+        with self._lock:
+            self._refill_locked()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class _Job:
+    __slots__ = ('appShortName', 'imsiDestination', 'smsText', 'clientCorrelator', 'future', 'lane', 'throttled')
+
+    def __init__(self, appShortName, imsiDestination, smsText, clientCorrelator, lane):
+        self.appShortName = appShortName
+        self.imsiDestination = imsiDestination
+        self.smsText = smsText
+        self.clientCorrelator = clientCorrelator
+        self.future = concurrent.futures.Future()
+        self.lane = lane
+        self.throttled = 0
+
+
+def _retry_after(response):
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class SmsScheduler:
+    """
+    Sends MT-SMs from a bounded, prioritised queue at no more than a fixed rate per account and per application.
+
+    The account and each of its application short names have a TokenBucket, and the worker threads take a token from
+    both before each send, so the account never sends faster than "accountRate" MT-SMs per second, nor any application
+    faster than "rate", however many threads submit. MT-SMs wait in lanes, e.g., "alert" and "bulk"; workers always
+    take from the first non-empty lane, in the order the lanes were given, and only once its next MT-SM may be sent,
+    so MT-SMs queued in a higher lane meanwhile still go first. Every lane holds at most "maxQueueSize" MT-SMs, and
+    submit blocks while the lane is full, so producers are slowed down to the rate instead of piling MT-SMs up in
+    memory.
+
+    Should AerFrame still reject a send with HTTP 429 (Too Many Requests), the application's bucket is paused for the
+    response's Retry-After (or "throttleBackoff") seconds and the MT-SM is sent again, ahead of its lane.
+
+        with SmsScheduler(accountId, appApiKey) as scheduler:
+            futures = [scheduler.submit(appShortName, imsi, 'wake', lane='bulk') for imsi in imsis]
+            alarm = scheduler.submit(appShortName, imsi, 'alarm', lane='alert')
+            response = alarm.result()
+
+    Workers send through the shared pooled transport of aerishttp, so there should be no more workers than its
+    "pool_maxsize".
+    """
+
+    def __init__(self, accountId, apiKey, rate=DEFAULT_SMS_RATE, burst=None, rates=None, accountRate=None,
+                 lanes=DEFAULT_LANES, maxQueueSize=DEFAULT_SCHEDULER_QUEUE_SIZE, workers=DEFAULT_SCHEDULER_WORKERS,
+                 maxThrottleRetries=DEFAULT_MAX_THROTTLE_RETRIES, throttleBackoff=DEFAULT_THROTTLE_BACKOFF_SECONDS,
+                 perSegment=False, sender=None, clock=time.monotonic, verbose=False):
+        """
+        Parameters
+        ----------
+        accountId: str
+            The account ID that owns the destination devices.
+        apiKey: str
+            An API key for the account.
+        rate: float, optional
+            The most MT-SMs sent per second for each application short name.
+        burst: float, optional
+            How many MT-SMs per application, and for the account, may be sent at once after an idle period; see
+            TokenBucket.
+        rates: dict, optional
+            The rates (per second) of particular application short names, if different from "rate".
+        accountRate: float, optional
+            The most MT-SMs sent per second for the whole account, whatever their application. Defaults to "rate".
+        lanes: sequence, optional
+            The names of the lanes, highest priority first. The last lane is the default.
+        maxQueueSize: int, optional
+            The most MT-SMs waiting in each lane.
+        workers: int, optional
+            The number of threads sending MT-SMs.
+        maxThrottleRetries: int, optional
+            How many times an MT-SM rejected with HTTP 429 is sent again before its future fails.
+        throttleBackoff: float, optional
+            Seconds to pause an application after HTTP 429 without a Retry-After header.
+        perSegment: bool, optional
+            True to count every message a long text is split into against the rate (see aerissegments.segment),
+            rather than every MT-SM request.
+        sender: function, optional
+            Called as sender(appShortName, imsiDestination, smsText, clientCorrelator) to send one MT-SM, e.g.,
+            AerisClient.send_mt_sms. Defaults to aerframesdk.send_mt_sms with accountId and apiKey.
+        clock: function, optional
+            Returns the current time in seconds; for testing.
+        verbose: bool, optional
+            True to enable verbose logging of every send.
+        """
+        if not lanes:
+            raise ValueError('at least one lane is required')
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.accountId = accountId
+        self.apiKey = apiKey
+        self.rate = rate
+        self.burst = burst
+        self.rates = dict(rates or {})
+        self.accountRate = accountRate if accountRate is not None else rate
+        self.lanes = tuple(lanes)
+        self.maxQueueSize = maxQueueSize
+        self.workers = workers
+        self.maxThrottleRetries = maxThrottleRetries
+        self.throttleBackoff = throttleBackoff
+        self.perSegment = perSegment
+        self.sender = sender if sender is not None else self._send_mt_sms
+        self.verbose = verbose
+
+        self._clock = clock
+        self._buckets = {}
+        self.accountBucket = TokenBucket(self.accountRate, burst, clock)
+        self._queues = {lane: collections.deque() for lane in self.lanes}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = []
+        self._stats = {'submitted': 0, 'sent': 0, 'failed': 0, 'throttled': 0}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        """
+        Starts the worker threads. MT-SMs may be submitted before, and wait until then.
+        """
+        if self.running:
+            raise RuntimeError('SmsScheduler is already running')
+        with self._condition:
+            self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f'aeris-sms-sender-{i}', daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, cancel=False, timeout=None):
+        """
+        Stops accepting MT-SMs and stops the workers once the queued MT-SMs are sent.
+
+        Parameters
+        ----------
+        cancel: bool, optional
+            True to cancel the futures of the MT-SMs still queued instead of sending them.
+        timeout: float, optional
+            The longest time to wait for the workers to finish.
+
+        Returns
+        -------
+        bool
+            True if every worker has finished.
+        """
+        with self._condition:
+            self._closed = True
+            cancelled = []
+            if cancel:
+                for lane in self._queues.values():
+                    cancelled.extend(lane)
+                    lane.clear()
+            self._condition.notify_all()
+        for job in cancelled:
+            if not job.future.cancel():
+                job.future.set_exception(RuntimeError('SmsScheduler was stopped'))
+        for thread in self._threads:
+            thread.join(timeout)
+        return not self.running
+
+    def submit(self, appShortName, imsiDestination, smsText, lane=None, clientCorrelator=None, timeout=None):
+        """
+        Queues an MT-SM, waiting for room in its lane if the lane is full.
+
+        Parameters
+        ----------
+        appShortName: str
+        imsiDestination: str
+        smsText: str
+            As for aerframesdk.send_mt_sms.
+        lane: str, optional
+            The lane to queue the MT-SM in. Defaults to the last (lowest priority) lane.
+        clientCorrelator: str, optional
+            The clientCorrelator to send the MT-SM with. Defaults to a new one, which the MT-SM keeps if it is retried.
+        timeout: float, optional
+            The longest time to wait for room in the lane; waits as long as it takes by default.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to what aerframesdk.send_mt_sms returns, or fails with the exception it raised.
+
+        Raises
+        ------
+        queue.Full
+            if there was no room in the lane within "timeout" seconds.
+        RuntimeError
+            if the scheduler was stopped.
+        """
+        lane = self.lanes[-1] if lane is None else lane
+        if lane not in self._queues:
+            raise ValueError(f'unknown lane {lane}')
+        job = _Job(appShortName, imsiDestination, smsText, clientCorrelator or aeriscorrelation.new_client_correlator(),
+                   lane)
+        pending = self._queues[lane]
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._closed or len(pending) < self.maxQueueSize, timeout):
+                raise queue.Full
+            if self._closed:
+                raise RuntimeError('SmsScheduler is stopped')
+            pending.append(job)
+            self._stats['submitted'] += 1
+            self._condition.notify_all()
+        return job.future
+
+    def qsize(self, lane=None):
+        """
+        Returns the number of MT-SMs waiting in a lane, or in every lane.
+        """
+        with self._condition:
+            if lane is not None:
+                return len(self._queues[lane])
+            return sum(len(pending) for pending in self._queues.values())
+
+    def stats(self):
+        """
+        Returns counters of MT-SMs submitted, sent, failed and rejected with HTTP 429 (and retried), and the number
+        still queued, as a dict.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats['queued'] = sum(len(pending) for pending in self._queues.values())
+            return stats
+
+    def bucket(self, appShortName):
+        """
+        Returns the TokenBucket of an application short name.
+        """
+        with self._condition:
+            bucket = self._buckets.get(appShortName)
+            if bucket is None:
+                rate = self.rates.get(appShortName, self.rate)
+                bucket = self._buckets[appShortName] = TokenBucket(rate, self.burst, self._clock)
+            return bucket
+
+    def _send_mt_sms(self, appShortName, imsiDestination, smsText, clientCorrelator):
+        return aerframesdk.send_mt_sms(self.accountId, self.apiKey, appShortName, imsiDestination, smsText,
+                                       self.verbose, clientCorrelator=clientCorrelator)
+
+    def _next_job(self):
+        # a job stays in its lane until the tokens to send it are taken, so a worker waiting for the rate never holds
+        # a job that MT-SMs queued in a higher lane meanwhile should go before
+        with self._condition:
+            while True:
+                job = self._head_job_locked()
+                if job is None:
+                    if self._closed:
+                        return None
+                    self._condition.wait()
+                    continue
+                tokens = aerissegments.count_segments(job.smsText) if self.perSegment else 1
+                buckets = (self.bucket(job.appShortName), self.accountBucket)
+                delay = max(bucket.wait_time(tokens) for bucket in buckets)
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                for bucket in buckets:
+                    bucket.take(tokens)
+                self._queues[job.lane].popleft()
+                self._condition.notify_all()
+                # a job retried after HTTP 429 is running already
+                if job.throttled or job.future.set_running_or_notify_cancel():
+                    return job
+
+    def _head_job_locked(self):
+        for lane in self.lanes:
+            pending = self._queues[lane]
+            while pending and not pending[0].throttled and pending[0].future.cancelled():
+                pending.popleft()
+                self._condition.notify_all()
+            if pending:
+                return pending[0]
+        return None
+
+    def _count(self, **increments):
+        with self._condition:
+            for name, increment in increments.items():
+                self._stats[name] += increment
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                response = self.sender(job.appShortName, job.imsiDestination, job.smsText, job.clientCorrelator)
+            except ApiException as e:
+                status = getattr(e.response, 'status_code', None)
+                if status == HTTP_TOO_MANY_REQUESTS and job.throttled < self.maxThrottleRetries:
+                    self._throttled(job, self.bucket(job.appShortName), e.response)
+                    continue
+                self._count(failed=1)
+                job.future.set_exception(e)
+            except Exception as e:
+                self._count(failed=1)
+                job.future.set_exception(e)
+            else:
+                self._count(sent=1)
+                job.future.set_result(response)
+
+    def _throttled(self, job, bucket, response):
+        backoff = _retry_after(response)
+        backoff = self.throttleBackoff if backoff is None else backoff
+        logger.warning('Sending to %s was throttled; pausing %s for %s seconds', job.imsiDestination,
+                       job.appShortName, backoff)
+        bucket.pause(backoff)
+        job.throttled += 1
+        # the future is already running; hand the job straight back to the front of its lane
+        with self._condition:
+            self._stats['throttled'] += 1
+            self._queues[job.lane].appendleft(job)
+            self._condition.notify_all()
@@ -0,0 +1,150 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Encoding and segmentation of SMS texts, to tell how many messages a text is sent as.
+"""
+
+import collections
+import functools
+import unicodedata
+
+GSM_7 = 'GSM-7'
+UCS_2 = 'UCS-2'
+
+# units (septets for GSM-7, UTF-16 code units for UCS-2) in a single message, and in each part of a concatenated one,
+# which loses room to its user data header
+SINGLE_CAPACITY = {GSM_7: 160, UCS_2: 70}
+CONCATENATED_CAPACITY = {GSM_7: 153, UCS_2: 67}
+
+# the GSM 03.38 default alphabet (without the escape to the extension table), and the extension table characters,
+# which take two septets each
+GSM_7_BASIC = frozenset('@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !"#¤%&\'()*+,-./0123456789:;<=>?'
+                        '¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà')
+GSM_7_EXTENSION = frozenset('\f^{}\\[~]|€')
+GSM_7_ALPHABET = GSM_7_BASIC | GSM_7_EXTENSION
+
+# replacements for common characters that are not in the GSM-7 alphabet; others are tried without their accents
+TRANSLITERATIONS = {
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'", '`': "'", '´': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"', '″': '"', '«': '"', '»': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '―': '-', '−': '-',
+    '…': '...', '•': '*', '·': '.', '\u00a0': ' ', '\u2009': ' ', '\u202f': ' ', '\u200b': '',
+    '\t': ' ', 'ç': 'Ç', '©': '(c)', '®': '(R)', '™': 'TM', '×': 'x',
+}
+
+SmsSegments = collections.namedtuple('SmsSegments', ['text', 'encoding', 'units', 'parts'])
+SmsSegments.__doc__ = """How a text is sent as SMS.
+
+text is the text as sent (transliterated, if asked for); encoding is GSM_7 or UCS_2; units is its length in septets
+(GSM-7) or UTF-16 code units (UCS-2); parts is a tuple of the texts of the messages it is split into.
+"""
+
+
+def is_gsm_7(text):
+    """
+    Returns True if every character of the text is in the GSM-7 alphabet, including its extension table.
+    """
+    return GSM_7_ALPHABET.issuperset(text)
+
+
+def encoding(text):
+    """
+    Returns the encoding a text is sent in: GSM_7 if it can be, otherwise UCS_2.
+    """
+    return GSM_7 if is_gsm_7(text) else UCS_2
+
+
+def _unit_length(char, textEncoding):
+    if textEncoding == GSM_7:
+        return 2 if char in GSM_7_EXTENSION else 1
+    return 2 if ord(char) > 0xFFFF else 1
+
+
+def units(text, textEncoding=None):
+    """
+    Returns the length of a text in septets if it is sent as GSM-7 (extension table characters count twice), or in
+    UTF-16 code units if it is sent as UCS-2.
+    """
+    textEncoding = textEncoding or encoding(text)
+    if textEncoding == GSM_7:
+        return len(text) + sum(text.count(char) for char in GSM_7_EXTENSION)
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _transliterate_char(char):
+    if char in GSM_7_ALPHABET:
+        return char
+    replacement = TRANSLITERATIONS.get(char)
+    if replacement is not None:
+        return replacement
+    stripped = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+    return stripped if stripped and is_gsm_7(stripped) else char
+
+
+def transliterate(text):
+    """
+    Replaces the characters of a text that are not in the GSM-7 alphabet with ones that are, where there is a
+    reasonable replacement (e.g., curly quotes, dashes and accented letters). Characters without one are kept, in
+    which case the text is still sent as UCS-2.
+    """
+    if is_gsm_7(text):
+        return text
+    return ''.join(_transliterate_char(char) for char in text)
+
+
+@functools.lru_cache(maxsize=4096)
+def segment(text, transliterated=False):
+    """
+    Splits a text into the fewest messages it can be sent as.
+
+    A text that fits in one message (160 septets or 70 UCS-2 code units) is sent as is; a longer one is split into
+    parts of at most 153 septets or 67 code units, never between an escape and its extension table character, or
+    within a surrogate pair. Results are cached, so sending the same text to many devices segments it once.
+
+    Parameters
+    ----------
+    text: str
+    transliterated: bool, optional
+        True to transliterate the text first, so that it is sent as GSM-7 where possible; see transliterate.
+
+    Returns
+    -------
+    SmsSegments
+    """
+    if transliterated:
+        text = transliterate(text)
+    textEncoding = encoding(text)
+    length = units(text, textEncoding)
+    if length <= SINGLE_CAPACITY[textEncoding]:
+        return SmsSegments(text, textEncoding, length, (text,))
+    capacity = CONCATENATED_CAPACITY[textEncoding]
+    # filling each part before starting the next gives the fewest parts, since no character is wider than a part
+    parts = []
+    start = used = 0
+    for i, char in enumerate(text):
+        width = _unit_length(char, textEncoding)
+        if used + width > capacity:
+            parts.append(text[start:i])
+            start, used = i, 0
+        used += width
+    parts.append(text[start:])
+    return SmsSegments(text, textEncoding, length, tuple(parts))
+
+
+def count_segments(text, transliterated=False):
+    """
+    Returns the number of messages a text is sent as.
+    """
+    return len(segment(text, transliterated).parts)
@@ -0,0 +1,319 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A durable, append-only on-disk spool for notification channel poll responses.
+
+The spool is a directory of segment files named after the offset of their first record, plus a "committed" file that
+holds the offset of the first record not yet consumed. A record is a 4-byte length and a 4-byte CRC-32 (both little
+endian) followed by the JSON entry. An offset is a position in the concatenation of all the segments.
+"""
+
+import collections
+import heapq
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+import aerisapisdk.aerisjson as aerisjson
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+_HEADER = struct.Struct('<II')
+_SEGMENT_SUFFIX = '.log'
+_COMMITTED_FILE = 'committed'
+
+SpoolEntry = collections.namedtuple('SpoolEntry', ['offset', 'nextOffset', 'data'])
+SpoolEntry.__doc__ = """One entry of a NotificationSpool.
+
+offset: the offset of the entry; pass it to NotificationSpool.ack
+nextOffset: the offset of the next entry; pass it to NotificationSpool.commit
+data: the entry, e.g., a poll response as returned by aerframesdk.poll_notification_channel
+"""
+
+
+def _segment_name(baseOffset):
+    return '%020d%s' % (baseOffset, _SEGMENT_SUFFIX)
+
+
+def _read_records(view, start, end):
+    """
+    Yields (position, nextPosition, payload) for every intact record of a segment between two positions, and stops
+    at the first truncated or corrupt one.
+    """
+    position = start
+    while position + _HEADER.size <= end:
+        length, crc = _HEADER.unpack_from(view, position)
+        payloadStart = position + _HEADER.size
+        payloadEnd = payloadStart + length
+        if payloadEnd > end:
+            return
+        payload = view[payloadStart:payloadEnd]
+        if zlib.crc32(payload) != crc:
+            return
+        yield position, payloadEnd, payload
+        position = payloadEnd
+
+
+class NotificationSpool:
+    """
+    A segmented, append-only log of entries, e.g. poll responses, on disk.
+
+    Writers append entries, which are on disk once append returns. Appends that happen at the same time share one
+    fsync. Readers either ack the entries they appended once they have handled them, or replay unconsumed entries
+    (for example after a restart) and commit the offset they have consumed up to. Entries before the committed offset
+    are never replayed again, and segments that hold only such entries are deleted.
+
+    An entry is only committed once every entry before it has been acked or committed, so entries handled out of
+    order by several threads are not skipped if the process stops.
+    """
+
+    def __init__(self, directory, segmentBytes=DEFAULT_SEGMENT_BYTES, fsync=True):
+        """
+        Parameters
+        ----------
+        directory: str or path
+            The spool directory; created if it does not exist.
+        segmentBytes: int, optional
+            The size at which a new segment file is started.
+        fsync: bool, optional
+            False to skip fsync calls; entries then survive a crash of the process, but not of the machine.
+        """
+        self.directory = str(directory)
+        self.segmentBytes = segmentBytes
+        self.fsync = fsync
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._pending = []  # heap of the offsets of entries that are not committed yet
+        self._next_offsets = {}  # offset of a pending entry -> offset after it
+        self._acked = set()
+
+        self._committed = self._read_committed()
+        bases = self._segment_bases()
+        if not bases:
+            bases = [self._committed]
+        self._base = bases[-1]
+        self._position = self._recover(self._base)
+        self._end = self._base + self._position
+        self._synced = self._end
+        self._file = open(self._segment_path(self._base), 'ab')
+        if self._committed < self._end:
+            # the backlog from before the restart must be replayed and committed before later acks can commit
+            self._track(self._committed, self._end)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def committed_offset(self):
+        return self._committed
+
+    @property
+    def end_offset(self):
+        return self._end
+
+    def append(self, data, sync=True):
+        """
+        Appends an entry.
+
+        Parameters
+        ----------
+        data
+            Any JSON-serializable object.
+        sync: bool, optional
+            False to return without waiting for the entry to reach the disk; see sync.
+
+        Returns
+        -------
+        int
+            The offset of the entry.
+        """
+        payload = aerisjson.dumps(data)
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._position > 0 and self._position + len(record) > self.segmentBytes:
+                self._roll()
+            offset = self._end
+            self._file.write(record)
+            self._file.flush()
+            self._position += len(record)
+            self._end += len(record)
+            end = self._end
+            self._track(offset, end)
+        if sync:
+            self.sync(end)
+        return offset
+
+    def sync(self, upTo=None):
+        """
+        Makes sure that the entries before offset "upTo", or all entries, are on disk.
+        """
+        with self._sync_lock:
+            # one fsync covers everything written before it, so appenders waiting here share fsyncs
+            if upTo is not None and self._synced >= upTo:
+                return
+            with self._lock:
+                end = self._end
+                # a duplicate descriptor stays valid if the segment is rolled and closed meanwhile
+                fd = os.dup(self._file.fileno())
+            try:
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._synced = max(self._synced, end)
+
+    def ack(self, offset):
+        """
+        Marks the entry at an offset, returned by append, as handled. The committed offset moves past it once every
+        earlier entry is handled too.
+        """
+        with self._lock:
+            if offset not in self._next_offsets:
+                return
+            self._acked.add(offset)
+            committed = self._pop_acked_locked(None)
+        if committed is not None:
+            self._write_committed(committed)
+
+    def commit(self, offset):
+        """
+        Marks every entry before an offset, e.g., the nextOffset of a replayed entry, as consumed.
+        """
+        with self._lock:
+            while self._pending and self._next_offsets[self._pending[0]] <= offset:
+                first = heapq.heappop(self._pending)
+                self._acked.discard(first)
+                del self._next_offsets[first]
+            committed = self._pop_acked_locked(offset)
+        self._write_committed(committed)
+
+    def replay(self, fromOffset=None):
+        """
+        Reads the entries from the committed offset (or "fromOffset") up to the end of the spool at the time of the
+        call, through memory maps of the segment files.
+
+        Returns
+        -------
+        generator
+            Of SpoolEntry tuples.
+        """
+        start = self._committed if fromOffset is None else fromOffset
+        with self._lock:
+            end = self._end
+            bases = self._segment_bases()
+        for i, base in enumerate(bases):
+            segmentEnd = bases[i + 1] if i + 1 < len(bases) else end
+            if segmentEnd <= start or base >= end:
+                continue
+            with open(self._segment_path(base), 'rb') as segment:
+                size = min(os.fstat(segment.fileno()).st_size, end - base)
+                if size <= 0:
+                    continue
+                with mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    for position, nextPosition, payload in _read_records(view, 0, size):
+                        if base + position >= start:
+                            yield SpoolEntry(base + position, base + nextPosition, aerisjson.loads(payload))
+
+    def close(self):
+        """
+        Syncs and closes the current segment.
+        """
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+    def _pop_acked_locked(self, committed):
+        # moves the committed offset past acked entries, as long as no earlier entry is pending
+        while self._pending and self._pending[0] in self._acked:
+            first = heapq.heappop(self._pending)
+            self._acked.discard(first)
+            committed = self._next_offsets.pop(first)
+        return committed
+
+    def _track(self, offset, nextOffset):
+        heapq.heappush(self._pending, offset)
+        self._next_offsets[offset] = nextOffset
+
+    def _roll(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._base = self._end
+        self._position = 0
+        self._file = open(self._segment_path(self._base), 'ab')
+
+    def _recover(self, base):
+        # finds the end of the last intact record, and cuts off a record torn by a crash during an append
+        path = self._segment_path(base)
+        if not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        valid = 0
+        if size > 0:
+            with open(path, 'rb') as segment, mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for position, nextPosition, payload in _read_records(view, 0, size):
+                    valid = nextPosition
+        if valid < size:
+            logger.warning('Discarding %s bytes of an incomplete entry at the end of %s', size - valid, path)
+            with open(path, 'r+b') as segment:
+                segment.truncate(valid)
+        return valid
+
+    def _write_committed(self, offset):
+        with self._commit_lock:
+            if offset <= self._committed:
+                return
+            path = os.path.join(self.directory, _COMMITTED_FILE)
+            with open(path + '.tmp', 'w') as committedFile:
+                committedFile.write(str(offset))
+                committedFile.flush()
+                if self.fsync:
+                    os.fsync(committedFile.fileno())
+            os.replace(path + '.tmp', path)
+            self._committed = offset
+            self._delete_consumed_segments(offset)
+
+    def _read_committed(self):
+        try:
+            with open(os.path.join(self.directory, _COMMITTED_FILE)) as committedFile:
+                return int(committedFile.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _delete_consumed_segments(self, committed):
+        with self._lock:
+            bases = self._segment_bases()
+            for base, nextBase in zip(bases, bases[1:]):
+                if nextBase <= committed and base != self._base:
+                    os.remove(self._segment_path(base))
+
+    def _segment_bases(self):
+        return sorted(int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.endswith(_SEGMENT_SUFFIX) and name[:-len(_SEGMENT_SUFFIX)].isdigit())
+
+    def _segment_path(self, base):
+        return os.path.join(self.directory, _segment_name(base))
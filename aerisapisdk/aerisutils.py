@@ -12,6 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
+import itertools
+import json
+import logging
+
 
 # Print if verbose flag set
 def vprint(verbose, mystr):
@@ -22,3 +27,67 @@ def vprint(verbose, mystr):
 def print_http_error(r):
     print("Problem with request. Response code: " + str(r.status_code))
     print(r.text)
+
+
+def vlog(logger, verbose, msg, *args):
+    """
+    Logs a message at INFO level if verbose is set, or at DEBUG level otherwise.
+    Like any logging call, the message is only formatted if the logger is enabled for that level.
+    """
+    logger.log(logging.INFO if verbose else logging.DEBUG, msg, *args)
+
+
+def log_http_error(logger, r):
+    logger.warning('Problem with request. Response code: %s\n%s', r.status_code, r.text)
+
+
+class LazyJson:
+    """
+    Wraps an object so that it is serialized as indented JSON only when it is converted to a string, e.g., by a
+    logging call whose level is enabled. Pass it as a logging argument instead of calling json.dumps up front.
+    """
+    __slots__ = ('obj', 'indent')
+
+    def __init__(self, obj, indent=4):
+        self.obj = obj
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.obj, indent=self.indent)
+
+
+def imap_unordered(function, items, max_workers):
+    """
+    Calls a function on each item from an iterable on a pool of threads, and yields the outcome of each call as
+    soon as it completes. At most max_workers calls are in flight at a time, and items are only taken from the
+    iterable as calls complete, so very large (or endless) iterables are never held in memory all at once.
+
+    Parameters
+    ----------
+    function: callable
+        Called with one item at a time.
+    items: iterable
+    max_workers: int
+        The maximum number of calls in flight at once.
+
+    Returns
+    -------
+    generator
+        Of (item, result, exception) tuples, in completion order. Exactly one of result and exception is
+        meaningful: exception is None if the call returned, and result is None if it raised.
+    """
+    items = iter(items)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(function, item): item for item in itertools.islice(items, max_workers)}
+        while pending:
+            done, not_done = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                # keep the pool busy before handing control back to the caller
+                for next_item in itertools.islice(items, 1):
+                    pending[executor.submit(function, next_item)] = next_item
+                exception = future.exception()
+                if exception is None:
+                    yield item, future.result(), None
+                else:
+                    yield item, None, exception
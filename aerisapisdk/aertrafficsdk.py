@@ -12,11 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
-import requests
+import logging
+import aerisapisdk.aerishttp as aerishttp
 import aerisapisdk.aerisutils as aerisutils
 import aerisapisdk.aerisconfig as aerisconfig
 
+logger = logging.getLogger(__name__)
+
 
 def get_aertraffic_base():
     """
@@ -31,19 +33,19 @@ def get_endpoint():
 
 def ping(verbose=False):
     endpoint = get_aertraffic_base()
-    r = requests.get(endpoint)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
+    r = aerishttp.get(endpoint)
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
     if (r.status_code == 200):  # We are expecting a 200 in this case
-        print('Endpoint is alive: ' + endpoint)
+        logger.info('Endpoint is alive: %s', endpoint)
     elif (r.status_code == 404):
-        print('Not expecting a 404 ...')
-        aerisutils.print_http_error(r)
+        logger.warning('Not expecting a 404 ...')
+        aerisutils.log_http_error(logger, r)
     else:
-        aerisutils.print_http_error(r)
+        aerisutils.log_http_error(logger, r)
 
 
 def get_device_summary_report(accountId, apiKey, email, deviceIdType, deviceId, verbose=False):
-    """Prints a device summary report.
+    """Gets a device summary report.
 
     Parameters
     ----------
@@ -56,13 +58,19 @@ def get_device_summary_report(accountId, apiKey, email, deviceIdType, deviceId,
 
     Returns
     -------
-    None
+    str
+        The body of the report.
     """
     endpoint = get_endpoint() + accountId
     endpoint = endpoint + '/systemReports/deviceSummary'
     myparams = {'apiKey': apiKey, "durationInMonths": '3', 'subAccounts': 'false'}
-    aerisutils.vprint(verbose, "Endpoint: " + endpoint)
-    aerisutils.vprint(verbose, "Params: " + str(myparams))
-    r = requests.get(endpoint, params=myparams)
-    aerisutils.vprint(verbose, "Response code: " + str(r.status_code))
-    print(r.text)
+    aerisutils.vlog(logger, verbose, 'Endpoint: %s', endpoint)
+    aerisutils.vlog(logger, verbose, 'Params: %s', myparams)
+    r = aerishttp.get(endpoint, params=myparams)
+    return _handle_get_device_summary_report(r, verbose)
+
+
+def _handle_get_device_summary_report(r, verbose):
+    aerisutils.vlog(logger, verbose, 'Response code: %s', r.status_code)
+    aerisutils.vlog(logger, verbose, '%s', r.text)
+    return r.text
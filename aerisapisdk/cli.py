@@ -14,10 +14,12 @@
 
 import click
 import json
+import logging
 import pathlib
 import aerisapisdk.aeradminsdk as aeradminsdk
 import aerisapisdk.aertrafficsdk as aertrafficsdk
 import aerisapisdk.aerframesdk as aerframesdk
+import aerisapisdk.aerisfilters as aerisfilters
 import aerisapisdk.aerisutils as aerisutils
 import aerisapisdk.aerisconfig as aerisconfig
 
@@ -36,6 +38,13 @@ def load_config(ctx, config_filename):
         return False
 
 
+def configure_logging(verbose):
+    """Shows the SDK's log messages on the console, including DEBUG messages if verbose is set.
+    """
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+    logging.getLogger('aerisapisdk').setLevel(logging.DEBUG if verbose else logging.INFO)
+
+
 # Allows us to set the default option value based on value in the context
 def default_from_context(default_name, default_value=' '):
     class OptionDefaultFromContext(click.Option):
@@ -86,6 +95,7 @@ def default_option_from_context_hierarchy(default_value=None, *names):
 @click.pass_context
 def mycli(ctx, verbose, config_file):
     ctx.obj['verbose'] = verbose
+    configure_logging(verbose)
     print('context:\n' + str(ctx.invoked_subcommand))
     if load_config(ctx, config_file):
         aerisutils.vprint(verbose, 'Valid config for account ID: ' + ctx.obj['accountId'])
@@ -194,8 +204,10 @@ def device(ctx):
     \f
 
     """
-    aeradminsdk.get_device_details(ctx.obj['accountId'], ctx.obj['apiKey'], ctx.obj['email'],
-                                   ctx.obj['primaryDeviceIdType'], ctx.obj['primaryDeviceId'], ctx.obj['verbose'])
+    device_details = aeradminsdk.get_device_details(ctx.obj['accountId'], ctx.obj['apiKey'], ctx.obj['email'],
+                                                    ctx.obj['primaryDeviceIdType'], ctx.obj['primaryDeviceId'],
+                                                    ctx.obj['verbose'])
+    print('Device details:\n' + json.dumps(device_details, indent=4))
 
 
 @aeradmin.command()  # Subcommand: aeradmin network
@@ -205,9 +217,10 @@ def network(ctx):
     \f
 
     """
-    aeradminsdk.get_device_network_details(ctx.obj['accountId'], ctx.obj['apiKey'], ctx.obj['email'],
-                                           ctx.obj['primaryDeviceIdType'], ctx.obj['primaryDeviceId'],
-                                           ctx.obj['verbose'])
+    network_details = aeradminsdk.get_device_network_details(ctx.obj['accountId'], ctx.obj['apiKey'],
+                                                             ctx.obj['email'], ctx.obj['primaryDeviceIdType'],
+                                                             ctx.obj['primaryDeviceId'], ctx.obj['verbose'])
+    print('Network details:\n' + json.dumps(network_details, indent=4))
 
 
 # ========================================================================
@@ -226,9 +239,10 @@ def aertraffic(ctx):
 @aertraffic.command()  # Subcommand: aertraffic devicesummaryreport
 @click.pass_context
 def devicesummaryreport(ctx):
-    aertrafficsdk.get_device_summary_report(ctx.obj['accountId'], ctx.obj['apiKey'], ctx.obj['email'],
-                                            ctx.obj['primaryDeviceIdType'], ctx.obj['primaryDeviceId'],
-                                            ctx.obj['verbose'])
+    report = aertrafficsdk.get_device_summary_report(ctx.obj['accountId'], ctx.obj['apiKey'], ctx.obj['email'],
+                                                     ctx.obj['primaryDeviceIdType'], ctx.obj['primaryDeviceId'],
+                                                     ctx.obj['verbose'])
+    print(report)
 
 
 # ========================================================================
@@ -395,13 +409,16 @@ def get(ctx):
 
 
 @channel.command()  # Subcommand: aerframe create_channel
+@click.option('--max-notifications', default=aerframesdk.DEFAULT_MAX_NOTIFICATIONS,
+              help="Maximum number of notifications returned by one poll")
 @click.pass_context
-def create(ctx):
+def create(ctx, max_notifications):
     """Create AerFrame notification channel
     \f
 
     """
-    aerframesdk.create_channel(ctx.obj['accountId'], ctx.obj['apiKey'], 'aerframesdk', ctx.obj['verbose'])
+    aerframesdk.create_channel(ctx.obj['accountId'], ctx.obj['apiKey'], 'aerframesdk', ctx.obj['verbose'],
+                               maxNotifications=max_notifications)
 
 
 @channel.command()  # Subcommand: aerframe channel delete
@@ -490,21 +507,31 @@ def send(ctx, message, imsi):
     If omitted, MESSAGE will be "Test from aerframesdk.".
     \f
     """
-    aerframesdk.send_mt_sms(ctx.obj['accountId'], ctx.obj['aerframeApplication']['apiKey'], afsdkappname,
-                            imsi, message, ctx.obj['verbose'])
+    sent = aerframesdk.send_mt_sms(ctx.obj['accountId'], ctx.obj['aerframeApplication']['apiKey'], afsdkappname,
+                                   imsi, message, ctx.obj['verbose'])
+    if sent is not None:
+        print('Sent SMS:\n' + json.dumps(sent, indent=4))
 
 
 @sms.command()  # Subcommand: aerframe sms receive
 @click.option('--num', default=1, help="Number of receive requests")
+@click.option('--search', default=None, help="Only show MO-SMs whose text contains this")
+@click.option('--imsi', 'imsis', multiple=True, help="Only show notifications about this IMSI; may be repeated")
+@click.option('--status', 'statuses', multiple=True,
+              help="Only show delivery receipts with this delivery status; may be repeated")
 @click.pass_context
-def receive(ctx, num):
+def receive(ctx, num, search, imsis, statuses):
     """Receive SMS or Delivery Receipt
     \f
 
     """
     channelURL = ctx.obj['aerframeChannel']['channelData']['channelURL']
-    aerframesdk.notifications_flush_search(ctx.obj['accountId'], ctx.obj['aerframeApplication']['apiKey'], channelURL,
-                                           num, None, ctx.obj['verbose'])
+    notificationFilter = aerisfilters.NotificationFilter(imsis=imsis or None, deliveryStatuses=statuses or None,
+                                                         text=search)
+    found = aerframesdk.notifications_flush_search(ctx.obj['accountId'], ctx.obj['aerframeApplication']['apiKey'],
+                                                   channelURL, num, notificationFilter, ctx.obj['verbose'])
+    for notification in found:
+        print(notification.kind + ':\n' + json.dumps(notification.data, indent=4))
 
 
 @aerframe.group()
@@ -25,6 +25,10 @@ for example, the device roamed to a different carrier.
 * the device may move to a different cell, and then back to its original cell, and the hourly polling
 will be unable to tell that the device moved.
 
+To watch many devices from one process, see GeofenceWatcher in aerisapisdk.aerisgeofence, which implements the same
+checks as a library component; with a PollingBudget as its interval, it spreads a budget of lookups per hour over the
+devices by how much they move, instead of looking each one up every LOCATION_REQUEST_PERIOD_SECONDS.
+
 If you're interested in more robust geofencing capabilities, Aeris may be able to help!
 Drop us a line at https://www.aeris.com/get-connected/
 """
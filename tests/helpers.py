@@ -0,0 +1,52 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fakes and test data shared by the tests.
+"""
+
+from aerisapisdk.aerisfilters import DELIVERY_RECEIPT, Notification
+
+NO_LOCATION = {'mcc': 0, 'mnc': 0, 'lac': 0, 'cellId': 0}
+
+
+class FakeClock:
+    """
+    A clock for the "clock" parameters of the SDK, which only moves when "now" is set.
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def receipt(status, address='123456789012345', request=None, clientCorrelator=None):
+    """
+    Returns a delivery receipt Notification, linked to the MT-SM request at URL "request" if given.
+    """
+    data = {'address': 'tel:' + address, 'deliveryStatus': status}
+    if request is not None:
+        data['link'] = [{'rel': 'MTMessageRequest', 'href': request}]
+    if clientCorrelator is not None:
+        data['clientCorrelator'] = clientCorrelator
+    return Notification(DELIVERY_RECEIPT, 'mt', data)
+
+
+def location(cellId, lac=1):
+    """
+    Returns a get_location result in cell "cellId" of LAC "lac" of MCC 204, MNC 4.
+    """
+    return {'mcc': 204, 'mnc': 4, 'lac': lac, 'cellId': cellId, 'latitude': 0.0}
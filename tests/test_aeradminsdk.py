@@ -12,10 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import json
 import unittest
 
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import aerisapisdk.aerisconfig as aerisconfig
 import aerisapisdk.aeradminsdk as aeradminsdk
@@ -205,3 +206,51 @@ class TestAerAdminSDK(AerTestCase):
             aeradminsdk.get_device_network_details(self.accountId, self.apiKey, self.email, self.deviceIdType,
                                                    self.deviceId, self.verbose)
         self.verify_api_exception(context.exception, 401, json.dumps(response_json))
+
+    @responses.activate
+    def test_get_device_details_bulk(self):
+        def callback(request):
+            body = json.loads(request.body)
+            if 'ICCID' in body:
+                device_id = body['ICCID']
+            else:
+                device_id = body['IMSI']
+            if device_id == 'not-activated':
+                return 200, {}, json.dumps({"resultCode": 1047, "resultMessage": "Device not Activated."})
+            return 200, {}, json.dumps({"resultCode": 0, "deviceAttributes": [{"deviceID": {"id": device_id}}]})
+
+        responses.add_callback(responses.POST,
+                               TEST_AERADMIN_URL + '/AerAdmin_WS_5_0/rest/devices/details',
+                               callback=callback)
+        devices = [('IMSI', '1'), ('ICCID', '2'), ('IMSI', 'not-activated')]
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            results = list(aeradminsdk.get_device_details_bulk(self.accountId, self.apiKey, self.email, devices,
+                                                               maxWorkers=2))
+        self.assertEqual('', stdout.getvalue())
+
+        by_id = {result.deviceId: result for result in results}
+        self.assertEqual('ICCID', by_id['2'].deviceIdType)
+        self.assertEqual('2', by_id['2'].details['deviceAttributes'][0]['deviceID']['id'])
+        self.assertIsNone(by_id['1'].error)
+        self.assertIsNone(by_id['not-activated'].details)
+        self.assertIn('1047', by_id['not-activated'].error.message)
+
+    @responses.activate
+    def test_get_device_network_details_bulk(self):
+        def callback(request):
+            if request.params.get('IMSI') == 'unauthorized':
+                return 401, {}, json.dumps({"code": 401, "status": "UNAUTHORIZED"})
+            return 200, {}, json.dumps({"resultCode": 0, "networkResponse": [{"IMSI": request.params['IMSI']}]})
+
+        responses.add_callback(responses.GET,
+                               TEST_AERADMIN_URL + '/AerAdmin_WS_5_0/rest/devices/network/details',
+                               callback=callback)
+        devices = (('IMSI', imsi) for imsi in ['1', 'unauthorized'])
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            results = list(aeradminsdk.get_device_network_details_bulk(self.accountId, self.apiKey, self.email,
+                                                                       devices))
+        self.assertEqual('', stdout.getvalue())
+
+        by_id = {result.deviceId: result for result in results}
+        self.assertEqual('1', by_id['1'].details['networkResponse'][0]['IMSI'])
+        self.assertEqual(401, by_id['unauthorized'].error.response.status_code)
@@ -14,12 +14,15 @@
 
 import copy
 import json
+import re
 import unittest
 
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import aerisapisdk.aerisconfig as aerisconfig
 import aerisapisdk.aerframesdk as aerframesdk
+import aerisapisdk.aerisfilters as aerisfilters
+from aerisapisdk.aeriscorrelation import derive_client_correlator
 from aerisapisdk.exceptions import ApiException
 
 import responses
@@ -43,6 +46,9 @@ class TestAerFrameSDK(AerTestCase):
     deviceId = '123456789012345'
     verbose = False
 
+    def setUp(self):
+        aerframesdk.clear_caches()
+
     def test_get_application_endpoint_without_application_id(self):
         result = aerframesdk.get_application_endpoint(self.accountId, None)
         self.assertEqual(TEST_AF_URL + '/registration/v2/' + self.accountId + '/applications', result)
@@ -98,6 +104,69 @@ class TestAerFrameSDK(AerTestCase):
         result = aerframesdk.get_applications(self.accountId, self.apiKey, shortNameToSearch, self.verbose)
         self.assertEqual(expectedApplicationId, result)
 
+    @responses.activate
+    def test_get_applications_caches_every_listed_application(self):
+        app_ids = {'app-one': '11111111-2943-1346-6c49-123456789abc',
+                   'app-two': '22222222-2943-1346-6c49-123456789abc'}
+        response_json = {"application": [
+            {"applicationShortName": name, "resourceURL": f'{TEST_AF_URL}/registration/v2/123/applications/{app_id}'}
+            for name, app_id in app_ids.items()]}
+        applications_url = TEST_AF_URL + '/registration/v2/' + self.accountId + '/applications'
+        responses.add_callback(responses.GET, applications_url,
+                               callback=self.create_body_assertion(None, {'apiKey': self.apiKey}, response_json))
+
+        self.assertEqual(app_ids['app-one'], aerframesdk.get_applications(self.accountId, self.apiKey, 'app-one'))
+        self.assertEqual(app_ids['app-two'], aerframesdk.get_applications(self.accountId, self.apiKey, 'app-two'))
+        self.assertEqual(app_ids['app-one'], aerframesdk.get_applications(self.accountId, self.apiKey, 'app-one'))
+        self.assertEqual(1, len(responses.calls))
+
+        # a different account does not see the cached IDs, and useCache=False always lists
+        responses.add(responses.GET, TEST_AF_URL + '/registration/v2/456/applications', json={'application': []})
+        self.assertIsNone(aerframesdk.get_applications('456', self.apiKey, 'app-one'))
+        aerframesdk.get_applications(self.accountId, self.apiKey, 'app-one', useCache=False)
+        self.assertEqual(2, len([call for call in responses.calls if call.request.url.startswith(applications_url)]))
+
+    @responses.activate
+    def test_create_and_delete_application_invalidate_cached_id(self):
+        app_id = '11111111-2943-1346-6c49-123456789abc'
+        applications_url = TEST_AF_URL + '/registration/v2/' + self.accountId + '/applications'
+        aerframesdk.application_id_cache.put((applications_url, self.apiKey, 'app-one'), app_id)
+        aerframesdk.application_id_cache.put((applications_url, self.apiKey, 'app-two'), 'another-id')
+        aerframesdk.application_id_cache.put((applications_url, 'other-key', 'app-two'), 'another-id')
+
+        responses.add(responses.DELETE, applications_url + '/' + app_id, status=204)
+        self.assertTrue(aerframesdk.delete_application(self.accountId, self.apiKey, app_id))
+        self.assertIsNone(aerframesdk.application_id_cache.get((applications_url, self.apiKey, 'app-one')))
+        self.assertEqual('another-id', aerframesdk.application_id_cache.get((applications_url, self.apiKey, 'app-two')))
+
+        responses.add(responses.POST, applications_url, status=201, json={'applicationShortName': 'app-two'})
+        aerframesdk.create_application(self.accountId, self.apiKey, 'app-two')
+        self.assertEqual(0, len(aerframesdk.application_id_cache))
+
+    @responses.activate
+    def test_cached_application_ids_are_not_returned_for_another_api_key_or_host(self):
+        app_id = '11111111-2943-1346-6c49-123456789abc'
+        applications_url = TEST_AF_URL + '/registration/v2/' + self.accountId + '/applications'
+        listing = {'application': [{'applicationShortName': 'app-one', 'resourceURL': f'{applications_url}/{app_id}'}]}
+
+        def callback(request):
+            if f'apiKey={self.apiKey}' not in request.url:
+                return 401, {}, ''
+            return 200, {}, json.dumps(listing)
+
+        responses.add_callback(responses.GET, applications_url, callback=callback)
+        self.assertEqual(app_id, aerframesdk.get_applications(self.accountId, self.apiKey, 'app-one'))
+
+        with self.assertRaises(ApiException):
+            aerframesdk.get_applications(self.accountId, 'revoked-key', 'app-one')
+
+        other_url = 'https://other.localhost'
+        responses.add(responses.GET, other_url + '/registration/v2/' + self.accountId + '/applications',
+                      json={'application': []})
+        with patch('aerisapisdk.aerisconfig.get_aerframe_api_url', return_value=other_url):
+            self.assertIsNone(aerframesdk.get_applications(self.accountId, self.apiKey, 'app-one'))
+        self.assertEqual(3, len(responses.calls))
+
     @responses.activate
     def test_get_applications_short_name_not_found(self):
         short_name_to_search = 'the-one-that-should-be-found'
@@ -387,6 +456,32 @@ class TestAerFrameSDK(AerTestCase):
         self.verify_api_exception(context.exception, 401, EMPTY_RESPONSE_BODY,
                                   {'Content-Length': '0', 'Content-Type': 'text/plain'})
 
+    @responses.activate
+    def test_channel_index_keeps_every_match_and_is_invalidated(self):
+        channels_url = f'{TEST_AF_URL}/notificationchannel/v2/{self.accountId}/channels'
+        response_json = {"notificationChannel": [
+            {"applicationTag": tag, "resourceURL": f'{channels_url}/{channel_id}'}
+            for tag, channel_id in (('app', 'c1'), ('other', 'c2'), ('app', 'c3'))]}
+        responses.add_callback(responses.GET, channels_url,
+                               callback=self.create_body_assertion(None, {'apiKey': self.apiKey}, response_json))
+
+        self.assertEqual(['c1', 'c3'], aerframesdk.get_channel_ids_by_tag(self.accountId, self.apiKey, 'app'))
+        self.assertEqual('c3', aerframesdk.get_channel_id_by_tag(self.accountId, self.apiKey, 'app'))
+        self.assertEqual(['c2'], aerframesdk.get_channel_ids_by_tag(self.accountId, self.apiKey, 'other'))
+        self.assertEqual([], aerframesdk.get_channel_ids_by_tag(self.accountId, self.apiKey, 'missing'))
+        self.assertEqual(1, len(responses.calls))
+
+        responses.add(responses.DELETE, channels_url + '/c2', status=204)
+        aerframesdk.delete_channel(self.accountId, self.apiKey, 'c2')
+        self.assertEqual(['c1', 'c3'], aerframesdk.get_channel_ids_by_tag(self.accountId, self.apiKey, 'app'))
+        self.assertEqual(3, len(responses.calls))
+
+        responses.add(responses.POST, channels_url, json={'applicationTag': 'new'})
+        aerframesdk.create_channel(self.accountId, self.apiKey, 'new')
+        aerframesdk.get_channel_id_by_tag(self.accountId, self.apiKey, 'app')
+        aerframesdk.get_channel_id_by_tag(self.accountId, self.apiKey, 'app', useCache=False)
+        self.assertEqual(6, len(responses.calls))
+
     @responses.activate
     def test_get_channel(self):
         channel_id = '13245678-1234-1234-1234-123456789abc'
@@ -478,6 +573,17 @@ class TestAerFrameSDK(AerTestCase):
         result = aerframesdk.create_channel(self.accountId, self.apiKey, application_tag, self.verbose)
         self.assertEqual(result, response_body)
 
+    @responses.activate
+    def test_create_channel_max_notifications(self):
+        expected_body = {'applicationTag': 'tag',
+                         'channelData': {'maxNotifications': '100', 'type': 'nc:LongPollingData'},
+                         'channelType': 'LongPolling'}
+        callback = self.create_body_assertion(expected_body, {'apiKey': self.apiKey}, {'applicationTag': 'tag'})
+        responses.add_callback(responses.POST, f'{TEST_AF_URL}/notificationchannel/v2/{self.accountId}/channels',
+                               callback=callback)
+        self.assertEqual({'applicationTag': 'tag'},
+                         aerframesdk.create_channel(self.accountId, self.apiKey, 'tag', maxNotifications=100))
+
     @responses.activate
     def test_create_channel_http_401(self):
         application_tag = 'an_application_tag'
@@ -767,6 +873,60 @@ class TestAerFrameSDK(AerTestCase):
         self.verify_api_exception(context.exception, 401, EMPTY_RESPONSE_BODY,
                                   {'Content-Length': '0', 'Content-Type': 'text/plain'})
 
+    @responses.activate
+    def test_find_subscriptions_uses_exact_indexes_and_cache(self):
+        channels = f'{TEST_AF_URL}/notificationchannel/v2/{self.accountId}/channels/'
+        inbound_url = f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/inbound/subscriptions'
+        outbound_url = f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/app/subscriptions'
+        inbound_body = {"subscription": [
+            {"callbackReference": {"notifyURL": channels + 'c1/callback'}, "destinationAddress": ['app-2'],
+             "resourceURL": inbound_url + '/in-1'},
+            {"callbackReference": {"notifyURL": channels + 'c1/callback'}, "destinationAddress": ['app'],
+             "resourceURL": inbound_url + '/in-2'},
+            {"callbackReference": {"notifyURL": 'https://example.com/mo'}, "destinationAddress": ['app'],
+             "resourceURL": inbound_url + '/in-3'}]}
+        outbound_body = {"deliveryReceiptSubscription": [
+            {"callbackReference": {"notifyURL": channels + 'c2/callback'}, "resourceURL": outbound_url + '/out-1'}]}
+        responses.add(responses.GET, inbound_url, json=inbound_body)
+        responses.add(responses.GET, outbound_url, json=outbound_body)
+
+        found = aerframesdk.find_subscriptions(self.accountId, self.apiKey, 'app')
+        self.assertEqual(['in-2', 'in-3', 'out-1'], [s.subscriptionId for s in found])
+        self.assertEqual([aerframesdk.INBOUND, aerframesdk.INBOUND, aerframesdk.OUTBOUND], [s.direction for s in found])
+        self.assertEqual(['c1', None, 'c2'], [s.channelId for s in found])
+        self.assertEqual(['in-2'], [s.subscriptionId for s in
+                                    aerframesdk.find_subscriptions(self.accountId, self.apiKey, 'app', channelId='c1')])
+        self.assertEqual([], aerframesdk.find_subscriptions(self.accountId, self.apiKey, 'ap',
+                                                            direction=aerframesdk.INBOUND))
+        self.assertEqual('in-2', aerframesdk.get_inbound_subscription_by_app_short_name(self.accountId, self.apiKey,
+                                                                                        'app'))
+        self.assertEqual('out-1', aerframesdk.get_outbound_subscription_id_by_app_short_name(self.accountId,
+                                                                                             self.apiKey, 'app'))
+        self.assertEqual(2, len(responses.calls))
+
+        responses.add(responses.DELETE, outbound_url + '/out-1', status=204)
+        aerframesdk.delete_outbound_subscription(self.accountId, self.apiKey, 'app', 'out-1')
+        aerframesdk.find_subscriptions(self.accountId, self.apiKey, 'app', direction=aerframesdk.OUTBOUND)
+        aerframesdk.find_subscriptions(self.accountId, self.apiKey, 'app', direction=aerframesdk.INBOUND)
+        self.assertEqual(4, len(responses.calls))
+
+    @responses.activate
+    def test_inbound_subscriptions_are_cached_per_application(self):
+        inbound_url = f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/inbound/subscriptions'
+
+        def by_key(request):
+            appShortName = 'app-1' if 'apiKey=key-1' in request.url else 'app-2'
+            return 200, {}, json.dumps({"subscription": [
+                {"destinationAddress": [appShortName], "resourceURL": inbound_url + '/in-' + appShortName}]})
+
+        responses.add_callback(responses.GET, inbound_url, callback=by_key)
+        self.assertEqual('in-app-1', aerframesdk.get_inbound_subscription_by_app_short_name(self.accountId, 'key-1',
+                                                                                            'app-1'))
+        self.assertEqual('in-app-2', aerframesdk.get_inbound_subscription_by_app_short_name(self.accountId, 'key-2',
+                                                                                            'app-2'))
+        aerframesdk.get_inbound_subscription_by_app_short_name(self.accountId, 'key-1', 'app-1')
+        self.assertEqual(2, len(responses.calls))
+
     @responses.activate
     def test_get_outbound_subscription_happy_path(self):
         subscription_id = '12345678-1234-1234-1234-123456789abc'
@@ -1036,10 +1196,30 @@ class TestAerFrameSDK(AerTestCase):
         responses.add_callback(responses.POST,
                                f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
                                callback=callback)
-        result = aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, imsi, smsText, self.verbose)
+        result = aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, imsi, smsText, self.verbose,
+                                         clientCorrelator='123456')
 
         self.assertEqual(response_body, result)
 
+    @responses.activate
+    def test_send_mt_sms_generates_unique_client_correlators(self):
+        app_short_name = 'a_short_name'
+        correlators = []
+
+        def callback(request):
+            body = json.loads(request.body)
+            correlators.append(body['clientCorrelator'])
+            return 201, {}, json.dumps(body)
+
+        responses.add_callback(responses.POST,
+                               f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
+                               callback=callback)
+        first = aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, '1', 'a', self.verbose)
+        second = aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, '1', 'a', self.verbose)
+
+        self.assertNotEqual(correlators[0], correlators[1])
+        self.assertEqual(correlators, [first['clientCorrelator'], second['clientCorrelator']])
+
     @responses.activate
     def test_send_mt_sms_http_401(self):
         imsi = '123456789012345'
@@ -1062,7 +1242,8 @@ class TestAerFrameSDK(AerTestCase):
                                f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
                                callback=callback)
         with self.assertRaises(ApiException) as context:
-            aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, imsi, smsText, self.verbose)
+            aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, imsi, smsText, self.verbose,
+                                    clientCorrelator='123456')
         # the requests - or responses - library likes adding a Content-Type header for an empty response body
         self.verify_api_exception(context.exception, 401, EMPTY_RESPONSE_BODY,
                                   {'Content-Length': '0', 'Content-Type': 'text/plain'})
@@ -1100,7 +1281,8 @@ class TestAerFrameSDK(AerTestCase):
         responses.add_callback(responses.POST,
                                f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
                                callback=callback)
-        result = aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, imsi, smsText, self.verbose)
+        result = aerframesdk.send_mt_sms(self.accountId, self.apiKey, app_short_name, imsi, smsText, self.verbose,
+                                         clientCorrelator='123456')
 
         self.assertIsNone(result)
 
@@ -1199,3 +1381,200 @@ class TestAerFrameSDK(AerTestCase):
         # the requests - or responses - library likes adding a Content-Type header for an empty response body
         self.verify_api_exception(context.exception, 401, response_body,
                                   {'Content-Type': 'text/plain'})
+
+    @responses.activate
+    def test_send_mt_sms_batch_groups_recipients(self):
+        app_short_name = 'a_short_name'
+        requests_seen = []
+
+        def callback(request):
+            body = json.loads(request.body)
+            requests_seen.append((tuple(body['address']), body['outboundSMSTextMessage']['message']))
+            body['resourceURL'] = f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/' \
+                + f'requests/{len(requests_seen)}'
+            return 201, {}, json.dumps(body)
+
+        responses.add_callback(responses.POST,
+                               f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
+                               callback=callback)
+        recipients = ['1', '2', '3', ('4', 'other'), '5']
+        results = aerframesdk.send_mt_sms_batch(self.accountId, self.apiKey, app_short_name, recipients, 'wake',
+                                                batchSize=2, maxWorkers=3, verbose=self.verbose)
+
+        self.assertEqual(sorted([(('1', '2'), 'wake'), (('3', '5'), 'wake'), (('4',), 'other')]),
+                         sorted(requests_seen))
+        self.assertEqual(['1', '2', '3', '4', '5'], sorted(result.imsi for result in results))
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertIn(result.imsi, result.response['address'])
+            self.assertEqual(result.smsText, result.response['outboundSMSTextMessage']['message'])
+            self.assertEqual(result.clientCorrelator, result.response['clientCorrelator'])
+        self.assertEqual(3, len({result.clientCorrelator for result in results}))
+
+    @responses.activate
+    def test_send_mt_sms_batch_transliterates_and_counts_segments(self):
+        app_short_name = 'a_short_name'
+        messages = []
+
+        def callback(request):
+            body = json.loads(request.body)
+            messages.append(body['outboundSMSTextMessage']['message'])
+            return 201, {}, json.dumps(body)
+
+        responses.add_callback(responses.POST,
+                               f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
+                               callback=callback)
+        text = 'It’s time – ' + 'x' * 60
+        results = aerframesdk.send_mt_sms_batch(self.accountId, self.apiKey, app_short_name, ['1', ('2', 'a' * 200)],
+                                                text, verbose=self.verbose, transliterate=True)
+
+        self.assertEqual(sorted(["It's time - " + 'x' * 60, 'a' * 200]), sorted(messages))
+        by_imsi = {result.imsi: result for result in results}
+        self.assertEqual(text, by_imsi['1'].smsText)
+        self.assertEqual(1, by_imsi['1'].segments)
+        self.assertEqual(2, by_imsi['2'].segments)
+
+    @responses.activate
+    def test_send_mt_sms_batch_retries_unknown_devices_individually(self):
+        app_short_name = 'a_short_name'
+        payloads = []
+
+        def callback(request):
+            body = json.loads(request.body)
+            payloads.append(body)
+            if 'unknown' in body['address']:
+                return 404, {}, json.dumps({'serviceException': {'messageId': 'SVC0002'}})
+            return 201, {}, json.dumps(body)
+
+        responses.add_callback(responses.POST,
+                               f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
+                               callback=callback)
+        results = aerframesdk.send_mt_sms_batch(self.accountId, self.apiKey, app_short_name, ['1', 'unknown', '2'],
+                                                'wake', batchSize=10, verbose=self.verbose)
+
+        by_imsi = {result.imsi: result for result in results}
+        self.assertIsNone(by_imsi['unknown'].response)
+        self.assertEqual(['1'], by_imsi['1'].response['address'])
+        self.assertEqual(['2'], by_imsi['2'].response['address'])
+        self.assertEqual(4, len(responses.calls))
+        batch, retries = payloads[0], payloads[1:]
+        self.assertEqual(['1', 'unknown', '2'], batch['address'])
+        expected = [{'address': [imsi], 'senderAddress': app_short_name,
+                     'outboundSMSTextMessage': {'message': 'wake'},
+                     'clientCorrelator': derive_client_correlator(batch['clientCorrelator'], imsi),
+                     'senderName': app_short_name}
+                    for imsi in batch['address']]
+        self.assertEqual(expected, retries)
+        for imsi in batch['address']:
+            self.assertEqual(derive_client_correlator(batch['clientCorrelator'], imsi), by_imsi[imsi].clientCorrelator)
+
+    @responses.activate
+    def test_send_mt_sms_batch_http_401(self):
+        app_short_name = 'a_short_name'
+        callback = self.create_body_assertion({'address': ['1', '2'], 'senderAddress': app_short_name,
+                                               'outboundSMSTextMessage': {'message': 'wake'},
+                                               'clientCorrelator': '123456', 'senderName': app_short_name},
+                                              {'apiKey': self.apiKey}, '', {'Content-Length': '0'},
+                                              response_status=401)
+        responses.add_callback(responses.POST,
+                               f'{TEST_AF_URL}/smsmessaging/v2/{self.accountId}/outbound/{app_short_name}/requests',
+                               callback=callback)
+        with patch('aerisapisdk.aeriscorrelation.new_client_correlator', return_value='123456'):
+            results = aerframesdk.send_mt_sms_batch(self.accountId, self.apiKey, app_short_name, ['1', '2'], 'wake',
+                                                    verbose=self.verbose)
+
+        self.assertEqual(2, len(results))
+        for result in results:
+            self.assertIsNone(result.response)
+            self.assertIsInstance(result.error, ApiException)
+            self.assertEqual(401, result.error.response.status_code)
+
+    def test_send_mt_sms_batch_requires_text(self):
+        with self.assertRaises(ValueError):
+            aerframesdk.send_mt_sms_batch(self.accountId, self.apiKey, 'a_short_name', ['1'])
+
+    @responses.activate
+    def test_get_locations(self):
+        def callback(request):
+            device_id = request.path_url.split('/')[-2]
+            if device_id == 'missing':
+                return 404, {}, json.dumps({'error': 'not found'})
+            return 200, {}, json.dumps({'mcc': 204, 'mnc': 4, 'lac': 1, 'cellId': int(device_id)})
+
+        responses.add_callback(responses.GET,
+                               re.compile(f'{TEST_AF_URL}/networkservices/v2/{self.accountId}/devices/IMSI/.*'),
+                               callback=callback)
+        taken = []
+
+        def devices():
+            for device_id in ['1', '2', 'missing', '3', '4', '5']:
+                taken.append(device_id)
+                yield 'IMSI', device_id
+
+        results = aerframesdk.get_locations(self.accountId, self.apiKey, devices(), maxWorkers=2,
+                                            verbose=self.verbose)
+        first = next(results)
+        # only the first batch of devices, plus one to refill the pool, has been taken from the iterable
+        self.assertLessEqual(len(taken), 3)
+        by_id = {result.deviceId: result for result in [first] + list(results)}
+
+        self.assertEqual(['1', '2', '3', '4', '5', 'missing'], sorted(by_id))
+        self.assertEqual(5, by_id['5'].location['cellId'])
+        self.assertIsNone(by_id['5'].error)
+        self.assertIsNone(by_id['missing'].location)
+        self.assertEqual(404, by_id['missing'].error.response.status_code)
+
+    @responses.activate
+    def test_get_applications_does_not_format_json_when_logging_disabled(self):
+        response_json = {"application": [{"applicationShortName": "an_app", "resourceURL": "x/applications/1"}]}
+        callback = self.create_body_assertion(None, {'apiKey': self.apiKey}, response_json)
+        responses.add_callback(responses.GET,
+                               TEST_AF_URL + '/registration/v2/' + self.accountId + '/applications',
+                               callback=callback)
+        with patch('aerisapisdk.aerisutils.LazyJson.__str__') as to_str:
+            result = aerframesdk.get_applications(self.accountId, self.apiKey, 'an_app', verbose=True)
+        self.assertEqual('1', result)
+        to_str.assert_not_called()
+
+    @responses.activate
+    def test_get_applications_verbose_logs_at_info(self):
+        response_json = {"application": [{"applicationShortName": "an_app", "resourceURL": "x/applications/1"}]}
+        callback = self.create_body_assertion(None, {'apiKey': self.apiKey}, response_json)
+        responses.add_callback(responses.GET,
+                               TEST_AF_URL + '/registration/v2/' + self.accountId + '/applications',
+                               callback=callback)
+        with self.assertLogs('aerisapisdk.aerframesdk', level='INFO') as logs:
+            aerframesdk.get_applications(self.accountId, self.apiKey, 'an_app', verbose=True)
+        self.assertIn('INFO:aerisapisdk.aerframesdk:Response code: 200', logs.output)
+        self.assertIn('"applicationShortName": "an_app"', '\n'.join(logs.output))
+
+    @responses.activate
+    def test_notifications_flush_search(self):
+        channel_url = f'{TEST_LP_URL}/notificationchannel/v2/{self.accountId}/longpoll/channel-1'
+
+        def receipts(*statuses):
+            return {'deliveryInfoNotification': [{'callbackData': 'mt', 'deliveryInfo': [
+                {'address': self.deviceId, 'deliveryStatus': status} for status in statuses]}]}
+
+        responses.add(responses.GET, channel_url, json=receipts('DeliveredToTerminal', 'DeliveryImpossible'))
+        responses.add(responses.GET, channel_url, json=receipts('DeliveryImpossible', 'DeliveryImpossible'))
+        responses.add(responses.GET, channel_url, json={'deliveryInfoNotification': []})
+
+        search = aerisfilters.NotificationFilter(deliveryStatuses=['DeliveryImpossible'])
+        found = aerframesdk.notifications_flush_search(self.accountId, self.apiKey, channel_url, 10, search, limit=2)
+        self.assertEqual(['DeliveryImpossible'] * 2, [n.data['deliveryStatus'] for n in found])
+        self.assertEqual(2, len(responses.calls))
+
+        # without a limit, stops at the first empty poll
+        found = aerframesdk.notifications_flush_search(self.accountId, self.apiKey, channel_url, 10, None)
+        self.assertEqual([], found)
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_notifications_flush_search_text(self):
+        channel_url = f'{TEST_LP_URL}/notificationchannel/v2/{self.accountId}/longpoll/channel-1'
+        responses.add(responses.GET, channel_url, json={'inboundSMSMessageNotification': [
+            {'callbackData': 'mo', 'inboundSMSMessage': {'senderAddress': self.deviceId, 'message': text}}
+            for text in ('aGVsbG8gd29ybGQ=', 'goodbye')]})
+        found = aerframesdk.notifications_flush_search(self.accountId, self.apiKey, channel_url, 1, 'hello')
+        self.assertEqual(['aGVsbG8gd29ybGQ='], [n.data['message'] for n in found])
@@ -0,0 +1,100 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import unittest
+
+from aerisapisdk.aerisasyncclient import AsyncAerisClient, aiohttp
+from aerisapisdk.exceptions import ApiException
+
+if aiohttp is not None:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestAsyncAerisClient(unittest.TestCase):
+    accountId = '123'
+    apiKey = 'anApiKey'
+    appApiKey = 'anAppApiKey'
+    email = 'foo@bar.com'
+    imsi = '123456789012345'
+
+    def run_against_server(self, routes, test):
+        """
+        Runs the coroutine function "test" with a client pointed at a local server that serves "routes".
+        """
+        async def run():
+            app = web.Application()
+            app.add_routes(routes)
+            async with TestServer(app) as server:
+                base = str(server.make_url('')).rstrip('/')
+                urls = {'aerframe_ws_api': base, 'aerframe_lp_api': base, 'aeradmin_api': base,
+                        'aertraffic_api': base}
+                async with AsyncAerisClient(self.accountId, self.apiKey, appApiKey=self.appApiKey, email=self.email,
+                                            urls=urls) as client:
+                    return await test(client)
+        return asyncio.run(run())
+
+    def test_get_location(self):
+        location = {'mcc': 204, 'mnc': 4, 'lac': 1234, 'cellId': 5678}
+        seen_api_keys = []
+
+        async def handler(request):
+            seen_api_keys.append(request.query['apiKey'])
+            return web.json_response(location)
+
+        routes = [web.get(f'/networkservices/v2/{self.accountId}/devices/IMSI/{{deviceId}}/networkLocation',
+                          handler)]
+
+        async def test(client):
+            return await asyncio.gather(*[client.get_location('IMSI', self.imsi) for _ in range(5)])
+
+        results = self.run_against_server(routes, test)
+        self.assertEqual([location] * 5, results)
+        self.assertEqual([self.appApiKey] * 5, seen_api_keys)
+
+    def test_send_mt_sms(self):
+        async def handler(request):
+            body = await request.json()
+            body['resourceURL'] = 'https://localhost/requests/1'
+            return web.json_response(body, status=201)
+
+        routes = [web.post(f'/smsmessaging/v2/{self.accountId}/outbound/my-app/requests', handler)]
+
+        async def test(client):
+            return await client.send_mt_sms('my-app', self.imsi, 'hello')
+
+        result = self.run_against_server(routes, test)
+        self.assertEqual([self.imsi], result['address'])
+        self.assertEqual('hello', result['outboundSMSTextMessage']['message'])
+
+    def test_get_device_details_raises_api_exception(self):
+        response_json = {"code": 401, "status": "UNAUTHORIZED", "message": "AccountId and ApiKey are not linked."}
+
+        async def handler(request):
+            return web.json_response(response_json, status=401)
+
+        routes = [web.post('/AerAdmin_WS_5_0/rest/devices/details', handler)]
+
+        async def test(client):
+            with self.assertRaises(ApiException) as context:
+                await client.get_device_details('IMSI', self.imsi)
+            return context.exception
+
+        exception = self.run_against_server(routes, test)
+        self.assertEqual(401, exception.response.status_code)
+        self.assertEqual(response_json, json.loads(exception.response.text))
+        self.assertEqual('application/json; charset=utf-8', exception.response.headers['Content-Type'])
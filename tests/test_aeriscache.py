@@ -0,0 +1,60 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from aerisapisdk.aeriscache import TtlLruCache
+from tests.helpers import FakeClock
+
+
+class TestTtlLruCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+
+    def test_entries_expire_after_ttl(self):
+        cache = TtlLruCache(ttl=10, clock=self.clock)
+        cache.put('a', 1)
+        self.clock.now += 9.9
+        self.assertEqual(1, cache.get('a'))
+        self.clock.now += 0.1
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TtlLruCache(maxsize=2, clock=self.clock)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_invalidate(self):
+        cache = TtlLruCache(clock=self.clock)
+        for key, value in (('a', 1), ('b', 2), ('c', 1)):
+            cache.put(key, value)
+        cache.invalidate('b')
+        cache.invalidate('missing')
+        self.assertEqual(2, cache.invalidate_if(lambda key, value: value == 1))
+        self.assertEqual(0, len(cache))
+
+    def test_zero_ttl_disables_cache(self):
+        cache = TtlLruCache(ttl=0, clock=self.clock)
+        cache.put('a', 1)
+        self.assertEqual('default', cache.get('a', 'default'))
+
+    def test_maxsize_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TtlLruCache(maxsize=0)
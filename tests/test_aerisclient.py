@@ -0,0 +1,112 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from unittest.mock import Mock
+
+import aerisapisdk.aerframesdk as aerframesdk
+from aerisapisdk.aerisclient import AerisClient
+from aerisapisdk.exceptions import ApiException
+
+import responses
+
+from tests.AerTestCase import AerTestCase
+
+TEST_URLS = {'aerframe_ws_api': 'https://localhost',
+             'aerframe_lp_api': 'https://localhost_longpoll.local',
+             'aeradmin_api': 'https://localhost_admin.local',
+             'aertraffic_api': 'https://localhost_traffic.local'}
+
+
+class TestAerisClient(AerTestCase):
+    accountId = '123'
+    apiKey = 'anApiKey'
+    appApiKey = 'anAppApiKey'
+    email = 'foo@bar.com'
+
+    def setUp(self):
+        aerframesdk.clear_caches()
+        self.client = AerisClient(self.accountId, self.apiKey, appApiKey=self.appApiKey, email=self.email,
+                                  urls=TEST_URLS)
+
+    def test_from_config(self):
+        config = {'accountId': self.accountId, 'apiKey': self.apiKey, 'email': self.email,
+                  'aerframeApplication': {'apiKey': self.appApiKey}, 'urls': TEST_URLS}
+        client = AerisClient.from_config(config)
+        self.assertEqual(self.accountId, client.accountId)
+        self.assertEqual(self.appApiKey, client.appApiKey)
+        self.assertEqual(TEST_URLS, client.urls)
+
+    def test_app_api_key_defaults_to_api_key(self):
+        client = AerisClient(self.accountId, self.apiKey, urls=TEST_URLS)
+        self.assertEqual(self.apiKey, client.appApiKey)
+
+    @responses.activate
+    def test_get_applications(self):
+        app_id = '44444444-2943-1346-6c49-123456789abc'
+        response_body = {"application": [
+            {"applicationShortName": "my-app",
+             "resourceURL": f'https://localhost/registration/v2/{self.accountId}/applications/{app_id}'}]}
+        callback = self.create_body_assertion(None, {'apiKey': self.apiKey}, response_body)
+        responses.add_callback(responses.GET, f'https://localhost/registration/v2/{self.accountId}/applications',
+                               callback=callback)
+        self.assertEqual(app_id, self.client.get_applications('my-app'))
+
+    @responses.activate
+    def test_get_location(self):
+        response_body = {'mcc': 204, 'mnc': 4, 'lac': 1234, 'cellId': 5678}
+        callback = self.create_body_assertion(None, {'apiKey': self.appApiKey}, response_body)
+        responses.add_callback(responses.GET,
+                               f'https://localhost/networkservices/v2/{self.accountId}/devices/IMSI/'
+                               + '123456789012345/networkLocation',
+                               callback=callback)
+        self.assertEqual(response_body, self.client.get_location('IMSI', '123456789012345'))
+
+    @responses.activate
+    def test_create_outbound_subscription(self):
+        channel_id = '12345678-1234-1234-1234-123456789abc'
+        notify_url = f'https://localhost/notificationchannel/v2/{self.accountId}/channels/{channel_id}/callback'
+        request_body = {'callbackReference': {'callbackData': 'my-app-mt', 'notifyURL': notify_url},
+                        'filterCriteria': 'SP:*',
+                        'destinationAddress': ['my-app']}
+        callback = self.create_body_assertion(request_body, {'apiKey': self.appApiKey}, request_body,
+                                              response_status=201)
+        responses.add_callback(responses.POST,
+                               f'https://localhost/smsmessaging/v2/{self.accountId}/outbound/my-app/subscriptions',
+                               callback=callback)
+        self.assertEqual(request_body, self.client.create_outbound_subscription('my-app', channel_id))
+
+    @responses.activate
+    def test_get_device_details_http_401(self):
+        response_json = {"code": 401, "status": "UNAUTHORIZED", "message": "AccountId and ApiKey are not linked."}
+        expected_request_body = {"accountID": self.accountId, "email": self.email, "IMSI": '123456789012345'}
+        callback = self.create_body_assertion(expected_request_body, {'apiKey': self.apiKey}, response_json,
+                                              response_status=401)
+        responses.add_callback(responses.POST, 'https://localhost_admin.local/AerAdmin_WS_5_0/rest/devices/details',
+                               callback=callback)
+        with self.assertRaises(ApiException) as context:
+            self.client.get_device_details('IMSI', '123456789012345')
+        self.verify_api_exception(context.exception, 401, json.dumps(response_json))
+
+    def test_uses_given_transport(self):
+        response = Mock(status_code=204)
+        transport = Mock()
+        transport.request.return_value = response
+        client = AerisClient(self.accountId, self.apiKey, urls=TEST_URLS, transport=transport)
+
+        self.assertTrue(client.delete_channel('99'))
+        transport.request.assert_called_once_with(
+            'DELETE', f'https://localhost/notificationchannel/v2/{self.accountId}/channels/99',
+            params={'apiKey': self.apiKey})
@@ -0,0 +1,151 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+
+from unittest.mock import patch
+
+from aerisapisdk.aeriscorrelation import (DeliveryTimeout, DeliveryTracker, TimerWheel, derive_client_correlator,
+                                          new_client_correlator)
+from aerisapisdk.aerisfilters import MO_SMS, Notification
+from aerisapisdk.aerisnotifications import NotificationConsumer
+from tests.helpers import FakeClock, receipt
+
+import responses
+
+TEST_AF_URL = 'https://localhost_aerframe.local/v2'
+CHANNEL_URL = 'https://localhost_longpoll.local/notificationchannel/v2/123/longpoll/channel-1'
+REQUESTS_URL = f'{TEST_AF_URL}/smsmessaging/v2/123/outbound/app/requests'
+
+
+class TestAerisCorrelation(unittest.TestCase):
+    def test_new_client_correlator_is_unique(self):
+        self.assertEqual(1000, len({new_client_correlator() for _ in range(1000)}))
+
+    def test_derive_client_correlator_is_stable_per_imsi(self):
+        parent = new_client_correlator()
+        derived = derive_client_correlator(parent, '1')
+        self.assertRegex(derived, '^[0-9a-f]{32}$')
+        self.assertEqual(derived, derive_client_correlator(parent, '1'))
+        self.assertNotEqual(derived, derive_client_correlator(parent, '2'))
+        self.assertNotEqual(derived, derive_client_correlator(new_client_correlator(), '1'))
+
+    def test_timer_wheel(self):
+        clock = FakeClock()
+        wheel = TimerWheel(tick=1, slots=8, clock=clock)
+        wheel.schedule('a', 2)
+        wheel.schedule('far', 20)
+        handle = wheel.schedule('cancelled', 2)
+        wheel.cancel('cancelled', handle)
+        clock.now = 1
+        self.assertEqual([], wheel.advance())
+        clock.now = 2
+        self.assertEqual(['a'], wheel.advance())
+        # "far" shares a bucket with nearer ticks, and is passed over until it is due
+        clock.now = 12
+        self.assertEqual([], wheel.advance())
+        self.assertEqual(1, len(wheel))
+        clock.now = 100
+        self.assertEqual(['far'], wheel.advance())
+        self.assertEqual(0, len(wheel))
+
+    def test_receipts_resolve_by_request_link_and_address(self):
+        clock = FakeClock()
+        tracker = DeliveryTracker(clock=clock)
+        futures = tracker.track('c1', ['1', '2'])
+        tracker.sent('c1', {'resourceURL': REQUESTS_URL + '/r1'})
+        self.assertEqual(['c1'], tracker.pending('2'))
+
+        clock.now = 3
+        self.assertTrue(tracker(receipt('DeliveredToNetwork', '2', REQUESTS_URL + '/r1')))
+        self.assertFalse(futures['2'].done())
+        clock.now = 5
+        self.assertTrue(tracker(receipt('DeliveredToTerminal', '2', REQUESTS_URL + '/r1')))
+        result = futures['2'].result(0)
+        self.assertEqual(('c1', '2', 'DeliveredToTerminal', 5), result[:4])
+        self.assertFalse(futures['1'].done())
+        self.assertEqual([], tracker.pending('2'))
+        # a second final receipt for the same recipient matches nothing
+        self.assertFalse(tracker(receipt('DeliveredToTerminal', '2', REQUESTS_URL + '/r1')))
+
+        self.assertTrue(tracker(receipt('DeliveryImpossible', '1', clientCorrelator='c1')))
+        self.assertEqual('DeliveryImpossible', futures['1'].result(0).deliveryStatus)
+        self.assertEqual([], tracker.pending())
+        stats = tracker.stats()
+        self.assertEqual(2, stats['delivered'])
+        self.assertEqual(1, stats['unmatched'])
+        self.assertEqual(0, stats['pending'])
+        self.assertEqual(5, stats['meanLatency'])
+
+    def test_receipts_without_a_reference_resolve_the_oldest_send(self):
+        tracker = DeliveryTracker(clock=FakeClock())
+        first = tracker.track('c1', '1')['1']
+        second = tracker.track('c2', '1')['1']
+        self.assertTrue(tracker(receipt('DeliveredToTerminal', '1')))
+        self.assertEqual('c1', first.result(0).clientCorrelator)
+        self.assertFalse(second.done())
+        self.assertFalse(tracker(Notification(MO_SMS, 'mo', {'senderAddress': '1', 'message': 'hi'})))
+        with self.assertRaises(ValueError):
+            tracker.track('c2', '2')
+
+    def test_stale_sends_expire(self):
+        clock = FakeClock()
+        tracker = DeliveryTracker(timeout=10, tick=1, slots=4, clock=clock)
+        timedOut = []
+        future = tracker.track('c1', '1', callback=timedOut.append)['1']
+        other = tracker.track('c2', '2')['2']
+        tracker.sent('c2', None)
+        self.assertIsNone(other.result(0))
+
+        clock.now = 9
+        self.assertEqual(0, tracker.expire())
+        clock.now = 11
+        self.assertEqual(1, tracker.expire())
+        self.assertIsInstance(future.exception(0), DeliveryTimeout)
+        self.assertEqual([future], timedOut)
+        self.assertFalse(tracker(receipt('DeliveredToTerminal', '1', clientCorrelator='c1')))
+        self.assertEqual(1, tracker.stats()['expired'])
+
+    @responses.activate
+    def test_send_mt_sms(self):
+        def callback(request):
+            body = json.loads(request.body)
+            body['resourceURL'] = REQUESTS_URL + '/r1'
+            return 201, {}, json.dumps(body)
+
+        responses.add_callback(responses.POST, REQUESTS_URL, callback=callback)
+        responses.add(responses.POST, f'{TEST_AF_URL}/smsmessaging/v2/123/outbound/other/requests', status=401)
+        tracker = DeliveryTracker()
+        with patch('aerisapisdk.aerisconfig.get_aerframe_api_url', return_value=TEST_AF_URL):
+            future = tracker.send_mt_sms('123', 'anApiKey', 'app', '1', 'hello')
+            failed = tracker.send_mt_sms('123', 'anApiKey', 'other', '1', 'hello')
+
+        sent = json.loads(responses.calls[0].request.body)
+        self.assertEqual([sent['clientCorrelator']], tracker.pending('1'))
+        self.assertEqual(401, failed.exception(0).response.status_code)
+        tracker(receipt('DeliveredToTerminal', '1', REQUESTS_URL + '/r1'))
+        self.assertEqual(sent['clientCorrelator'], future.result(0).clientCorrelator)
+
+    @responses.activate
+    def test_consumer_resolves_receipts(self):
+        tracker = DeliveryTracker()
+        future = tracker.track('c1', '123456789012345')['123456789012345']
+        response = {'deliveryInfoNotification': [{'callbackData': 'mt', 'deliveryInfo': [
+            {'address': 'tel:123456789012345', 'deliveryStatus': 'DeliveredToTerminal', 'clientCorrelator': 'c1'}]}]}
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(response))
+
+        with NotificationConsumer('123', 'anApiKey', CHANNEL_URL, callback=lambda n: None, deliveryTracker=tracker):
+            result = future.result(5)
+        self.assertEqual('DeliveredToTerminal', result.deliveryStatus)
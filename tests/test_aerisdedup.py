@@ -0,0 +1,111 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import queue
+import time
+import unittest
+
+from aerisapisdk.aerisdedup import BloomFilter, NotificationDeduplicator, notification_key
+from aerisapisdk.aerisfilters import MO_SMS, Notification
+from aerisapisdk.aerisnotifications import NotificationConsumer
+from tests.helpers import FakeClock, receipt
+
+import responses
+
+CHANNEL_URL = 'https://localhost_longpoll.local/notificationchannel/v2/123/longpoll/channel-1'
+
+REQUEST_URL = 'https://localhost/smsmessaging/v2/123/outbound/app/requests/1'
+
+
+def mo_sms(messageId, message='hello'):
+    return Notification(MO_SMS, 'mo', {'senderAddress': '123456789012345', 'messageId': messageId,
+                                       'message': message})
+
+
+class TestAerisDedup(unittest.TestCase):
+    def test_notification_key(self):
+        self.assertEqual(notification_key(receipt('DeliveredToTerminal', request=REQUEST_URL)),
+                         notification_key(receipt('DeliveredToTerminal', request=REQUEST_URL)))
+        self.assertNotEqual(notification_key(receipt('DeliveredToNetwork', request=REQUEST_URL)),
+                            notification_key(receipt('DeliveredToTerminal', request=REQUEST_URL)))
+        self.assertNotEqual(notification_key(receipt('DeliveredToTerminal', '123456789012346', REQUEST_URL)),
+                            notification_key(receipt('DeliveredToTerminal', request=REQUEST_URL)))
+        # MO-SMs with a message ID are identified by it alone
+        self.assertEqual(notification_key(mo_sms('m1')), notification_key(mo_sms('m1', 'resent')))
+        self.assertNotEqual(notification_key(mo_sms('m1')), notification_key(mo_sms('m2')))
+        # without identifying fields, the whole notification is the key, regardless of key order
+        self.assertEqual(notification_key(Notification(MO_SMS, 'mo', {'a': 1, 'b': 2})),
+                         notification_key(Notification(MO_SMS, 'mo', {'b': 2, 'a': 1})))
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 1e-9)
+        keys = [str(i).encode() for i in range(1000)]
+        self.assertEqual([False] * 1000, [bloom.add(key) for key in keys])
+        self.assertTrue(all(key in bloom for key in keys))
+        self.assertEqual(1000, len(bloom))
+
+        bloom = BloomFilter(1000, 0.01)
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(str(i).encode() in bloom for i in range(1000, 11000))
+        self.assertLess(false_positives, 10000 * 0.03)
+
+    def test_duplicates_are_remembered_for_the_window(self):
+        clock = FakeClock()
+        deduplicator = NotificationDeduplicator(capacity=1000, window=60, generations=4, clock=clock)
+        self.assertTrue(deduplicator(receipt('DeliveredToTerminal', request=REQUEST_URL)))
+        self.assertFalse(deduplicator(receipt('DeliveredToTerminal', request=REQUEST_URL)))
+        self.assertTrue(deduplicator(receipt('DeliveredToNetwork', request=REQUEST_URL)))
+
+        memory = deduplicator.memory_bytes()
+        for second in range(1, 60):
+            clock.now = second
+            self.assertFalse(deduplicator(receipt('DeliveredToTerminal', request=REQUEST_URL)))
+            self.assertTrue(deduplicator(mo_sms(str(second))))
+        self.assertEqual(memory, deduplicator.memory_bytes())
+        self.assertEqual(60, deduplicator.duplicates)
+
+        clock.now = 1000
+        self.assertTrue(deduplicator(receipt('DeliveredToTerminal', request=REQUEST_URL)))
+
+    def test_capacity_bounds_what_is_remembered(self):
+        deduplicator = NotificationDeduplicator(capacity=30, window=3600, generations=4, clock=FakeClock())
+        memory = deduplicator.memory_bytes()
+        for i in range(100):
+            self.assertTrue(deduplicator(mo_sms(str(i))))
+        self.assertEqual(memory, deduplicator.memory_bytes())
+        self.assertFalse(deduplicator(mo_sms('99')))
+        self.assertTrue(deduplicator(mo_sms('0')))
+
+    @responses.activate
+    def test_consumer_skips_duplicates(self):
+        response = {'deliveryInfoNotification': [{'callbackData': 'mt', 'deliveryInfo': [
+            receipt('DeliveredToTerminal', request=REQUEST_URL).data]}]}
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(response))
+        received = queue.Queue()
+
+        consumer = NotificationConsumer('123', 'anApiKey', CHANNEL_URL, callback=received.put, pollers=2,
+                                        deduplicator=NotificationDeduplicator(capacity=1000))
+        with consumer:
+            received.get(timeout=5)
+            for _ in range(500):
+                if len(responses.calls) >= 4:
+                    break
+                time.sleep(0.01)
+        self.assertTrue(received.empty())
+        stats = consumer.stats()
+        self.assertEqual(1, stats['notifications'])
+        self.assertEqual(stats['polls'] - 1, stats['duplicates'])
@@ -0,0 +1,79 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import re
+import unittest
+
+import aerisapisdk.aerisfilters as aerisfilters
+from aerisapisdk.aerisfilters import DELIVERY_RECEIPT, MO_SMS, Notification, NotificationFilter
+
+DELIVERED = Notification(DELIVERY_RECEIPT, 'mt', {'address': 'tel:123456789012345',
+                                                  'deliveryStatus': 'DeliveredToTerminal'})
+IMPOSSIBLE = Notification(DELIVERY_RECEIPT, 'mt', {'address': '123456789012346',
+                                                   'deliveryStatus': 'DeliveryImpossible'})
+# "Spotted Mac 04:29:11:45:78:de at 2020-03-11T16:43:29.123Z", base64-encoded as received from AerFrame
+MO_BASE64 = Notification(MO_SMS, 'mo', {
+    'senderAddress': '123456789012345', 'dateTime': '2020-03-11T16:43:33.307Z',
+    'message': 'U3BvdHRlZCBNYWMgMDQ6Mjk6MTE6NDU6Nzg6ZGUgYXQgMjAyMC0wMy0xMVQxNjo0MzoyOS4xMjNa'})
+MO_PLAIN = Notification(MO_SMS, 'mo', {'senderAddress': 'tel:123456789012347', 'dateTime': '2020-03-12T00:00:00Z',
+                                       'message': 'alarm: door open'})
+ALL = [DELIVERED, IMPOSSIBLE, MO_BASE64, MO_PLAIN]
+
+
+class TestAerisFilters(unittest.TestCase):
+    def find(self, **criteria):
+        return [n for n in ALL if NotificationFilter(**criteria)(n)]
+
+    def test_no_criteria_matches_everything(self):
+        self.assertEqual(ALL, self.find())
+
+    def test_imsis_ignore_tel_prefix(self):
+        self.assertEqual([DELIVERED, MO_BASE64], self.find(imsis={'123456789012345'}))
+        self.assertEqual([MO_PLAIN], self.find(imsis=['123456789012347']))
+
+    def test_delivery_statuses(self):
+        self.assertEqual([IMPOSSIBLE], self.find(deliveryStatuses=['DeliveryImpossible']))
+
+    def test_text_and_pattern_match_raw_and_base64_decoded_text(self):
+        self.assertEqual([MO_BASE64], self.find(text='Spotted Mac'))
+        self.assertEqual([MO_PLAIN], self.find(text='door'))
+        self.assertEqual([MO_BASE64, MO_PLAIN], self.find(pattern=r'(Mac|door) '))
+        self.assertEqual([MO_PLAIN], self.find(pattern=re.compile('ALARM', re.IGNORECASE)))
+
+    def test_time_window(self):
+        since = datetime.datetime(2020, 3, 11, 16, 43, 33, 307000)
+        until = datetime.datetime(2020, 3, 12, tzinfo=datetime.timezone.utc)
+        now = until.timestamp() + 60
+        self.assertEqual([MO_BASE64], self.find(since=since, until=until, clock=lambda: now))
+        # notifications without a time of their own are checked against the time they are seen
+        self.assertEqual(ALL, self.find(since=since, clock=lambda: now))
+        self.assertAlmostEqual(since.replace(tzinfo=datetime.timezone.utc).timestamp(),
+                               aerisfilters.timestamp(MO_BASE64))
+
+    def test_criteria_are_combined(self):
+        self.assertEqual([MO_BASE64], self.find(kinds=[MO_SMS], imsis=['123456789012345']))
+        self.assertEqual([], self.find(imsis=['123456789012346'], deliveryStatuses=['DeliveredToTerminal']))
+
+    def test_filter_stops_at_limit(self):
+        consumed = []
+
+        def stream():
+            for notification in ALL:
+                consumed.append(notification)
+                yield notification
+
+        self.assertEqual([DELIVERED, IMPOSSIBLE], list(NotificationFilter(kinds=[DELIVERY_RECEIPT]).filter(stream(),
+                                                                                                           limit=2)))
+        self.assertEqual([DELIVERED, IMPOSSIBLE], consumed)
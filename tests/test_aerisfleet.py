@@ -0,0 +1,147 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+from aerisapisdk.aerisfleet import FleetSnapshot, LocationHistory, Visit, numpy
+from aerisapisdk.aerisgeofence import Cell
+from tests.helpers import NO_LOCATION, location
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestAerisFleet(unittest.TestCase):
+    def test_compare(self):
+        devices = ['same', 'moved', 'newLac', 'appeared', 'absent', 'unknown', 'missing']
+        previous = FleetSnapshot.from_locations(devices, {
+            'same': location(1), 'moved': location(1), 'newLac': location(1), 'absent': location(1),
+            'unknown': NO_LOCATION})
+        current = FleetSnapshot.from_locations(devices, [
+            location(1), location(2), Cell(204, 4, 2, 1), location(1), NO_LOCATION, None, None])
+
+        changes = current.compare(previous)
+        self.assertEqual([1, 2], changes.moved.tolist())
+        self.assertEqual([3], changes.present.tolist())
+        self.assertEqual([4], changes.absent.tolist())
+        self.assertEqual(Cell(204, 4, 1, 2), current.cell(current.index('moved')))
+        self.assertIsNone(current.cell(current.index('absent')))
+        self.assertEqual([True, True, True, True, False, False, False], current.present.tolist())
+
+        with self.assertRaises(ValueError):
+            current.compare(FleetSnapshot(3))
+
+    def test_updates_in_place(self):
+        current = FleetSnapshot.from_arrays([204, 204], [4, 4], [1, 1], [(1 << 36) - 1, 2])
+        previous = current.copy()
+        current.set(0, location(3))
+        current.set(1, None)
+        changes = current.compare(previous)
+        self.assertEqual([0], changes.moved.tolist())
+        self.assertEqual([1], changes.absent.tolist())
+        self.assertEqual(Cell(204, 4, 1, (1 << 36) - 1), previous.cell(0))
+        with self.assertRaises(KeyError):
+            current.index('a')
+
+    def test_large_fleets(self):
+        size = 100000
+        previous = FleetSnapshot.from_arrays(numpy.full(size, 310), numpy.full(size, 410), numpy.arange(size),
+                                             numpy.arange(size))
+        current = previous.copy()
+        current.cellId[::1000] += 1
+        current.mcc[1::1000] = 0
+        changes = current.compare(previous)
+        self.assertEqual(list(range(0, size, 1000)), changes.moved.tolist())
+        self.assertEqual(list(range(1, size, 1000)), changes.absent.tolist())
+        self.assertEqual(0, len(changes.present))
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestAerisLocationHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'history')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records_only_changes(self):
+        with LocationHistory(self.path, chunkSize=4) as history:
+            self.assertTrue(history.record(10, 0, location(1)))
+            self.assertFalse(history.record(20, 0, location(1)))
+            self.assertFalse(history.record(20, 1, NO_LOCATION))
+            self.assertTrue(history.record(30, 1, location(5)))
+            self.assertTrue(history.record(40, 0, location(2)))
+            self.assertTrue(history.record(50, 0, None))
+            self.assertTrue(history.record(60, 0, location(2)))
+            self.assertTrue(history.record(70, 1, Cell(204, 4, 2, 5)))
+            with self.assertRaises(ValueError):
+                history.record(69, 0, location(3))
+            self.assertEqual(6, len(history))
+
+            rows = history.query(device=0)
+            self.assertEqual([10, 40, 50, 60], rows['timestamp'].tolist())
+            self.assertEqual([1, 2, 0, 2], rows['cellId'].tolist())
+            self.assertEqual([30, 40, 50], history.query(30, 60)['timestamp'].tolist())
+            self.assertEqual([5], history.query(30, 60, device=1)['cellId'].tolist())
+            self.assertEqual(0, len(history.query(100)))
+
+            self.assertEqual([Visit(Cell(204, 4, 1, 1), 10, 40), Visit(Cell(204, 4, 1, 2), 40, 50),
+                              Visit(Cell(204, 4, 1, 2), 60, None)], history.visits(0))
+            self.assertEqual([Visit(Cell(204, 4, 1, 2), 40, 50)], history.visits(0, 40, 60))
+
+        with LocationHistory(self.path, chunkSize=100) as history:
+            self.assertEqual(4, history.chunkSize)
+            self.assertEqual(6, len(history))
+            self.assertEqual(Cell(204, 4, 1, 2), history.cell(0))
+            self.assertEqual(Cell(204, 4, 2, 5), history.cell(1))
+            self.assertIsNone(history.cell(2))
+            self.assertFalse(history.record(80, 0, location(2)))
+            with self.assertRaises(ValueError):
+                history.record(69, 0, location(3))
+            self.assertTrue(history.record(80, 0, location(3)))
+            self.assertEqual([10, 40, 50, 60, 80], history.query(device=0)['timestamp'].tolist())
+
+    def test_unflushed_rows_are_ignored(self):
+        history = LocationHistory(self.path, chunkSize=4)
+        history.record(10, 0, location(1))
+        history.flush()
+        history.record(20, 0, location(2))
+        history = LocationHistory(self.path)
+        self.assertEqual(1, len(history))
+        self.assertEqual(Cell(204, 4, 1, 1), history.cell(0))
+
+    def test_records_snapshots(self):
+        size = 10000
+        snapshot = FleetSnapshot.from_arrays(numpy.full(size, 310), numpy.full(size, 410), numpy.arange(size),
+                                             numpy.arange(size))
+        with LocationHistory(self.path, chunkSize=4096) as history:
+            self.assertEqual(size, history.record_snapshot(1000, snapshot))
+            self.assertEqual(0, history.record_snapshot(2000, snapshot))
+            snapshot.cellId[::100] += 1
+            snapshot.mcc[1::100] = 0
+            self.assertEqual(200, history.record_snapshot(3000, snapshot))
+            self.assertEqual(0, history.record_snapshot(4000, snapshot))
+            # a device without a location is the same whatever its other fields are
+            snapshot.lac[1::100] = 0
+            self.assertEqual(0, history.record_snapshot(5000, snapshot))
+
+            self.assertEqual(size + 200, len(history))
+            rows = history.query(3000, 4000)
+            self.assertEqual(list(range(0, size, 100)), rows['device'][::2].tolist())
+            self.assertEqual((3000, 1, 0, 0, 0, 0), rows[1].tolist())
+            self.assertEqual(Cell(310, 410, 100, 101), history.cell(100))
+            self.assertIsNone(history.cell(101))
+            self.assertEqual([Visit(Cell(310, 410, 100, 100), 1000, 3000), Visit(Cell(310, 410, 100, 101), 3000, None)],
+                             history.visits(100))
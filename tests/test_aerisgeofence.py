@@ -0,0 +1,241 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from aerisapisdk.aerisgeofence import (Cell, GeofenceIndex, GeofenceTracker, GeofenceWatcher, PollingBudget,
+                                       cell_of, is_location_present, location_changed, pack_cell, unpack_cell)
+from aerisapisdk.exceptions import ApiException
+from tests.helpers import NO_LOCATION, location
+
+
+class TestAerisGeofence(unittest.TestCase):
+    def test_locations(self):
+        self.assertFalse(is_location_present(NO_LOCATION))
+        self.assertFalse(is_location_present(None))
+        self.assertTrue(is_location_present(location(1)))
+        self.assertEqual(Cell(204, 4, 1, 2), cell_of(location(2)))
+        self.assertIsNone(cell_of(NO_LOCATION))
+
+        self.assertFalse(location_changed(location(1), location(1)))
+        self.assertTrue(location_changed(location(2), location(1)))
+        self.assertTrue(location_changed(location(1, lac=2), Cell(204, 4, 1, 1)))
+        self.assertFalse(location_changed(NO_LOCATION, location(1)))
+        self.assertFalse(location_changed(location(1), None))
+
+    def test_watches_many_devices_concurrently(self):
+        lock = threading.Lock()
+        lookups = {}
+        inFlight = [0, 0]
+        moves = []
+
+        def locator(deviceIdType, deviceId):
+            with lock:
+                count = lookups[deviceId] = lookups.get(deviceId, 0) + 1
+                inFlight[0] += 1
+                inFlight[1] = max(inFlight)
+            time.sleep(0.001)
+            with lock:
+                inFlight[0] -= 1
+            if deviceId == 'broken':
+                raise ApiException('HTTP status code was 500', None)
+            if deviceId == 'unknown':
+                return NO_LOCATION
+            # device "0" moves on its third lookup
+            return location(2 if deviceId == '0' and count >= 3 else 1)
+
+        devices = [str(i) for i in range(200)] + ['broken', 'unknown']
+        watcher = GeofenceWatcher('123', 'anApiKey', devices, period=0.05, maxWorkers=4, locator=locator,
+                                  onMove=lambda *args: moves.append(args))
+        with watcher:
+            for _ in range(500):
+                if len(lookups) == len(devices) and min(lookups.values()) >= 3:
+                    break
+                time.sleep(0.01)
+        self.assertLessEqual(inFlight[1], 4)
+        self.assertEqual([('0', Cell(204, 4, 1, 1), Cell(204, 4, 1, 2))], moves)
+        self.assertEqual(Cell(204, 4, 1, 2), watcher.cell('0'))
+        self.assertIsNone(watcher.cell('unknown'))
+        stats = watcher.stats()
+        self.assertEqual(1, stats['moves'])
+        self.assertEqual(lookups['broken'], stats['errors'])
+        self.assertEqual(len(devices), stats['devices'])
+
+    def test_devices_can_be_added_and_removed(self):
+        seen = []
+        delays = []
+
+        def interval(deviceId, moved):
+            delays.append(deviceId)
+            return 60
+
+        watcher = GeofenceWatcher('123', 'anApiKey', ['a'], period=60, interval=interval,
+                                  locator=lambda deviceIdType, deviceId: seen.append(deviceId) or location(1))
+        watcher.add_device('b', delay=60)
+        watcher.add_device('c', delay=0)
+        watcher.remove_device('a')
+        watcher.check_now('b')
+        with watcher:
+            for _ in range(500):
+                if len(delays) >= 2:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(['b', 'c'], sorted(seen))
+        self.assertEqual(['b', 'c'], sorted(delays))
+        self.assertEqual(2, len(watcher))
+
+    def test_packed_cells(self):
+        cell = Cell(999, 999, (1 << 24) - 1, (1 << 36) - 1)
+        self.assertEqual(cell, unpack_cell(pack_cell(*cell)))
+        self.assertEqual(Cell(204, 4, 1, 2), unpack_cell(pack_cell(204, 4, 1, 2)))
+        self.assertNotEqual(pack_cell(204, 4, 1, 2), pack_cell(204, 4, 2, 1))
+        with self.assertRaises(ValueError):
+            pack_cell(204, 4, 1 << 24, 0)
+
+    def test_geofence_index(self):
+        index = GeofenceIndex()
+        index.add('depot', cells=[(204, 4, 1, 1), (204, 4, 1, 2)])
+        index.add('city', lacs=[(204, 4, 1)])
+        index.add('other', cells=[Cell(204, 4, 9, 9)])
+
+        self.assertEqual({'depot', 'city'}, index.fences(location(1)))
+        self.assertEqual({'city'}, index.fences(location(3)))
+        self.assertEqual({'other'}, index.fences(location(9, lac=9)))
+        self.assertEqual(set(), index.fences(location(1, lac=2)))
+        self.assertEqual(set(), index.fences(NO_LOCATION))
+        self.assertTrue(index.contains('depot', Cell(204, 4, 1, 2)))
+        # equal sets of fences are shared
+        self.assertIs(index.fences(location(1)), index.fences(location(2)))
+
+        index.add('depot', cells=[(204, 4, 1, 3)])
+        self.assertEqual({'city'}, index.fences(location(1)))
+        index.remove('city')
+        self.assertEqual({'depot'}, index.fences(location(3)))
+        self.assertEqual(['depot', 'other'], sorted(index.names))
+
+    def test_geofence_index_drops_sets_of_fences_no_key_has(self):
+        index = GeofenceIndex()
+        index.add('city', lacs=[(204, 4, 1)])
+        for i in range(100):
+            index.add(f'depot-{i}', cells=[(204, 4, 1, 1), (204, 4, 1, 2)])
+            self.assertEqual({'city', f'depot-{i}'}, index.fences(location(1)))
+            index.remove(f'depot-{i}')
+        self.assertEqual({'city'}, index.fences(location(1)))
+        # only the set of the city's LAC is left
+        self.assertEqual(1, len(index._interned))
+        self.assertEqual(0, len(index._unions))
+        index.remove('city')
+        self.assertEqual(0, len(index._interned))
+
+    def test_fence_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fences.txt')
+            with open(path, 'w') as f:
+                f.write('# name cells\n\ndepot 204-4-1-1 204-4-1-2\ncity 204-4-1-*  204-4-7-7\n')
+            index = GeofenceIndex.load(path)
+            self.assertEqual(2, len(index))
+            self.assertEqual({'depot', 'city'}, index.fences(location(2)))
+            self.assertEqual({'city'}, index.fences(location(7, lac=7)))
+
+            index.dump(path)
+            self.assertEqual({'depot', 'city'}, GeofenceIndex.load(path).fences(location(1)))
+
+            with open(path, 'w') as f:
+                f.write('bad 204-4-1\n')
+            with self.assertRaises(ValueError):
+                GeofenceIndex.load(path)
+
+    def test_geofence_tracker(self):
+        index = GeofenceIndex()
+        index.add('depot', cells=[(204, 4, 1, 1)])
+        index.add('city', lacs=[(204, 4, 1)])
+        transitions = []
+        tracker = GeofenceTracker(index, onTransition=transitions.append)
+
+        tracker.update('a', location(1))
+        self.assertIsNone(tracker.update('a', location(1)))
+        tracker.update('a', location(2))
+        self.assertIsNone(tracker.update('a', NO_LOCATION))
+        tracker('a', location(5, lac=5), None)
+        self.assertEqual([('a', {'depot', 'city'}, set(), {'depot', 'city'}),
+                          ('a', set(), {'depot'}, {'city'}),
+                          ('a', set(), {'city'}, set())], transitions)
+        self.assertEqual(set(), tracker.fences('a'))
+
+    def test_watcher_feeds_tracker(self):
+        index = GeofenceIndex()
+        index.add('depot', cells=[(204, 4, 1, 1)])
+        entered = threading.Event()
+        tracker = GeofenceTracker(index, onTransition=lambda transition: entered.set())
+        with GeofenceWatcher('123', 'anApiKey', ['a'], period=60, onLocation=tracker,
+                             locator=lambda deviceIdType, deviceId: location(1)):
+            self.assertTrue(entered.wait(5))
+        self.assertEqual({'depot'}, tracker.fences('a'))
+
+    def test_polling_budget(self):
+        now = [0.0]
+        devices = [str(i) for i in range(100)]
+        budget = PollingBudget(100, devices, priorities={'99': 2}, halfLife=3600, minInterval=1,
+                               clock=lambda: now[0])
+        self.assertEqual(3600, budget.interval())
+        self.assertAlmostEqual(3600 * 101 / 100, budget.interval('0'))
+        self.assertAlmostEqual(3600 * 101 / 200, budget.interval('99'))
+
+        for _ in range(20):
+            budget('0', True)
+            now[0] += 60
+        self.assertGreater(budget.mobility('0'), 10)
+        # the moving device is looked up far more often, and the fleet stays within the budget
+        self.assertLess(budget.interval('0') * 10, budget.interval('1'))
+        callsPerHour = sum(3600 / budget.interval(deviceId) for deviceId in devices)
+        self.assertAlmostEqual(100, callsPerHour)
+
+        # a device that stops moving decays back to its share of a stationary fleet
+        now[0] += 3600 * 100
+        self.assertAlmostEqual(0, budget.mobility('0'))
+        self.assertAlmostEqual(budget.interval('1'), budget('0', False))
+        self.assertAlmostEqual(3600 * 101 / 100, budget.interval('1'))
+
+        budget.set_priority('1', 3)
+        budget.remove('99')
+        self.assertAlmostEqual(3600 * 101 / 300, budget.interval('1'))
+        self.assertEqual(99, len(budget))
+
+    def test_polling_budget_limits(self):
+        budget = PollingBudget(100, ['a', 'b'], minInterval=300, maxInterval=600)
+        self.assertEqual(300, budget.interval('a'))
+        budget = PollingBudget(1, ['a', 'b'], minInterval=300, maxInterval=600)
+        self.assertEqual(600, budget.interval('a'))
+        with self.assertRaises(ValueError):
+            budget.set_priority('a', 0)
+        with self.assertRaises(ValueError):
+            PollingBudget(0)
+
+    def test_watcher_uses_budget(self):
+        budget = PollingBudget(360000, ['a', 'b'], minInterval=0)
+        lookups = []
+        watcher = GeofenceWatcher('123', 'anApiKey', ['a', 'b'], period=budget.interval(), interval=budget,
+                                  locator=lambda deviceIdType, deviceId: lookups.append(deviceId) or
+                                  location(len(lookups)))
+        with watcher:
+            for _ in range(500):
+                if budget.mobility('a') and budget.mobility('b'):
+                    break
+                time.sleep(0.01)
+        self.assertGreater(budget.mobility('a'), 0)
+        self.assertGreaterEqual(len(lookups), 4)
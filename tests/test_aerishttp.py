@@ -0,0 +1,97 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+import unittest
+
+from unittest.mock import patch
+
+import aerisapisdk.aerishttp as aerishttp
+
+import responses
+
+
+class TestAerisHttp(unittest.TestCase):
+    def setUp(self):
+        self.original_settings = aerishttp.get_settings()
+
+    def tearDown(self):
+        aerishttp.configure(**self.original_settings)
+
+    def test_same_host_shares_session(self):
+        first = aerishttp.get_session('https://localhost/registration/v2/1/applications')
+        second = aerishttp.get_session('https://LOCALHOST/notificationchannel/v2/1/channels')
+        self.assertIs(first, second)
+
+    def test_different_hosts_get_different_sessions(self):
+        first = aerishttp.get_session('https://localhost/a')
+        second = aerishttp.get_session('https://localhost:8443/a')
+        third = aerishttp.get_session('http://localhost/a')
+        self.assertIsNot(first, second)
+        self.assertIsNot(first, third)
+
+    def test_configure_sets_pool_size(self):
+        settings = aerishttp.configure(pool_maxsize=42, pool_block=True)
+        self.assertEqual(42, settings['pool_maxsize'])
+        adapter = aerishttp.get_session('https://localhost/').get_adapter('https://localhost/')
+        self.assertEqual(42, adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+
+    def test_configure_replaces_sessions(self):
+        before = aerishttp.get_session('https://localhost/')
+        aerishttp.configure(pool_connections=3)
+        self.assertIsNot(before, aerishttp.get_session('https://localhost/'))
+
+    def test_reap_idle_sessions(self):
+        aerishttp.configure(max_idle_seconds=10)
+        with patch('time.monotonic', return_value=1000.0):
+            before = aerishttp.get_session('https://localhost/')
+        with patch('time.monotonic', return_value=1005.0):
+            self.assertEqual(0, aerishttp.reap_idle_sessions())
+        with patch('time.monotonic', return_value=1011.0):
+            self.assertEqual(1, aerishttp.reap_idle_sessions())
+            self.assertIsNot(before, aerishttp.get_session('https://localhost/'))
+
+    @responses.activate
+    def test_reaper_keeps_sessions_with_requests_in_flight(self):
+        aerishttp.configure(max_idle_seconds=10)
+        reaped = []
+
+        def slow_response(request):
+            with patch('time.monotonic', return_value=time.monotonic() + 60):
+                reaped.append(aerishttp.reap_idle_sessions())
+            return 200, {}, 'pong'
+
+        responses.add_callback(responses.GET, 'https://localhost/slow', callback=slow_response)
+        session = aerishttp.get_session('https://localhost/')
+        self.assertEqual(200, aerishttp.get('https://localhost/slow').status_code)
+        self.assertEqual([0], reaped)
+        self.assertIs(session, aerishttp.get_session('https://localhost/'))
+
+    @responses.activate
+    def test_request_goes_through_session(self):
+        responses.add(responses.GET, 'https://localhost/ping', body='pong')
+        r = aerishttp.get('https://localhost/ping', params={'apiKey': 'k'})
+        self.assertEqual(200, r.status_code)
+        self.assertEqual('pong', r.text)
+        self.assertEqual('https://localhost/ping?apiKey=k', responses.calls[0].request.url)
+
+    @responses.activate
+    def test_json_body_is_encoded_with_aerisjson(self):
+        responses.add(responses.POST, 'https://localhost/echo', status=201)
+        aerishttp.post('https://localhost/echo', json={'message': 'héllo/wörld'})
+        request = responses.calls[0].request
+        self.assertEqual('application/json', request.headers['Content-Type'])
+        self.assertEqual({'message': 'héllo/wörld'}, json.loads(request.body))
@@ -0,0 +1,57 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+
+import aerisapisdk.aerisjson as aerisjson
+
+
+class TestAerisJson(unittest.TestCase):
+    document = {'deliveryInfoNotification': {'deliveryInfo': [{'address': 'tel:123456789012345',
+                                                               'deliveryStatus': 'DeliveredToTerminal'}],
+                                             'callbackData': 'my-app-mt'},
+                'text': 'grüße/😀', 'count': 3, 'ok': True, 'missing': None}
+
+    def setUp(self):
+        self.original_backend = aerisjson.get_backend()
+
+    def tearDown(self):
+        aerisjson.set_backend(self.original_backend)
+
+    def test_default_backend_is_fastest_available(self):
+        self.assertEqual(aerisjson.get_available_backends()[0], aerisjson.get_backend())
+        self.assertEqual('json', aerisjson.get_available_backends()[-1])
+
+    def test_every_backend_round_trips(self):
+        for backend in aerisjson.get_available_backends():
+            with self.subTest(backend=backend):
+                aerisjson.set_backend(backend)
+                encoded = aerisjson.dumps(self.document)
+                self.assertIsInstance(encoded, bytes)
+                self.assertEqual(self.document, json.loads(encoded.decode('utf-8')))
+                self.assertEqual(self.document, aerisjson.loads(encoded))
+                self.assertEqual(self.document, aerisjson.loads(encoded.decode('utf-8')))
+
+    def test_loads_invalid_document_raises_value_error(self):
+        for backend in aerisjson.get_available_backends():
+            with self.subTest(backend=backend):
+                aerisjson.set_backend(backend)
+                with self.assertRaises(ValueError):
+                    aerisjson.loads(b'{"unterminated": ')
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            aerisjson.set_backend('simdjson')
+        self.assertEqual(self.original_backend, aerisjson.get_backend())
@@ -0,0 +1,232 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import queue
+import threading
+import time
+import unittest
+from unittest.mock import call, patch
+
+import aerisapisdk.aerframesdk as aerframesdk
+from aerisapisdk.aerisfilters import NotificationFilter
+import aerisapisdk.aerisnotifications as aerisnotifications
+from aerisapisdk.aerisnotifications import NotificationConsumer, PollSizeTuner
+
+import requests
+import responses
+
+CHANNEL_URL = 'https://localhost_longpoll.local/notificationchannel/v2/123/longpoll/channel-1'
+
+POLL_RESPONSE = {
+    'deliveryInfoNotification': [
+        {'callbackData': 'my-app-mt',
+         'deliveryInfo': [{'address': '123456789012345', 'deliveryStatus': 'DeliveredToTerminal'},
+                          {'address': '123456789012346', 'deliveryStatus': 'DeliveryImpossible'}]}],
+    'inboundSMSMessageNotification': [
+        {'callbackData': 'my-app-mo',
+         'inboundSMSMessage': {'senderAddress': '123456789012345', 'message': 'aGVsbG8='}}]}
+
+
+class TestAerisNotifications(unittest.TestCase):
+    accountId = '123'
+    apiKey = 'anApiKey'
+
+    def test_iter_notifications(self):
+        notifications = list(aerisnotifications.iter_notifications(POLL_RESPONSE))
+        self.assertEqual([aerisnotifications.DELIVERY_RECEIPT, aerisnotifications.DELIVERY_RECEIPT,
+                          aerisnotifications.MO_SMS], [n.kind for n in notifications])
+        self.assertEqual(['my-app-mt', 'my-app-mt', 'my-app-mo'], [n.callbackData for n in notifications])
+        self.assertEqual('DeliveryImpossible', notifications[1].data['deliveryStatus'])
+        self.assertEqual([], list(aerisnotifications.iter_notifications({'deliveryInfoNotification': []})))
+
+    @responses.activate
+    def test_callback_receives_every_notification(self):
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(POLL_RESPONSE))
+        received = []
+        enough = threading.Event()
+
+        def callback(notification):
+            received.append(notification)
+            if len(received) >= 9:
+                enough.set()
+
+        consumer = NotificationConsumer(self.accountId, self.apiKey, CHANNEL_URL, callback=callback, pollers=3)
+        with consumer:
+            self.assertTrue(enough.wait(5))
+        self.assertFalse(consumer.running)
+        stats = consumer.stats()
+        self.assertEqual(len(received), stats['notifications'])
+        self.assertEqual(3 * stats['polls'], stats['notifications'])
+        self.assertEqual((aerisnotifications.DEFAULT_CONNECT_TIMEOUT_SECONDS,
+                          aerisnotifications.DEFAULT_LONG_POLL_SECONDS
+                          + aerisnotifications.DEFAULT_READ_TIMEOUT_MARGIN_SECONDS),
+                         consumer.timeout)
+
+    @responses.activate
+    def test_only_matching_notifications_are_delivered(self):
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(POLL_RESPONSE))
+        received = queue.Queue()
+        only_mo = NotificationFilter(kinds=[aerisnotifications.MO_SMS])
+        with NotificationConsumer(self.accountId, self.apiKey, CHANNEL_URL, callback=received.put, pollers=1,
+                                  notificationFilter=only_mo):
+            for _ in range(3):
+                self.assertEqual(aerisnotifications.MO_SMS, received.get(timeout=5).kind)
+
+    @responses.activate
+    def test_full_queue_applies_backpressure_and_stops_cleanly(self):
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(POLL_RESPONSE))
+        notifications = queue.Queue(maxsize=2)
+        consumer = NotificationConsumer(self.accountId, self.apiKey, CHANNEL_URL, notificationQueue=notifications,
+                                        pollers=2)
+        consumer.start()
+        first = notifications.get(timeout=5)
+        self.assertEqual(aerisnotifications.DELIVERY_RECEIPT, first.kind)
+        self.assertTrue(consumer.stop(timeout=5))
+
+        stats = consumer.stats()
+        # the pollers waited for room instead of polling on: at most one response per poller was taken
+        self.assertLessEqual(len(responses.calls), 2 + 2)
+        self.assertEqual(3 * len(responses.calls), stats['notifications'] + stats['dropped'])
+
+    @responses.activate
+    def test_failed_polls_back_off_and_timeouts_repoll(self):
+        responses.add(responses.GET, CHANNEL_URL, status=403)
+        responses.add(responses.GET, CHANNEL_URL, body=requests.exceptions.ReadTimeout())
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(POLL_RESPONSE))
+        received = queue.Queue()
+
+        consumer = NotificationConsumer(self.accountId, self.apiKey, CHANNEL_URL, callback=received.put, pollers=1,
+                                        errorBackoff=0.01)
+        with consumer:
+            received.get(timeout=5)
+        stats = consumer.stats()
+        self.assertEqual(1, stats['errors'])
+        self.assertEqual(1, stats['timeouts'])
+
+    @responses.activate
+    def test_delivery_failures_do_not_stop_polling(self):
+        responses.add(responses.GET, CHANNEL_URL, body='[]')
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(POLL_RESPONSE))
+        received = queue.Queue()
+
+        class BrokenTracker:
+            def __call__(self, notification):
+                return False
+
+            def expire(self):
+                raise RuntimeError('broken')
+
+        consumer = NotificationConsumer(self.accountId, self.apiKey, CHANNEL_URL, callback=received.put, pollers=1,
+                                        errorBackoff=0.01, deliveryTracker=BrokenTracker())
+        with self.assertLogs('aerisapisdk.aerisnotifications', 'ERROR'):
+            with consumer:
+                for _ in range(3):
+                    received.get(timeout=5)
+                self.assertTrue(consumer.running)
+        self.assertGreaterEqual(consumer.stats()['errors'], 2)
+
+    def test_poll_size_tuner(self):
+        tuner = PollSizeTuner(10, window=4, fullRatio=0.5, maximum=15)
+        self.assertIsNone(tuner.polls_per_notification())
+        for count in (10, 10, 10):
+            tuner.record(count)
+        self.assertEqual(10, tuner.recommend())  # the window is not full yet
+        tuner.record(0)
+        self.assertEqual(0.75, tuner.full_poll_ratio())
+        self.assertEqual(15, tuner.recommend())
+        self.assertAlmostEqual(4 / 30, tuner.polls_per_notification())
+        tuner.reset()
+        self.assertEqual(10, tuner.recommend())
+
+    def test_poll_size_tuner_shrinks(self):
+        tuner = PollSizeTuner(100, window=4, shrinkRatio=0.25, minimum=30)
+        for count in (25, 0, 10):
+            tuner.record(count)
+        self.assertEqual(100, tuner.recommend())  # the window is not full yet
+        tuner.record(25)
+        self.assertEqual(50, tuner.recommend())
+        tuner.record(26)
+        self.assertEqual(100, tuner.recommend())  # one poll came closer to full
+
+        tuner = PollSizeTuner(40, window=2, minimum=30)
+        tuner.record(0)
+        tuner.record(0)
+        self.assertEqual(30, tuner.recommend())
+        tuner = PollSizeTuner(20, window=2, minimum=30)
+        tuner.record(0)
+        tuner.record(0)
+        self.assertEqual(20, tuner.recommend())
+
+    @responses.activate
+    def test_adaptive_mode_switches_to_larger_channel_and_drains_old_one(self):
+        new_channel_url = CHANNEL_URL + '-large'
+        resized = threading.Event()
+        old_polls_after_resize = []
+
+        def old_channel(request):
+            if resized.is_set():
+                old_polls_after_resize.append(request)
+                return 200, {}, json.dumps({} if len(old_polls_after_resize) > 1 else POLL_RESPONSE)
+            return 200, {}, json.dumps(POLL_RESPONSE)
+
+        def on_resize(max_notifications):
+            self.assertEqual(6, max_notifications)
+            resized.set()
+            return new_channel_url
+
+        responses.add_callback(responses.GET, CHANNEL_URL, callback=old_channel)
+        responses.add(responses.GET, new_channel_url, body='{}')
+        consumer = NotificationConsumer(self.accountId, self.apiKey, CHANNEL_URL, callback=lambda n: None, pollers=1,
+                                        maxNotifications=3, onResize=on_resize)
+        with consumer:
+            self.assertTrue(resized.wait(5))
+            for _ in range(100):
+                if any(c.request.url.startswith(new_channel_url) for c in responses.calls):
+                    break
+                time.sleep(0.01)
+        stats = consumer.stats()
+        self.assertEqual(1, stats['resizes'])
+        self.assertEqual(6, stats['maxNotifications'])
+        self.assertEqual(new_channel_url, consumer.channelURL)
+        self.assertEqual(2, len(old_polls_after_resize))
+        self.assertEqual(3 * (aerisnotifications.DEFAULT_TUNER_WINDOW + 1), stats['notifications'])
+
+    def test_recreate_channel_moves_outbound_subscriptions(self):
+        old_channel = {'applicationTag': 'my-app', 'resourceURL': 'https://localhost/channels/old'}
+        new_channel = {'applicationTag': 'my-app', 'resourceURL': 'https://localhost/channels/new'}
+        subscription = aerframesdk.Subscription('sub-1', aerframesdk.OUTBOUND, ('my-app',), 'old', {})
+        with patch.object(aerframesdk, 'get_channel', return_value=old_channel), \
+                patch.object(aerframesdk, 'create_channel', return_value=new_channel) as create_channel, \
+                patch.object(aerframesdk, 'find_subscriptions',
+                             side_effect=[[], [subscription]]) as find_subscriptions, \
+                patch.object(aerframesdk, 'create_outbound_subscription') as create_subscription, \
+                patch.object(aerframesdk, 'delete_outbound_subscription') as delete_subscription:
+            result = aerisnotifications.recreate_channel(self.accountId, self.apiKey, 'appKey', 'my-app', 'old', 60)
+
+        self.assertEqual(new_channel, result)
+        create_channel.assert_called_once_with(self.accountId, self.apiKey, 'my-app', False, maxNotifications=60)
+        self.assertEqual([call(self.accountId, 'appKey', None, aerframesdk.INBOUND, 'old', False, useCache=False),
+                          call(self.accountId, 'appKey', 'my-app', aerframesdk.OUTBOUND, 'old', False)],
+                         find_subscriptions.call_args_list)
+        self.assertEqual([call(self.accountId, 'appKey', 'my-app', 'new', False)], create_subscription.call_args_list)
+        self.assertEqual([call(self.accountId, 'appKey', 'my-app', 'sub-1', False)], delete_subscription.call_args_list)
+
+    def test_recreate_channel_refuses_channels_with_inbound_subscriptions(self):
+        subscription = aerframesdk.Subscription('sub-1', aerframesdk.INBOUND, ('other-app',), 'old', {})
+        with patch.object(aerframesdk, 'find_subscriptions', return_value=[subscription]), \
+                patch.object(aerframesdk, 'create_channel') as create_channel:
+            with self.assertRaises(ValueError):
+                aerisnotifications.recreate_channel(self.accountId, self.apiKey, 'appKey', 'my-app', 'old', 60)
+        create_channel.assert_not_called()
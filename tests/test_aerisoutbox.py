@@ -0,0 +1,158 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from aerisapisdk.aerisoutbox import FAILED, IN_FLIGHT, PENDING, SENT, SmsOutbox
+from aerisapisdk.aerisscheduler import SmsScheduler
+
+
+class RecordingSender:
+    def __init__(self, fail=()):
+        self.sent = []
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def __call__(self, appShortName, imsiDestination, smsText, clientCorrelator):
+        with self.lock:
+            self.sent.append((imsiDestination, clientCorrelator))
+        if imsiDestination in self.fail:
+            return None
+        return {'address': [imsiDestination], 'clientCorrelator': clientCorrelator}
+
+
+class TestAerisOutbox(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'outbox.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def wait_for(self, outbox, **expected):
+        for _ in range(500):
+            counts = outbox.counts()
+            if all(counts[state] == count for state, count in expected.items()):
+                return counts
+            time.sleep(0.01)
+        self.fail(f'outbox counts {outbox.counts()} never reached {expected}')
+
+    def test_sends_everything_added(self):
+        sender = RecordingSender(fail={'bad'})
+        outbox = SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', rate=1000, sender=sender), commitInterval=0.01)
+        with outbox:
+            ids = outbox.add_many(('app', str(i), 'wake') for i in range(50))
+            badId = outbox.add('app', 'bad', 'wake', lane='alert')
+            self.wait_for(outbox, sent=50, failed=1, pending=0)
+            message = outbox.get(ids[7])
+            self.assertEqual(SENT, message.state)
+            self.assertEqual(1, message.attempts)
+            self.assertEqual({'address': ['7'], 'clientCorrelator': message.clientCorrelator}, message.response)
+            self.assertEqual(FAILED, outbox.get(badId).state)
+
+            sender.fail.clear()
+            self.assertEqual(1, outbox.retry_failed())
+            self.wait_for(outbox, sent=51, failed=0)
+            self.assertEqual(2, outbox.get(badId).attempts)
+            self.assertEqual(51, outbox.purge())
+        self.assertEqual(52, len(sender.sent))
+        self.assertEqual(51, len({correlator for imsi, correlator in sender.sent}))
+
+    def test_stop_without_start_keeps_messages(self):
+        outbox = SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', sender=RecordingSender()))
+        messageId = outbox.add('app', '1', 'wake')
+        outbox.stop()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            outbox.counts()
+
+        sender = RecordingSender()
+        with SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', rate=1000, sender=sender),
+                       commitInterval=0.01) as outbox:
+            self.wait_for(outbox, sent=1)
+            self.assertEqual(SENT, outbox.get(messageId).state)
+        self.assertEqual(['1'], [imsi for imsi, correlator in sender.sent])
+
+    def test_retry_failed_does_not_resend_messages_in_flight(self):
+        release = threading.Event()
+        sender = RecordingSender(fail={'bad'})
+
+        def blocking_sender(appShortName, imsiDestination, smsText, clientCorrelator):
+            if imsiDestination != 'bad':
+                release.wait(5)
+            return sender(appShortName, imsiDestination, smsText, clientCorrelator)
+
+        outbox = SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', rate=1000, sender=blocking_sender),
+                           commitInterval=0.01)
+        with outbox:
+            outbox.add('app', 'bad', 'wake')
+            outbox.add_many(('app', str(i), 'wake') for i in range(5))
+            self.wait_for(outbox, failed=1, **{IN_FLIGHT: 5})
+            sender.fail.clear()
+            self.assertEqual(1, outbox.retry_failed())
+            self.wait_for(outbox, sent=1, **{IN_FLIGHT: 5})
+            release.set()
+            self.wait_for(outbox, sent=6)
+        self.assertEqual(['0', '1', '2', '3', '4', 'bad', 'bad'], sorted(imsi for imsi, correlator in sender.sent))
+
+    def test_restart_resends_unfinished_messages_with_their_correlators(self):
+        sender = RecordingSender()
+        outbox = SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', rate=1000, sender=sender))
+        pendingId, inFlightId, sentId = outbox.add_many([('app', '1', 'a'), ('app', '2', 'b'), ('app', '3', 'c')])
+        outbox._db.close()
+
+        # as if the sender died after handing two messages to the scheduler, and sending one of them
+        db = sqlite3.connect(self.path)
+        with db:
+            db.execute('UPDATE messages SET state = ? WHERE id = ?', (IN_FLIGHT, inFlightId))
+            db.execute('UPDATE messages SET state = ? WHERE id = ?', (SENT, sentId))
+        db.close()
+
+        outbox = SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', rate=1000, sender=sender))
+        self.assertEqual({PENDING: 1, IN_FLIGHT: 1, SENT: 1, FAILED: 0}, outbox.counts())
+        with outbox:
+            self.wait_for(outbox, sent=3)
+            expected = [(outbox.get(pendingId).imsiDestination, outbox.get(pendingId).clientCorrelator),
+                        (outbox.get(inFlightId).imsiDestination, outbox.get(inFlightId).clientCorrelator)]
+        self.assertEqual(sorted(expected), sorted(sender.sent))
+
+    def test_stop_keeps_unsent_messages(self):
+        release = threading.Event()
+        sent = []
+
+        def sender(appShortName, imsiDestination, smsText, clientCorrelator):
+            release.wait(5)
+            sent.append(imsiDestination)
+            return {}
+
+        outbox = SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', rate=1000, workers=1, maxQueueSize=1,
+                                                   sender=sender))
+        outbox.start()
+        outbox.add_many(('app', str(i), 'wake') for i in range(10))
+        time.sleep(0.1)
+        threading.Timer(0.1, release.set).start()
+        outbox.stop()
+
+        outbox = SmsOutbox(self.path, SmsScheduler('123', 'anApiKey', rate=1000, sender=sender))
+        counts = outbox.counts()
+        self.assertEqual(len(sent), counts[SENT])
+        self.assertEqual(10, counts[SENT] + counts[PENDING])
+        self.assertLess(counts[SENT], 10)
+        with outbox:
+            self.wait_for(outbox, sent=10)
+        self.assertEqual([str(i) for i in range(10)], sorted(sent, key=int))
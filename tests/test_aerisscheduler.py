@@ -0,0 +1,185 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import queue
+import threading
+import time
+import unittest
+
+from unittest.mock import Mock, patch
+
+from aerisapisdk.aerisscheduler import SmsScheduler, TokenBucket
+from aerisapisdk.exceptions import ApiException
+from tests.helpers import FakeClock
+
+import responses
+
+TEST_AF_URL = 'https://localhost'
+
+
+class TestAerisScheduler(unittest.TestCase):
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, burst=2, clock=clock)
+        self.assertEqual([0, 0, 0.5, 1.0], [bucket.reserve() for _ in range(4)])
+        clock.now = 10
+        self.assertEqual(0, bucket.reserve())
+        bucket.pause(3)
+        self.assertEqual(3.5, bucket.reserve())
+
+    def test_token_bucket_wait_time_takes_nothing(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, burst=2, clock=clock)
+        self.assertEqual(0, bucket.wait_time(2))
+        self.assertEqual(0, bucket.wait_time(2))
+        bucket.take(3)
+        self.assertEqual(1.0, bucket.wait_time())
+        clock.now = 2
+        # more than the burst can be taken once the bucket is full
+        self.assertEqual(0, bucket.wait_time(5))
+
+    def test_sends_at_the_rate(self):
+        sent = []
+
+        def sender(appShortName, imsi, smsText, clientCorrelator):
+            sent.append(time.monotonic())
+            return {'address': [imsi], 'clientCorrelator': clientCorrelator}
+
+        with SmsScheduler('123', 'anApiKey', rate=50, burst=1, workers=4, sender=sender) as scheduler:
+            futures = [scheduler.submit('app', str(i), 'wake') for i in range(20)]
+            results = [future.result(5) for future in futures]
+        self.assertEqual([[str(i)] for i in range(20)], [result['address'] for result in results])
+        self.assertEqual(20, len({result['clientCorrelator'] for result in results}))
+        # 19 sends after the first need at least 19 / 50 seconds
+        self.assertGreaterEqual(max(sent) - min(sent), 19 / 50 * 0.9)
+        self.assertEqual({'submitted': 20, 'sent': 20, 'failed': 0, 'throttled': 0, 'queued': 0}, scheduler.stats())
+
+    def test_applications_share_the_account_rate(self):
+        sent = []
+
+        def sender(appShortName, imsi, smsText, clientCorrelator):
+            sent.append(time.monotonic())
+
+        with SmsScheduler('123', 'anApiKey', rate=50, accountRate=50, burst=1, workers=4,
+                          sender=sender) as scheduler:
+            futures = [scheduler.submit(f'app-{i % 2}', str(i), 'wake') for i in range(20)]
+            for future in futures:
+                future.result(5)
+        # each application may send 50 per second, but together they may not either
+        self.assertGreaterEqual(max(sent) - min(sent), 19 / 50 * 0.9)
+        self.assertEqual(50, SmsScheduler('123', 'anApiKey', rate=50).accountBucket.rate)
+
+    def test_long_texts_can_count_per_segment(self):
+        sent = []
+
+        def sender(appShortName, imsi, smsText, clientCorrelator):
+            sent.append(time.monotonic())
+
+        with SmsScheduler('123', 'anApiKey', rate=100, burst=1, workers=1, perSegment=True,
+                          sender=sender) as scheduler:
+            futures = [scheduler.submit('app', '1', 'a' * 400) for _ in range(4)]
+            for future in futures:
+                future.result(5)
+        # three messages each, so three hundredths of a second apart
+        self.assertGreaterEqual(sent[-1] - sent[0], 3 * 3 / 100 * 0.9)
+
+    def test_higher_lanes_go_first_and_full_lanes_push_back(self):
+        order = []
+        scheduler = SmsScheduler('123', 'anApiKey', rate=1000, maxQueueSize=2, workers=1,
+                                 sender=lambda app, imsi, text, correlator: order.append(text))
+        scheduler.submit('app', '1', 'bulk-1')
+        scheduler.submit('app', '1', 'bulk-2')
+        with self.assertRaises(queue.Full):
+            scheduler.submit('app', '1', 'bulk-3', timeout=0.01)
+        scheduler.submit('app', '1', 'alert', lane='alert')
+        with self.assertRaises(ValueError):
+            scheduler.submit('app', '1', 'other', lane='other')
+        self.assertEqual(3, scheduler.qsize())
+
+        scheduler.start()
+        self.assertTrue(scheduler.stop(timeout=5))
+        self.assertEqual(['alert', 'bulk-1', 'bulk-2'], order)
+        with self.assertRaises(RuntimeError):
+            scheduler.submit('app', '1', 'late')
+
+    def test_higher_lanes_go_first_while_lower_lanes_wait_for_the_rate(self):
+        order = []
+        scheduler = SmsScheduler('123', 'anApiKey', rate=4, burst=1, workers=2,
+                                 sender=lambda app, imsi, text, correlator: order.append(text))
+        scheduler.start()
+        first = scheduler.submit('app', '1', 'bulk-1')
+        scheduler.submit('app', '2', 'bulk-2')
+        scheduler.submit('app', '3', 'bulk-3')
+        first.result(5)
+        # the next bulk MT-SM waits a quarter of a second for a token; an alert queued meanwhile goes first
+        scheduler.submit('app', '4', 'alert', lane='alert')
+        self.assertTrue(scheduler.stop(timeout=5))
+        self.assertEqual(['bulk-1', 'alert', 'bulk-2', 'bulk-3'], order)
+
+    def test_stop_can_cancel_queued_sends(self):
+        blocked = threading.Event()
+        scheduler = SmsScheduler('123', 'anApiKey', workers=1, sender=lambda *args: blocked.wait(5))
+        scheduler.start()
+        first = scheduler.submit('app', '1', 'a')
+        second = scheduler.submit('app', '1', 'b')
+        for _ in range(500):
+            if first.running():
+                break
+            time.sleep(0.01)
+        stopper = threading.Thread(target=scheduler.stop, kwargs={'cancel': True})
+        stopper.start()
+        stopper.join(0.1)
+        blocked.set()
+        stopper.join(5)
+        self.assertTrue(first.result(5))
+        self.assertTrue(second.cancelled())
+
+    def test_throttled_sends_are_retried(self):
+        throttled = Mock(status_code=429, headers={'Retry-After': '0.05'})
+        outcomes = [ApiException('HTTP status code was 429', throttled), {'ok': True}]
+        correlators = []
+
+        def sender(appShortName, imsi, smsText, clientCorrelator):
+            correlators.append(clientCorrelator)
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with SmsScheduler('123', 'anApiKey', rate=1000, workers=2, sender=sender) as scheduler:
+            future = scheduler.submit('app', '1', 'a', clientCorrelator='c1')
+            self.assertEqual({'ok': True}, future.result(5))
+        self.assertEqual(['c1', 'c1'], correlators)
+        self.assertEqual(1, scheduler.stats()['throttled'])
+
+        outcomes = [ApiException('HTTP status code was 429', throttled)] * 2
+        with SmsScheduler('123', 'anApiKey', rate=1000, maxThrottleRetries=1, sender=sender) as scheduler:
+            future = scheduler.submit('app', '1', 'a')
+            self.assertIsInstance(future.exception(5), ApiException)
+        self.assertEqual(1, scheduler.stats()['failed'])
+
+    @responses.activate
+    def test_sends_through_aerframesdk(self):
+        def callback(request):
+            return 201, {}, request.body
+
+        responses.add_callback(responses.POST, f'{TEST_AF_URL}/smsmessaging/v2/123/outbound/app/requests',
+                               callback=callback)
+        with patch('aerisapisdk.aerisconfig.get_aerframe_api_url', return_value=TEST_AF_URL):
+            with SmsScheduler('123', 'anApiKey') as scheduler:
+                response = scheduler.submit('app', '1', 'hello', clientCorrelator='c1').result(5)
+        self.assertEqual('c1', response['clientCorrelator'])
+        self.assertEqual({'apiKey': 'anApiKey'}, responses.calls[0].request.params)
+        self.assertEqual(['1'], json.loads(responses.calls[0].request.body)['address'])
@@ -0,0 +1,64 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from aerisapisdk.aerissegments import GSM_7, UCS_2, count_segments, encoding, segment, transliterate, units
+
+
+class TestAerisSegments(unittest.TestCase):
+    def test_encoding_and_units(self):
+        self.assertEqual(GSM_7, encoding('Hello @ £5 {ok}'))
+        self.assertEqual(15 + 2, units('Hello @ £5 {ok}'))
+        self.assertEqual(2, units('€'))
+        self.assertEqual(UCS_2, encoding('naïve'))
+        self.assertEqual(5, units('naïve'))
+        # characters outside the basic multilingual plane take two UTF-16 code units
+        self.assertEqual(UCS_2, encoding('ok 👍'))
+        self.assertEqual(5, units('ok 👍'))
+
+    def test_single_messages(self):
+        self.assertEqual(1, count_segments(''))
+        self.assertEqual(1, count_segments('a' * 160))
+        self.assertEqual(2, count_segments('a' * 161))
+        self.assertEqual(1, count_segments('€' * 80))
+        self.assertEqual(1, count_segments('é' * 160))
+        self.assertEqual(1, count_segments('ï' * 70))
+        self.assertEqual(2, count_segments('ï' * 71))
+
+    def test_concatenated_messages_use_the_fewest_parts(self):
+        result = segment('a' * 306)
+        self.assertEqual((153, 153), tuple(len(part) for part in result.parts))
+        self.assertEqual(3, count_segments('a' * 307))
+
+        # an extension table character is never split from its escape
+        result = segment('a' * 152 + '€' + 'a' * 10)
+        self.assertEqual(('a' * 152, '€' + 'a' * 10), result.parts)
+        self.assertEqual(164, result.units)
+
+        result = segment('ï' * 66 + '👍' + 'ï' * 10)
+        self.assertEqual(UCS_2, result.encoding)
+        self.assertEqual(('ï' * 66, '👍' + 'ï' * 10), result.parts)
+        self.assertEqual(''.join(result.parts), result.text)
+
+    def test_transliteration(self):
+        self.assertEqual('"Quoted" - it\'s ... Ça, naive', transliterate('“Quoted” — it’s … ça, naïve'))
+        self.assertEqual('日本', transliterate('日本'))
+
+        text = 'Reminder: don’t forget – ' + 'x' * 60
+        self.assertEqual(UCS_2, segment(text).encoding)
+        self.assertEqual(2, count_segments(text))
+        result = segment(text, True)
+        self.assertEqual(GSM_7, result.encoding)
+        self.assertEqual(1, len(result.parts))
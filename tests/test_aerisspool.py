@@ -0,0 +1,130 @@
+# Copyright 2020 Aeris Communications Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import queue
+import tempfile
+import unittest
+
+from aerisapisdk.aerisnotifications import NotificationConsumer
+from aerisapisdk.aerisspool import NotificationSpool
+
+import responses
+
+CHANNEL_URL = 'https://localhost_longpoll.local/notificationchannel/v2/123/longpoll/channel-1'
+
+
+def response_with(n):
+    return {'deliveryInfoNotification': [{'callbackData': 'mt', 'deliveryInfo': [
+        {'address': '123456789012345', 'deliveryStatus': 'DeliveredToTerminal', 'n': n}]}]}
+
+
+class TestNotificationSpool(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = self.temporary_directory.name
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.log'))
+
+    def test_unacked_entries_are_replayed_after_restart(self):
+        with NotificationSpool(self.directory) as spool:
+            offsets = [spool.append(response_with(n)) for n in range(3)]
+            spool.ack(offsets[0])
+            spool.ack(offsets[2])  # out of order: not committed until entry 1 is acked too
+            self.assertEqual(offsets[1], spool.committed_offset)
+
+        with NotificationSpool(self.directory) as spool:
+            replayed = list(spool.replay())
+            self.assertEqual([response_with(1), response_with(2)], [entry.data for entry in replayed])
+            self.assertEqual(offsets[1], replayed[0].offset)
+
+            # entries appended after the restart cannot commit past the unreplayed backlog
+            spool.ack(spool.append(response_with(3)))
+            self.assertEqual(offsets[1], spool.committed_offset)
+            spool.commit(replayed[-1].nextOffset)
+            self.assertEqual(spool.end_offset, spool.committed_offset)
+
+        with NotificationSpool(self.directory) as spool:
+            self.assertEqual([], list(spool.replay()))
+
+    def test_torn_tail_is_discarded(self):
+        with NotificationSpool(self.directory) as spool:
+            spool.append(response_with(0))
+            end = spool.end_offset
+        with open(os.path.join(self.directory, self.segments()[-1]), 'ab') as segment:
+            segment.write(b'\x40\x00\x00\x00\x00\x00\x00\x00{"torn')
+
+        with NotificationSpool(self.directory) as spool:
+            self.assertEqual(end, spool.end_offset)
+            self.assertEqual([response_with(0)], [entry.data for entry in spool.replay()])
+            offset = spool.append(response_with(1))
+            self.assertEqual(end, offset)
+            self.assertEqual([response_with(0), response_with(1)], [entry.data for entry in spool.replay()])
+
+    def test_segments_roll_and_consumed_segments_are_deleted(self):
+        with NotificationSpool(self.directory, segmentBytes=200, fsync=False) as spool:
+            offsets = [spool.append(response_with(n)) for n in range(6)]
+            self.assertGreater(len(self.segments()), 2)
+            self.assertEqual(list(range(6)), [entry.data['deliveryInfoNotification'][0]['deliveryInfo'][0]['n']
+                                              for entry in spool.replay()])
+            self.assertEqual(offsets[3:], [entry.offset for entry in spool.replay(fromOffset=offsets[3])])
+
+            for offset in offsets[:5]:
+                spool.ack(offset)
+            self.assertEqual(offsets[5], spool.committed_offset)
+            self.assertEqual(os.path.basename(self.segments()[0]), '%020d.log' % offsets[5])
+
+    @responses.activate
+    def test_consumer_spools_before_delivering_and_acks_after(self):
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(response_with(0)))
+        received = queue.Queue()
+        seen_offsets = []
+
+        with NotificationSpool(self.directory) as spool:
+            def callback(notification):
+                # the response is already on disk when it is delivered
+                seen_offsets.append(spool.end_offset)
+                received.put(notification)
+
+            with NotificationConsumer('123', 'anApiKey', CHANNEL_URL, callback=callback, pollers=1, spool=spool):
+                received.get(timeout=5)
+                received.get(timeout=5)
+            self.assertGreater(seen_offsets[0], 0)
+            self.assertEqual(spool.end_offset, spool.committed_offset)
+
+    @responses.activate
+    def test_consumer_replays_the_backlog_so_segments_are_deleted(self):
+        with NotificationSpool(self.directory, segmentBytes=200, fsync=False) as spool:
+            for n in range(4):
+                spool.append(response_with(n))  # never acked, as if the process had crashed
+        self.assertGreater(len(self.segments()), 2)
+
+        responses.add(responses.GET, CHANNEL_URL, body=json.dumps(response_with(10)))
+        received = queue.Queue()
+        with NotificationSpool(self.directory, segmentBytes=200, fsync=False) as spool:
+            consumer = NotificationConsumer('123', 'anApiKey', CHANNEL_URL, callback=received.put, pollers=2,
+                                            spool=spool)
+            with consumer:
+                numbers = [received.get(timeout=5).data['n'] for _ in range(12)]
+            self.assertEqual([0, 1, 2, 3], [n for n in numbers if n < 10])
+            self.assertEqual(4, consumer.stats()['replayed'])
+            self.assertEqual(spool.end_offset, spool.committed_offset)
+            segments = self.segments()
+            self.assertLessEqual(len(segments), 2)
+            self.assertGreater(int(segments[0][:-len('.log')]), 0)